@@ -5,51 +5,67 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager, get_jwt
 from flask_migrate import Migrate
 from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 from sqlalchemy.exc import SQLAlchemyError
+from app.services.ratelimit import request_key
 from config import Config
 
 db = SQLAlchemy()
 jwt = JWTManager()
 migrate = Migrate()
 limiter = Limiter(
-    key_func=get_remote_address,
-    storage_uri="memory://",  # Use memory storage for development
+    key_func=request_key,  # Per user when authenticated, per address otherwise
     default_limits=["200 per day", "50 per hour"]  # Default limits
 )
 
 def create_app(config_name='default'):
     app = Flask(__name__)
     
+    app.config.from_object(Config)
     if config_name == 'testing':
         app.config['TESTING'] = True
         app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
         app.config['JWT_SECRET_KEY'] = 'test-key'
+        app.config['STARTUP_MODE'] = 'production'  # Fixtures create the tables
+        app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'  # Cheap hashes in tests
+        app.config['RATELIMIT_STORAGE_URI'] = 'memory://'
     else:
-        app.config.from_object(Config)
         # Override with environment variables if they exist
         app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', app.config['SQLALCHEMY_DATABASE_URI'])
         app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', app.config['JWT_SECRET_KEY'])
     
     # JWT Configuration for Banking Security
-    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(minutes=15)  # Access token expires in 15 minutes
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=app.config['JWT_ACCESS_TOKEN_EXPIRES'])
     app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=7)    # Refresh token expires in 7 days
     app.config['JWT_ERROR_MESSAGE_KEY'] = 'error'
     app.config['JWT_COOKIE_SECURE'] = True  # Only send cookies over HTTPS
     app.config['JWT_COOKIE_CSRF_PROTECT'] = True  # Enable CSRF protection
     
+    if app.config['TRUSTED_PROXY_COUNT']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        proxies = app.config['TRUSTED_PROXY_COUNT']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
+    
+    from app.utils.database import configure_engine, init_sqlite_pragmas
+    configure_engine(app)
+    
+    if app.config['METRICS_ENABLED']:
+        from app.utils.metrics import configure_metrics
+        configure_metrics(app)
+    
     try:
         db.init_app(app)
+        init_sqlite_pragmas(app)
         migrate.init_app(app, db)
         jwt.init_app(app)
         limiter.init_app(app)
         
-        # Add token blacklist check
+        # Add token revocation check
+        from app.services.revocation import create_revocation_store
+        app.extensions['revocation'] = create_revocation_store(app.config)
+        
         @jwt.token_in_blocklist_loader
         def check_if_token_is_revoked(jwt_header, jwt_payload: dict) -> bool:
-            from app.routes.user import token_blacklist
-            jti = jwt_payload['jti']
-            return jti in token_blacklist
+            return app.extensions['revocation'].is_revoked(jwt_payload['jti'], jwt_payload['exp'])
         
         # JWT error handlers
         @jwt.expired_token_loader
@@ -72,9 +88,13 @@ def create_app(config_name='default'):
         def revoked_token_callback(jwt_header, jwt_payload):
             return jsonify({'error': 'Token has been revoked'}), 401
         
-        # Test database connection
-        with app.app_context():
-            db.engine.connect()
+        if app.config['STARTUP_MODE'] == 'development':
+            # Test database connection
+            with app.app_context(), db.engine.connect():
+                pass
+        else:
+            from app.utils.database import init_connectivity_check
+            init_connectivity_check(app)
     except Exception as e:
         app.logger.error(f'Failed to initialize database: {str(e)}')
         raise
@@ -90,16 +110,61 @@ def create_app(config_name='default'):
     def health_check():
         return jsonify({'status': 'healthy', 'message': 'Service is running'}), 200
     
+    if app.config['METRICS_ENABLED']:
+        from app.utils.metrics import init_metrics
+        init_metrics(app)
+    
+    if app.config['SQL_INSTRUMENTATION']:
+        from app.utils.instrumentation import init_sql_instrumentation
+        init_sql_instrumentation(app)
+    
+    from app.utils.serialization import create_json_provider
+    app.json = create_json_provider(app)
+    
+    from app.services.sequences import SequenceAllocator
+    app.extensions['sequences'] = SequenceAllocator(block_size=app.config['SEQUENCE_BLOCK_SIZE'])
+    
+    from app.services.passwords import PasswordHasher
+    app.extensions['passwords'] = PasswordHasher(
+        method=app.config['PASSWORD_HASH_METHOD'],
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        max_pending=app.config['PASSWORD_HASH_MAX_PENDING']
+    )
+    
+    from app.services.lockout import LoginLockout
+    app.extensions['lockout'] = LoginLockout(
+        max_attempts=app.config['MAX_FAILED_LOGIN_ATTEMPTS'],
+        max_ip_attempts=app.config['MAX_FAILED_LOGIN_ATTEMPTS_PER_IP'],
+        window=app.config['ACCOUNT_LOCKOUT_DURATION']
+    )
+    
+    from app.utils.database import init_fork_safety
+    init_fork_safety(app)
+    
+    from app.services.permissions import PermissionCache
+    app.extensions['permissions'] = PermissionCache(ttl=app.config['PERMISSION_CACHE_TTL'])
+    
+    from app.services.idempotency import IdempotencyStore
+    app.extensions['idempotency'] = IdempotencyStore(
+        ttl=app.config['IDEMPOTENCY_KEY_TTL'],
+        maxsize=app.config['IDEMPOTENCY_CACHE_SIZE'],
+        lease=app.config['IDEMPOTENCY_LEASE']
+    )
+    
+    from app.cli import seed_command
+    app.cli.add_command(seed_command)
+    
     from app.routes import user_bp, account_bp, transaction_bp
     app.register_blueprint(user_bp, url_prefix='/users')
     app.register_blueprint(account_bp, url_prefix='/accounts')
     app.register_blueprint(transaction_bp, url_prefix='/transactions')
     
-    with app.app_context():
-        try:
-            db.create_all()
-        except Exception as e:
-            # If tables already exist, continue
-            app.logger.info(f'Database initialization: {str(e)}')
+    if app.config['STARTUP_MODE'] == 'development':
+        with app.app_context():
+            try:
+                db.create_all()
+            except Exception as e:
+                # If tables already exist, continue
+                app.logger.info(f'Database initialization: {str(e)}')
     
     return app
\ No newline at end of file
@@ -0,0 +1,234 @@
+import csv
+import random
+import time
+from datetime import datetime, timedelta, UTC
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert, select
+from app import db
+from app.models.account import Account
+from app.models.role import Role
+from app.models.transaction import Transaction
+from app.models.user import User
+
+# Share of seeded accounts per type
+ACCOUNT_TYPE_WEIGHTS = {'savings': 0.5, 'checking': 0.25, 'student': 0.15, 'business': 0.1}
+
+# Share of seeded transactions per type
+TRANSACTION_TYPE_WEIGHTS = {'transfer': 0.6, 'deposit': 0.25, 'withdraw': 0.15}
+
+
+def _next_id(conn, column):
+    return (conn.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def _chunks(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+def _report(label, count, started):
+    elapsed = time.perf_counter() - started
+    click.echo(f'{label:<14} {count:>12,} rows in {elapsed:7.1f}s ({count / max(elapsed, 1e-9):,.0f} rows/s)')
+
+
+def _assign_references(rows, sequences):
+    """Give each row a reference number for its own day, reserving each day's range at once"""
+    by_day = {}
+    for row in rows:
+        timestamp = row['timestamp']
+        by_day.setdefault((timestamp.year, timestamp.month, timestamp.day), []).append(row)
+    for (year, month, day), day_rows in by_day.items():
+        day = f'{year:04d}{month:02d}{day:02d}'
+        first, _ = sequences.reserve(f'reference:{day}', len(day_rows))
+        for sequence, row in enumerate(day_rows, first):
+            row['reference_number'] = f'TRX{day}{sequence:09d}'
+
+
+def _ensure_roles(conn):
+    """Create the default roles if they are missing and return their ids by name"""
+    existing = dict(conn.execute(select(Role.name, Role.id)).all())
+    for name, permissions in Role.DEFAULT_PERMISSIONS.items():
+        if name not in existing:
+            existing[name] = conn.execute(
+                insert(Role).values(name=name, permissions=permissions, version=1).returning(Role.id)
+            ).scalar_one()
+    conn.commit()
+    return existing
+
+
+@click.command('seed')
+@click.option('--users', default=10_000, show_default=True, help='Customers to create')
+@click.option('--accounts-per-user', default=2.0, show_default=True,
+              help='Average accounts per customer (types weighted by ACCOUNT_TYPE_WEIGHTS)')
+@click.option('--transactions', default=1_000_000, show_default=True, help='Transactions to create')
+@click.option('--hot-merchants', default=20, show_default=True,
+              help='Merchant business accounts that receive a large share of transfers')
+@click.option('--hot-share', default=0.3, show_default=True,
+              help='Fraction of transfers paid to a hot merchant')
+@click.option('--skew', default=3.0, show_default=True,
+              help='Activity skew across customer accounts (1 = uniform; higher = longer histories at the head)')
+@click.option('--history-days', default=730, show_default=True, help='Days of history to spread transactions over')
+@click.option('--chunk-size', default=10_000, show_default=True, help='Rows per INSERT batch and commit')
+@click.option('--password', default='password123', show_default=True, help='Password of every seeded user')
+@click.option('--skip-password-hashing', is_flag=True,
+              help='Hash the password once and reuse it for every user instead of hashing per user')
+@click.option('--admins', default=0, show_default=True, help='Admin users to create (no accounts)')
+@click.option('--user-pool', type=click.Path(dir_okay=False, writable=True),
+              help='Write username,role,account_id of every seeded user to this CSV (for load tests)')
+@click.option('--seed', 'random_seed', default=42, show_default=True, help='Random seed')
+@with_appcontext
+def seed_command(users, accounts_per_user, transactions, hot_merchants, hot_share, skew,
+                 history_days, chunk_size, password, skip_password_hashing, admins, user_pool,
+                 random_seed):
+    """Bulk-generate users, accounts and transactions for benchmarking
+
+    Rows are written with Core executemany INSERTs in chunks of --chunk-size,
+    with explicit primary keys so no ids need to be read back. Users are
+    named seed_user<n>, merchant<n> and seed_admin<n>. Account and reference
+    numbers come from the regular sequences, so the app keeps issuing unique
+    numbers afterwards.
+    """
+    rng = random.Random(random_seed)
+    now = datetime.now(UTC).replace(tzinfo=None)
+    hasher = current_app.extensions['passwords']
+    shared_hash = hasher.hash(password) if skip_password_hashing else None
+    sequences = current_app.extensions['sequences']
+    started_all = time.perf_counter()
+
+    with db.engine.connect() as conn:
+        if conn.dialect.name == 'sqlite':
+            # Throwaway data: trade durability for load speed on this connection,
+            # and keep the indexes being built in a 256 MB page cache
+            conn.exec_driver_sql('PRAGMA synchronous=OFF')
+            conn.exec_driver_sql('PRAGMA cache_size=-262144')
+        role_ids = _ensure_roles(conn)
+        first_user_id = _next_id(conn, User.id)
+        first_account_id = _next_id(conn, Account.id)
+        first_transaction_id = _next_id(conn, Transaction.id)
+        conn.commit()
+
+        # Users: customers, then merchants, then admins
+        total_users = users + hot_merchants + admins
+        pool = {}
+        started = time.perf_counter()
+        for start, size in _chunks(total_users, chunk_size):
+            rows = []
+            for offset in range(start, start + size):
+                user_id = first_user_id + offset
+                if offset < users:
+                    username, role, kind = f'seed_user{user_id}', Role.CUSTOMER, 'customer'
+                elif offset < users + hot_merchants:
+                    username, role, kind = f'merchant{user_id}', Role.CUSTOMER, 'merchant'
+                else:
+                    username, role, kind = f'seed_admin{user_id}', Role.ADMIN, 'admin'
+                pool[user_id] = (username, kind)
+                rows.append({
+                    'id': user_id,
+                    'username': username,
+                    'password_hash': shared_hash or hasher.hash(password),
+                    'name': username.replace('_', ' ').title(),
+                    'email': f'{username}@example.com',
+                    'role_id': role_ids[role],
+                    'created_at': now - timedelta(days=rng.randint(0, history_days)),
+                    'updated_at': now
+                })
+            conn.execute(insert(User), rows)
+            conn.commit()
+        _report('users', total_users, started)
+
+        # Accounts: a few per customer, one business account per merchant
+        account_types = list(ACCOUNT_TYPE_WEIGHTS)
+        type_weights = list(ACCOUNT_TYPE_WEIGHTS.values())
+        owners = []
+        for user_id in range(first_user_id, first_user_id + users):
+            count = max(1, round(rng.uniform(1, 2 * accounts_per_user - 1)))
+            owners.extend((user_id, account_type)
+                          for account_type in rng.choices(account_types, type_weights, k=count))
+        owners.extend((first_user_id + users + i, 'business') for i in range(hot_merchants))
+
+        started = time.perf_counter()
+        for start, size in _chunks(len(owners), chunk_size):
+            # Numbers are allocated on another connection, before this one writes
+            rows = []
+            for offset in range(start, start + size):
+                user_id, account_type = owners[offset]
+                min_balance = Account.ACCOUNT_TYPES[account_type]['min_balance']
+                rows.append({
+                    'id': first_account_id + offset,
+                    'account_number': Account.generate_account_number(account_type),
+                    'account_type': account_type,
+                    'balance': round(min_balance + rng.lognormvariate(15, 1.5), 2),
+                    'currency': 'IDR',
+                    'status': 'active',
+                    'user_id': user_id,
+                    'created_at': now - timedelta(days=history_days),
+                    'updated_at': now
+                })
+            conn.execute(insert(Account), rows)
+            conn.commit()
+        _report('accounts', len(owners), started)
+
+        # Transactions, oldest first, touching customer accounts with a
+        # power-law skew and paying the hot merchants a fixed share
+        customer_accounts = len(owners) - hot_merchants
+        merchant_ids = [first_account_id + customer_accounts + i for i in range(hot_merchants)]
+        transaction_types = list(TRANSACTION_TYPE_WEIGHTS)
+        transaction_weights = list(TRANSACTION_TYPE_WEIGHTS.values())
+        span = timedelta(days=history_days).total_seconds()
+        started = time.perf_counter()
+
+        def customer_account():
+            return first_account_id + int(customer_accounts * rng.random() ** skew)
+
+        for start, size in _chunks(transactions, chunk_size):
+            rows = []
+            for offset in range(start, start + size):
+                transaction_type = rng.choices(transaction_types, transaction_weights)[0]
+                account_id, recipient_id = customer_account(), None
+                if transaction_type == 'transfer':
+                    if merchant_ids and rng.random() < hot_share:
+                        recipient_id = rng.choice(merchant_ids)
+                    else:
+                        recipient_id = customer_account()
+                        if recipient_id == account_id:
+                            recipient_id = first_account_id + (account_id - first_account_id + 1) % customer_accounts
+                amount = round(rng.lognormvariate(11, 1.5), 2)
+                timestamp = now - timedelta(
+                    seconds=span * (transactions - offset) / transactions + rng.random())
+                rows.append({
+                    'id': first_transaction_id + offset,
+                    'amount': amount,
+                    'type': transaction_type,
+                    'timestamp': timestamp,
+                    'account_id': account_id,
+                    'recipient_account_id': recipient_id,
+                    'description': f'Seeded {transaction_type}',
+                    'status': (Transaction.STATUS_PENDING_APPROVAL
+                               if transaction_type == 'transfer' and Transaction.requires_approval(amount)
+                               else Transaction.STATUS_COMPLETED)
+                })
+            _assign_references(rows, sequences)
+            conn.execute(insert(Transaction), rows)
+            conn.commit()
+        _report('transactions', transactions, started)
+
+        if conn.dialect.name == 'sqlite':
+            conn.exec_driver_sql('ANALYZE')
+            conn.commit()
+
+    if user_pool:
+        # First account of each user, in seeding order
+        first_accounts = {}
+        for offset, (user_id, _) in enumerate(owners):
+            first_accounts.setdefault(user_id, first_account_id + offset)
+        with open(user_pool, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('username', 'role', 'account_id'))
+            for user_id, (username, kind) in pool.items():
+                writer.writerow((username, kind, first_accounts.get(user_id, '')))
+        click.echo(f'User pool written to {user_pool}')
+
+    click.echo(f'Seeded {current_app.config["SQLALCHEMY_DATABASE_URI"]} '
+               f'in {time.perf_counter() - started_all:.1f}s')
@@ -1,3 +1,7 @@
 from .user import User
 from .account import Account
 from .transaction import Transaction
+from .idempotency_key import IdempotencyKey
+from .sequence_counter import SequenceCounter
+from .revoked_token import RevokedToken
+from .login_failure import LoginFailure
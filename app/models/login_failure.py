@@ -0,0 +1,16 @@
+from app import db
+
+class LoginFailure(db.Model):
+    """One failed login, counted against the username and the client address
+
+    `key` is "user:<username>" or "ip:<address>". Rows older than the lockout
+    window no longer count and are purged periodically.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(200), nullable=False)
+    failed_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_login_failure_key_failed_at', 'key', 'failed_at'),
+        db.Index('ix_login_failure_failed_at', 'failed_at'),
+    )
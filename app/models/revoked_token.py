@@ -0,0 +1,7 @@
+from app import db
+
+class RevokedToken(db.Model):
+    """JWT revoked before its expiry (e.g. on logout)"""
+    jti = db.Column(db.String(64), primary_key=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, index=True)  # Lets other hosts pick up new revocations
@@ -6,6 +6,9 @@ class Role(db.Model):
     name = db.Column(db.String(50), unique=True, nullable=False)
     description = db.Column(db.String(200))
     permissions = db.Column(db.JSON, nullable=False, default=list)  # List of permission strings
+    version = db.Column(db.Integer, nullable=False, server_default='1')  # Bumped on every update; keys the permission cache
+
+    __mapper_args__ = {'version_id_col': version}
 
     # Define standard roles and their permissions
     CUSTOMER = 'customer'
@@ -0,0 +1,6 @@
+from app import db
+
+class SequenceCounter(db.Model):
+    """High-water mark of a named sequence handed out in blocks"""
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False)
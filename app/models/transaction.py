@@ -12,6 +12,15 @@ class Transaction(db.Model):
     reference_number = db.Column(db.String(20), unique=True, nullable=False)
     status = db.Column(db.String(20), default='completed')  # completed, pending, failed
 
+    # Composite indexes backing the history listings, which filter on one
+    # side of the transfer (or the status) and order by timestamp
+    __table_args__ = (
+        db.Index('ix_transaction_account_id_timestamp', 'account_id', 'timestamp'),
+        db.Index('ix_transaction_recipient_account_id_timestamp', 'recipient_account_id', 'timestamp'),
+        db.Index('ix_transaction_status_timestamp', 'status', 'timestamp'),
+        db.Index('ix_transaction_timestamp_id', 'timestamp', 'id'),
+    )
+
     # Valid transaction types
     TRANSACTION_TYPES = ['deposit', 'withdraw', 'transfer']
     
@@ -38,12 +47,16 @@ class Transaction(db.Model):
     
     @staticmethod
     def generate_reference_number():
-        """Generate a unique reference number for the transaction"""
-        import random
-        import string
-        prefix = datetime.now().strftime('%Y%m%d')
-        suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-        return f'TRX{prefix}{suffix}'
+        """Generate a unique reference number: TRX{YYYYMMDD}{9-digit sequence}
+
+        The sequence restarts every (UTC) day and is handed out from blocks
+        reserved per worker, so no database round trip is needed per call and
+        two workers can never issue the same number.
+        """
+        from flask import current_app
+        today = datetime.now(UTC).strftime('%Y%m%d')
+        sequence = current_app.extensions['sequences'].next_value(f'reference:{today}')
+        return f'TRX{today}{sequence:09d}'
 
     def to_dict(self):
         data = {
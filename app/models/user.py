@@ -1,5 +1,5 @@
+from flask import current_app
 from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, UTC
 from .role import Role
 
@@ -16,10 +16,10 @@ class User(db.Model):
     role = db.relationship('Role', backref=db.backref('users', lazy=True))
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = current_app.extensions['passwords'].hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return current_app.extensions['passwords'].verify(self.password_hash, password)
 
     def has_permission(self, permission):
         """Check if user has a specific permission"""
@@ -2,65 +2,104 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.account import Account
 from app.models.user import User
+from app.services import ownership
+from app.utils.decorators import conditional, read_budget
+from app.utils.serialization import ACCOUNT_COLUMNS, ACCOUNT_TYPE_FRAGMENTS, account_rows_to_dicts
 from app import db
 
 account_bp = Blueprint('account', __name__)
 
-@account_bp.route('/types', methods=['GET'])
-def get_account_types():
-    """Get all available account types and their details"""
-    return jsonify({
-        'account_types': {
-            type_name: {
-                'minimum_balance': details['min_balance'],
-                'description': details['description']
-            }
-            for type_name, details in Account.ACCOUNT_TYPES.items()
-        }
-    })
+ACCOUNT_STATUSES = ['active', 'inactive', 'frozen']
 
-@account_bp.route('', methods=['GET'])
-@jwt_required()
-def get_accounts():
-    """Get all accounts for the authenticated user"""
-    user_id = get_jwt_identity()
+# Account types never change at runtime, so neither does their ETag
+_ACCOUNT_TYPES_TAG = repr(sorted(ACCOUNT_TYPE_FRAGMENTS.items()))
+
+def _account_list_criteria(user_id):
+    """Build the WHERE criteria for the account listing from request args
     
-    # Get query parameters for filtering
+    Returns:
+        tuple of (criteria, error). error is a (response, status) tuple to
+        return as-is when a filter is invalid.
+    """
     account_type = request.args.get('type')
     status = request.args.get('status', 'active')
-    
-    # Build query
-    # Build base query with user_id filter
-    query = Account.query.filter(Account.user_id == user_id)
+    criteria = [Account.user_id == user_id]
     
     # Validate and apply account type filter
     if account_type:
         if account_type not in Account.ACCOUNT_TYPES:
-            return jsonify({
+            return None, (jsonify({
                 'error': 'Invalid account type',
                 'available_types': list(Account.ACCOUNT_TYPES.keys())
-            }), 400
-        query = query.filter(Account.account_type == account_type)
+            }), 400)
+        criteria.append(Account.account_type == account_type)
     
     # Validate and apply status filter
     if status:
-        if status not in ['active', 'inactive', 'frozen']:
-            return jsonify({
+        if status not in ACCOUNT_STATUSES:
+            return None, (jsonify({
                 'error': 'Invalid status. Must be one of: active, inactive, frozen'
-            }), 400
-        query = query.filter(Account.status == status)
+            }), 400)
+        criteria.append(Account.status == status)
     
-    accounts = query.all()
+    return criteria, None
+
+def _accounts_version():
+    """(count, newest updated_at) of the listed accounts, from one aggregate query
+    
+    Any balance or status change bumps updated_at, and an account leaving the
+    listing changes the count, so the pair identifies the listing's content.
+    """
+    criteria, error = _account_list_criteria(get_jwt_identity())
+    if error:
+        return None
+    count, last_modified = db.session.query(
+        db.func.count(Account.id), db.func.max(Account.updated_at)
+    ).filter(*criteria).one()
+    return (count, last_modified), last_modified
+
+def _account_version(id):
+    """updated_at of one owned account, without loading the row"""
+    row = ownership.owned_account(get_jwt_identity(), id).with_entities(Account.updated_at).first()
+    if row is None:
+        return None
+    return row.updated_at, row.updated_at
+
+@account_bp.route('/types', methods=['GET'])
+@conditional(lambda: (_ACCOUNT_TYPES_TAG, None), public=True)
+def get_account_types():
+    """Get all available account types and their details"""
+    return jsonify({'account_types': ACCOUNT_TYPE_FRAGMENTS})
+
+@account_bp.route('', methods=['GET'])
+@jwt_required()
+@read_budget()
+@conditional(_accounts_version)
+def get_accounts():
+    """Get all accounts for the authenticated user
+    
+    Supports ETag / Last-Modified: an unchanged listing is answered with 304.
+    """
+    criteria, error = _account_list_criteria(get_jwt_identity())
+    if error:
+        return error
+    
+    query = db.session.query(*ACCOUNT_COLUMNS).filter(*criteria)
     return jsonify({
-        'accounts': [account.to_dict() for account in accounts]
+        'accounts': account_rows_to_dicts(query.all())
     })
 
 @account_bp.route('/<int:id>', methods=['GET'])
 @jwt_required()
+@read_budget()
+@conditional(_account_version)
 def get_account(id):
-    """Get a specific account by ID"""
+    """Get a specific account by ID
+    
+    Supports ETag / Last-Modified: an unchanged account is answered with 304.
+    """
     user_id = get_jwt_identity()
-    account = Account.query.filter_by(id=id, user_id=user_id).first_or_404()
+    account = ownership.owned_account(user_id, id).first_or_404()
     return jsonify(account.to_dict())
 
 @account_bp.route('', methods=['POST'])
@@ -126,7 +165,7 @@ def create_account():
 def manage_account(id):
     """Update or delete a specific account"""
     user_id = get_jwt_identity()
-    account = Account.query.filter_by(id=id, user_id=user_id).first_or_404()
+    account = ownership.owned_account(user_id, id).first_or_404()
     
     if request.method == 'DELETE':
         if account.balance > 0:
@@ -149,7 +188,7 @@ def manage_account(id):
         
     # Only allow updating status
     if 'status' in data:
-        if data['status'] not in ['active', 'inactive', 'frozen']:
+        if data['status'] not in ACCOUNT_STATUSES:
             return jsonify({
                 'error': 'Invalid status. Must be one of: active, inactive, frozen'
             }), 400
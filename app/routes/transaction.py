@@ -1,34 +1,193 @@
-from flask import Blueprint, request, jsonify
+import csv
+import io
+import math
+from flask import Blueprint, Response, abort, current_app, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.transaction import Transaction
 from app.models.account import Account
 from app.models.role import Role
-from app.utils.decorators import require_permissions, require_role
+from app.utils.decorators import idempotent, read_budget, require_permissions, require_role
+from app.utils.pagination import include_total, keyset_paginate, ordered_union, page_size
+from app.utils.serialization import (
+    TRANSACTION_COLUMNS, transaction_rows_to_dicts, transaction_rows_to_full_dicts
+)
+from app.services import balance, ownership
+from app.services.ratelimit import export_cost, rows_cost
+from app.services.balance import InsufficientFundsError
 from app import db, limiter
 from datetime import datetime, UTC
+from sqlalchemy import insert, select, update
 
 transaction_bp = Blueprint('transaction', __name__)
 
+# Columns streamed by the export, in output order
+EXPORT_COLUMNS = (
+    Transaction.id,
+    Transaction.reference_number,
+    Transaction.type,
+    Transaction.amount,
+    Transaction.timestamp,
+    Transaction.status,
+    Transaction.description,
+    Transaction.account_id,
+    Transaction.recipient_account_id
+)
+EXPORT_FIELDS = tuple(column.key for column in EXPORT_COLUMNS)
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+_EXPORT_TIMESTAMP_INDEX = EXPORT_FIELDS.index('timestamp')
+_EXPORT_DESCRIPTION_INDEX = EXPORT_FIELDS.index('description')
+# Leading characters that make spreadsheet applications evaluate a cell as a formula
+_CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _export_values(row):
+    """Convert an export result tuple into CSV-ready values
+
+    The description is the only free-text column. One starting like a formula
+    is prefixed with a quote, so opening the export in a spreadsheet shows
+    the text instead of running it.
+    """
+    values = list(row)
+    timestamp = values[_EXPORT_TIMESTAMP_INDEX]
+    values[_EXPORT_TIMESTAMP_INDEX] = timestamp.isoformat() if timestamp else None
+    description = values[_EXPORT_DESCRIPTION_INDEX]
+    if description and description.startswith(_CSV_FORMULA_PREFIXES):
+        values[_EXPORT_DESCRIPTION_INDEX] = "'" + description
+    return values
+
+def _cursor_pagination(query, limit, branches=None):
+    """Paginate `query` by (timestamp, id) cursor instead of page offset
+
+    Args:
+        query: every row to list, used as is for the total count
+        limit (int): page size
+        branches (list, optional): disjoint queries that together return the
+            rows of `query`, read with ordered_union() instead of it
+
+    Returns:
+        tuple of (items, pagination metadata)
+    """
+    items, next_cursor = keyset_paginate(
+        branches if branches is not None else [query], Transaction.timestamp, Transaction.id,
+        request.args.get('cursor'), limit)
+    pagination = {
+        'limit': limit,
+        'has_next': next_cursor is not None,
+        'next_cursor': next_cursor
+    }
+    if include_total(request.args):
+        pagination['total_items'] = query.order_by(None).count()
+    return items, pagination
+
+def _page_pagination(query, page, limit, branches=None):
+    """Paginate `query` by page number
+
+    The total count is only computed when requested; one extra row is
+    fetched to tell whether a next page exists.
+
+    Args:
+        query: every row to list, used as is for the total count
+        page (int): page number
+        limit (int): page size
+        branches (list, optional): disjoint queries that together return the
+            rows of `query`, read with ordered_union() instead of it
+
+    Returns:
+        tuple of (items, pagination metadata)
+    """
+    pagination = {'current_page': page, 'limit': limit}
+
+    if include_total(request.args):
+        total = query.order_by(None).count()
+        pagination['total_items'] = total
+        pagination['total_pages'] = math.ceil(total / limit)
+
+    items = ordered_union(branches if branches is not None else [query],
+                          Transaction.timestamp, Transaction.id,
+                          limit + 1, offset=(page - 1) * limit)
+    has_next = len(items) > limit
+    items = items[:limit]
+
+    pagination.update({
+        'has_next': has_next,
+        'has_prev': page > 1,
+        'next_page': page + 1 if has_next else None,
+        'prev_page': page - 1 if page > 1 else None
+    })
+    return items, pagination
+
+def _history_criteria(user_id):
+    """Build the WHERE criteria for a user's transaction history from request args
+    
+    Handles the account_id, type, start_date and end_date filters shared by
+    the history listing and the export. The ownership criterion is left to
+    the caller: ownership.history_criterion() or history_branches().
+    
+    Returns:
+        tuple of (account_id, criteria, error). account_id is the checked
+        account filter or None; error is a (response, status) tuple to
+        return as-is when a filter is invalid.
+    """
+    account_id = request.args.get('account_id')
+    transaction_type = request.args.get('type')
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    
+    # Apply filters
+    if account_id:
+        try:
+            account_id = int(account_id)
+        except ValueError:
+            return None, None, (jsonify({'error': 'Invalid account ID format'}), 400)
+        if not ownership.owns_account(user_id, account_id):
+            return None, None, (jsonify({'error': 'Account not found'}), 404)
+    else:
+        account_id = None
+    
+    criteria = []
+    
+    if transaction_type:
+        if transaction_type not in Transaction.TRANSACTION_TYPES:
+            return None, None, (jsonify({
+                'error': 'Invalid transaction type',
+                'valid_types': Transaction.TRANSACTION_TYPES
+            }), 400)
+        criteria.append(Transaction.type == transaction_type)
+    
+    if start_date:
+        try:
+            criteria.append(Transaction.timestamp >= datetime.fromisoformat(start_date))
+        except ValueError:
+            return None, None, (jsonify({'error': 'Invalid start_date format. Use ISO format'}), 400)
+    
+    if end_date:
+        try:
+            criteria.append(Transaction.timestamp <= datetime.fromisoformat(end_date))
+        except ValueError:
+            return None, None, (jsonify({'error': 'Invalid end_date format. Use ISO format'}), 400)
+    
+    return account_id, criteria, None
+
 @transaction_bp.route('/admin/all', methods=['GET'])
 @jwt_required()
 @require_permissions(Role.PERMISSIONS['transaction']['view_all'])
 @limiter.limit("30 per minute")
+@read_budget(rows_cost)
 def get_all_transactions():
     """Get all transactions (admin only) with optimized querying"""
     page = request.args.get('page', 1, type=int)
-    limit = request.args.get('limit', 20, type=int)
+    limit = page_size(request.args)
     
     # Validate pagination parameters
     if page < 1:
         return jsonify({'error': 'Page must be greater than 0'}), 400
-    if not 1 <= limit <= 100:
+    if limit is None:
         return jsonify({'error': 'Limit must be between 1 and 100'}), 400
 
-    # Build optimized query with eager loading
-    query = Transaction.query.options(
-        db.joinedload(Transaction.source_account),
-        db.joinedload(Transaction.recipient_account)
-    )
+    # Plain column tuples: the listing never touches the related accounts
+    query = db.session.query(*TRANSACTION_COLUMNS)
     
     # Apply filters if provided with validation
     if account_id := request.args.get('account_id'):
@@ -58,36 +217,21 @@ def get_all_transactions():
             return jsonify({'error': 'Invalid end_date format. Use ISO format'}), 400
             
     if status := request.args.get('status'):
-        if status not in Transaction.STATUS_CHOICES:
+        if status not in Transaction.STATUSES:
             return jsonify({'error': 'Invalid status'}), 400
         query = query.filter(Transaction.status == status)
 
-    # Get paginated results
-    pagination = query.order_by(Transaction.timestamp.desc()).paginate(
-        page=page, per_page=limit, error_out=False)
+    try:
+        if 'cursor' in request.args:
+            items, pagination = _cursor_pagination(query, limit)
+        else:
+            items, pagination = _page_pagination(query, page, limit)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
 
     return jsonify({
-        'transactions': [{
-            'id': t.id,
-            'type': t.type,
-            'amount': t.amount,
-            'description': t.description,
-            'reference_number': t.reference_number,
-            'account_id': t.account_id,
-            'recipient_account_id': t.recipient_account_id,
-            'timestamp': t.timestamp,
-            'status': t.status
-        } for t in pagination.items],
-        'pagination': {
-            'total_items': pagination.total,
-            'total_pages': pagination.pages,
-            'current_page': page,
-            'limit': limit,
-            'has_next': pagination.has_next,
-            'has_prev': pagination.has_prev,
-            'next_page': page + 1 if pagination.has_next else None,
-            'prev_page': page - 1 if pagination.has_prev else None
-        }
+        'transactions': transaction_rows_to_full_dicts(items),
+        'pagination': pagination
     })
 
 @transaction_bp.route('/admin/approve/<int:transaction_id>', methods=['POST'])
@@ -101,24 +245,35 @@ def approve_transaction(transaction_id):
     if transaction.status != 'pending_approval':
         return jsonify({'error': 'Transaction is not pending approval'}), 400
 
-    # Get source and destination accounts
-    source_account = Account.query.get_or_404(transaction.account_id)
-    if transaction.recipient_account_id:
-        dest_account = Account.query.get_or_404(transaction.recipient_account_id)
-
     try:
-        # For transfers, update both accounts
-        if transaction.type == 'transfer':
-            source_account.balance -= transaction.amount
-            dest_account.balance += transaction.amount
-        # For withdrawals, just update source account
-        elif transaction.type == 'withdraw':
-            source_account.balance -= transaction.amount
-        # For deposits, just update destination account
-        elif transaction.type == 'deposit':
-            source_account.balance += transaction.amount
-
-        transaction.status = 'completed'
+        # Claim the transaction atomically so concurrent approvals apply it once
+        claimed = db.session.execute(
+            update(Transaction)
+            .where(Transaction.id == transaction.id,
+                   Transaction.status == Transaction.STATUS_PENDING_APPROVAL)
+            .values(status=Transaction.STATUS_COMPLETED)
+        ).rowcount
+        if not claimed:
+            db.session.rollback()
+            return jsonify({'error': 'Transaction is not pending approval'}), 400
+
+        # For transfers, update both accounts. The source may have been drained
+        # since the request was made: the minimum balance is checked again, and
+        # the rollback leaves the transaction pending
+        try:
+            if transaction.type == 'transfer':
+                balance.debit(transaction.account_id, transaction.amount)
+                balance.credit(transaction.recipient_account_id, transaction.amount)
+            # For withdrawals, just update source account
+            elif transaction.type == 'withdraw':
+                balance.debit(transaction.account_id, transaction.amount)
+            # For deposits, just update destination account
+            elif transaction.type == 'deposit':
+                balance.credit(transaction.account_id, transaction.amount)
+        except InsufficientFundsError:
+            db.session.rollback()
+            return jsonify({'error': 'Insufficient funds'}), 400
+
         db.session.commit()
 
         return jsonify({
@@ -140,12 +295,17 @@ def approve_transaction(transaction_id):
 @jwt_required()
 @require_permissions(Role.PERMISSIONS['transaction']['view_own'])
 @limiter.limit("30 per minute")
+@read_budget(rows_cost)
 def get_transactions():
     """Get all transactions for the user's accounts with pagination support
     
     Query Parameters:
         page (int): Page number (default: 1)
         limit (int): Items per page (default: 20, max: 100)
+        cursor (str, optional): Opaque cursor from `next_cursor`; pass an empty
+            value to start cursor pagination. Takes precedence over `page`.
+        include_total (bool, optional): Compute total_items/total_pages
+            (default: true for page mode, false for cursor mode)
         account_id (int, optional): Filter by account ID
         type (str, optional): Filter by transaction type (deposit, withdraw, transfer)
         start_date (str, optional): Filter by start date (ISO format)
@@ -154,105 +314,133 @@ def get_transactions():
     Returns:
         JSON response with:
         - List of transactions for the current page
-        - Pagination metadata (total_items, total_pages, current_page, etc.)
+        - Pagination metadata (total_items, total_pages, current_page, etc.,
+          or next_cursor in cursor mode)
     """
     user_id = get_jwt_identity()
-    account_id = request.args.get('account_id')
-    transaction_type = request.args.get('type')
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
     page = request.args.get('page', 1, type=int)
-    limit = request.args.get('limit', 20, type=int)
+    limit = page_size(request.args)
     
     # Validate pagination parameters
     if page < 1:
         return jsonify({'error': 'Page number must be greater than 0'}), 400
-    if limit < 1 or limit > 100:
+    if limit is None:
         return jsonify({'error': 'Limit must be between 1 and 100'}), 400
     
-    # Get user's accounts
-    accounts = Account.query.filter_by(user_id=user_id).all()
-    account_ids = [account.id for account in accounts]
-    
-    # Build base query for both sent and received transactions
-    sent_query = Transaction.query.filter(Transaction.account_id.in_(account_ids))
-    received_query = Transaction.query.filter(Transaction.recipient_account_id.in_(account_ids))
+    account_id, criteria, error = _history_criteria(user_id)
+    if error:
+        return error
+    filtered_query = db.session.query(*TRANSACTION_COLUMNS).filter(*criteria)
+    all_transactions_query = filtered_query.filter(ownership.history_criterion(user_id, account_id))
+    # Pages are read per account and direction, each off its own index
+    branches = [filtered_query.filter(*branch)
+                for branch in ownership.history_branches(user_id, account_id)]
     
-    # Apply filters
-    if account_id:
-        account_id = int(account_id)
-        if account_id not in account_ids:
-            return jsonify({'error': 'Account not found'}), 404
-        sent_query = sent_query.filter_by(account_id=account_id)
-        received_query = received_query.filter_by(recipient_account_id=account_id)
+    # Apply pagination
+    try:
+        if 'cursor' in request.args:
+            items, pagination = _cursor_pagination(all_transactions_query, limit, branches)
+        else:
+            items, pagination = _page_pagination(all_transactions_query, page, limit, branches)
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
     
-    if transaction_type:
-        if transaction_type not in Transaction.TRANSACTION_TYPES:
-            return jsonify({
-                'error': 'Invalid transaction type',
-                'valid_types': Transaction.TRANSACTION_TYPES
-            }), 400
-        sent_query = sent_query.filter_by(type=transaction_type)
-        received_query = received_query.filter_by(type=transaction_type)
+    return jsonify({
+        'transactions': transaction_rows_to_dicts(items),
+        'pagination': pagination
+    })
+
+@transaction_bp.route('/export', methods=['GET'])
+@jwt_required()
+@require_permissions(Role.PERMISSIONS['transaction']['view_own'])
+@limiter.limit("5 per minute")
+@read_budget(export_cost)
+def export_transactions():
+    """Stream the user's full transaction history as CSV or NDJSON
     
-    if start_date:
-        try:
-            start_date = datetime.fromisoformat(start_date)
-            sent_query = sent_query.filter(Transaction.timestamp >= start_date)
-            received_query = received_query.filter(Transaction.timestamp >= start_date)
-        except ValueError:
-            return jsonify({'error': 'Invalid start_date format. Use ISO format'}), 400
+    Query Parameters:
+        format (str): csv (default) or ndjson
+        account_id, type, start_date, end_date: same filters as GET /transactions
     
-    if end_date:
-        try:
-            end_date = datetime.fromisoformat(end_date)
-            sent_query = sent_query.filter(Transaction.timestamp <= end_date)
-            received_query = received_query.filter(Transaction.timestamp <= end_date)
-        except ValueError:
-            return jsonify({'error': 'Invalid end_date format. Use ISO format'}), 400
+    Rows are read from a server-side cursor in batches of EXPORT_BATCH_SIZE as
+    plain column tuples and written to the response as they arrive, so memory
+    use does not grow with the size of the history.
+    """
+    user_id = get_jwt_identity()
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({
+            'error': 'Invalid export format',
+            'valid_formats': list(EXPORT_FORMATS)
+        }), 400
     
-    # Combine queries using union
-    all_transactions_query = sent_query.union(received_query).order_by(Transaction.timestamp.desc())
+    account_id, criteria, error = _history_criteria(user_id)
+    if error:
+        return error
     
-    # Apply pagination
-    paginated_transactions = all_transactions_query.paginate(page=page, per_page=limit, error_out=False)
+    statement = (
+        select(*EXPORT_COLUMNS)
+        .where(ownership.history_criterion(user_id, account_id), *criteria)
+        .order_by(Transaction.timestamp.desc(), Transaction.id.desc())
+        .execution_options(yield_per=current_app.config['EXPORT_BATCH_SIZE'])
+    )
     
-    return jsonify({
-        'transactions': [t.to_dict() for t in paginated_transactions.items],
-        'pagination': {
-            'total_items': paginated_transactions.total,
-            'total_pages': paginated_transactions.pages,
-            'current_page': page,
-            'limit': limit,
-            'has_next': paginated_transactions.has_next,
-            'has_prev': paginated_transactions.has_prev,
-            'next_page': paginated_transactions.next_num if paginated_transactions.has_next else None,
-            'prev_page': paginated_transactions.prev_num if paginated_transactions.has_prev else None
-        }
-    })
+    dumps = current_app.json.dumps
+
+    def generate():
+        result = db.session.execute(statement)
+        try:
+            if export_format == 'csv':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(EXPORT_FIELDS)
+                for rows in result.partitions():
+                    writer.writerows(_export_values(row) for row in rows)
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+                yield buffer.getvalue()
+            else:
+                for rows in result.partitions():
+                    yield ''.join(
+                        dumps(dict(zip(EXPORT_FIELDS, row))) + '\n'
+                        for row in rows
+                    )
+        finally:
+            result.close()
+    
+    filename = f"transactions-{datetime.now(UTC).strftime('%Y%m%d%H%M%S')}.{export_format}"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
 
 @transaction_bp.route('/<int:transaction_id>', methods=['GET'])
 @jwt_required()
 @require_permissions(Role.PERMISSIONS['transaction']['view_own'])
+@read_budget()
 def get_transaction(transaction_id):
-    """Get a specific transaction"""
-    user_id = get_jwt_identity()
-    accounts = Account.query.filter_by(user_id=user_id).all()
-    account_ids = [account.id for account in accounts]
-    
-    transaction = Transaction.query.filter_by(id=id).first_or_404()
+    """Get a specific transaction
     
-    # Check if user has access to this transaction
-    if transaction.account_id not in account_ids and \
-       (transaction.recipient_account_id is None or transaction.recipient_account_id not in account_ids):
+    The lookup and the ownership check are a single statement; a transaction
+    that exists but belongs to someone else is reported as not found.
+    """
+    user_id = get_jwt_identity()
+    row = db.session.query(*TRANSACTION_COLUMNS).filter(
+        Transaction.id == transaction_id,
+        ownership.transaction_visible_to(user_id)
+    ).first()
+    if row is None:
         return jsonify({'error': 'Transaction not found'}), 404
     
-    return jsonify(transaction.to_dict())
+    return jsonify(transaction_rows_to_dicts([row])[0])
 
 @transaction_bp.route('/deposit', methods=['POST'])
 @jwt_required()
 @require_permissions(Role.PERMISSIONS['transaction']['create'])
 @limiter.limit("20 per minute")
+@idempotent
 def deposit():
     """Deposit money into an account with ACID guarantees"""
     user_id = get_jwt_identity()
@@ -271,17 +459,11 @@ def deposit():
         return jsonify({'error': 'Invalid amount'}), 400
     
     # Verify account ownership and status
-    account = Account.query.filter_by(id=data['account_id'], user_id=user_id).first_or_404()
+    account = ownership.owned_account(user_id, data['account_id']).first_or_404()
     if account.status != 'active':
         return jsonify({'error': f'Account is {account.status}'}), 400
     
     try:
-        # Start a transaction block
-        db.session.begin_nested()
-        
-        # Lock the account for update
-        account = db.session.get(Account, account.id, with_for_update=True)
-        
         # Create transaction record
         transaction = Transaction(
             type='deposit',
@@ -292,8 +474,8 @@ def deposit():
             status='completed'
         )
         
-        # Update balance
-        account.balance += amount
+        # Update balance in a single statement
+        balance.credit(account.id, amount)
         
         # Save changes
         db.session.add(transaction)
@@ -311,6 +493,7 @@ def deposit():
 @transaction_bp.route('/withdraw', methods=['POST'])
 @jwt_required()
 @limiter.limit("20 per minute")
+@idempotent
 def withdraw():
     """Withdraw money from an account with ACID guarantees"""
     user_id = get_jwt_identity()
@@ -329,25 +512,11 @@ def withdraw():
         return jsonify({'error': 'Invalid amount'}), 400
     
     # Verify account ownership and status
-    account = Account.query.filter_by(id=data['account_id'], user_id=user_id).first_or_404()
+    account = ownership.owned_account(user_id, data['account_id']).first_or_404()
     if account.status != 'active':
         return jsonify({'error': f'Account is {account.status}'}), 400
     
     try:
-        # Start a transaction block
-        db.session.begin_nested()
-        
-        # Lock the account for update
-        account = db.session.get(Account, account.id, with_for_update=True)
-        
-        # Check sufficient balance
-        if account.balance - amount < account.minimum_balance:
-            return jsonify({
-                'error': 'Insufficient funds',
-                'current_balance': account.balance,
-                'minimum_balance': account.minimum_balance
-            }), 400
-        
         # Create transaction record
         transaction = Transaction(
             type='withdraw',
@@ -358,8 +527,16 @@ def withdraw():
             status='completed'
         )
         
-        # Update balance
-        account.balance -= amount
+        # Check sufficient balance and update it in a single statement
+        try:
+            balance.debit(account.id, amount)
+        except InsufficientFundsError:
+            db.session.rollback()
+            return jsonify({
+                'error': 'Insufficient funds',
+                'current_balance': account.balance,
+                'minimum_balance': account.minimum_balance
+            }), 400
         
         # Save changes
         db.session.add(transaction)
@@ -377,12 +554,14 @@ def withdraw():
 @transaction_bp.route('/transfer', methods=['POST'])
 @jwt_required()
 @limiter.limit("20 per minute")
+@idempotent
 def transfer():
     """Transfer money between accounts with ACID guarantees
     
     Requires:
     - from_account_id: source account ID
-    - to_account_id: destination account ID
+    - to_account_id: destination account ID, or
+      to_account_number: destination account number (check digit is verified)
     - amount: amount to transfer
     - description (optional): transaction description
     
@@ -400,7 +579,8 @@ def transfer():
     
     # Validate required fields
     required_fields = ['from_account_id', 'to_account_id', 'amount']
-    if not all(field in data for field in required_fields):
+    if not all(field in data for field in ['from_account_id', 'amount']) or \
+       not ('to_account_id' in data or 'to_account_number' in data):
         return jsonify({'error': f'Missing required fields: {required_fields}'}), 400
     
     # Validate amount
@@ -411,13 +591,28 @@ def transfer():
     except ValueError:
         return jsonify({'error': 'Invalid amount'}), 400
     
+    # Reject malformed account numbers before querying
+    to_account_number = data.get('to_account_number')
+    if 'to_account_id' not in data and not Account.is_well_formed_account_number(to_account_number):
+        return jsonify({'error': 'Invalid account number'}), 400
+    
     # Verify source account ownership
     from_account_id = data['from_account_id']
-    source_account = Account.query.filter_by(id=from_account_id, user_id=user_id).first_or_404()
+    source_account = ownership.owned_account(user_id, from_account_id).first_or_404()
     
     # Verify recipient account exists
-    to_account_id = data['to_account_id']
-    recipient_account = Account.query.filter_by(id=to_account_id).first_or_404()
+    if 'to_account_id' in data:
+        recipient_account = Account.query.filter_by(id=data['to_account_id']).first_or_404()
+    else:
+        recipient_account = Account.query.filter_by(account_number=to_account_number).first()
+        if recipient_account is None:
+            # Legacy numbers have no check digit, so it only tells a typo from an unknown account
+            if not Account.is_valid_account_number(to_account_number):
+                return jsonify({'error': 'Invalid account number'}), 400
+            abort(404)
+    
+    if recipient_account.id == source_account.id:
+        return jsonify({'error': 'Cannot transfer to the same account'}), 400
     
     # Validate account statuses
     if source_account.status != 'active':
@@ -425,79 +620,215 @@ def transfer():
     if recipient_account.status != 'active':
         return jsonify({'error': f'Recipient account is {recipient_account.status}'}), 400
     
-    # Check sufficient balance (only for immediate transfers)
     requires_approval = Transaction.requires_approval(amount)
-    if not requires_approval and source_account.balance - amount < source_account.minimum_balance:
-        return jsonify({
-            'error': 'Insufficient funds',
-            'current_balance': source_account.balance,
-            'minimum_balance': source_account.minimum_balance
-        }), 400
     
     try:
-        # Start a transaction block
-        db.session.begin_nested()
-        try:
-            # Create the transaction record
-            transaction = Transaction(
-                type='transfer',
-                amount=amount,
-                account_id=from_account_id,
-                recipient_account_id=to_account_id,
-                description=data.get('description', f'Transfer to account {recipient_account.account_number}'),
-                reference_number=Transaction.generate_reference_number(),
-                status=Transaction.STATUS_PENDING_APPROVAL if requires_approval else Transaction.STATUS_COMPLETED
-            )
-            db.session.add(transaction)
-            
-            # Update account balances
-            if not requires_approval:
-                # Lock the accounts for update to prevent race conditions
-                from_account = db.session.get(Account, from_account_id, with_for_update=True)
-                to_account = db.session.get(Account, to_account_id, with_for_update=True)
-                
-                from_account.balance -= amount
-                to_account.balance += amount
-                
-                # Verify constraints after update
-                if from_account.balance < from_account.minimum_balance:
-                    raise ValueError(f'Transfer would put account below minimum balance of {from_account.minimum_balance}')
-            
-            db.session.commit()
-            
-            if requires_approval:
-                return jsonify({
-                    'message': 'Transfer pending approval',
-                    'transaction': transaction.to_dict()
-                }), 202
-            else:
-                return jsonify({
-                    'message': 'Transfer successful',
-                    'transaction': transaction.to_dict()
-                }), 201
+        # Create the transaction record
+        transaction = Transaction(
+            type='transfer',
+            amount=amount,
+            account_id=source_account.id,
+            recipient_account_id=recipient_account.id,
+            description=data.get('description', f'Transfer to account {recipient_account.account_number}'),
+            reference_number=Transaction.generate_reference_number(),
+            status=Transaction.STATUS_PENDING_APPROVAL if requires_approval else Transaction.STATUS_COMPLETED
+        )
         
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({'error': str(e)}), 500
-    
-        if not Transaction.requires_approval(amount):
-            source_account.balance -= amount
-            recipient_account.balance += amount
+        # Update account balances (only for immediate transfers). The debit
+        # checks the minimum balance in the same statement that applies it,
+        # and rows are always written in ascending id order so opposing
+        # transfers cannot deadlock.
+        if not requires_approval:
+            if recipient_account.id < source_account.id:
+                balance.credit(recipient_account.id, amount)
+            try:
+                balance.debit(source_account.id, amount)
+            except InsufficientFundsError:
+                db.session.rollback()
+                return jsonify({
+                    'error': 'Insufficient funds',
+                    'current_balance': source_account.balance,
+                    'minimum_balance': source_account.minimum_balance
+                }), 400
+            if recipient_account.id > source_account.id:
+                balance.credit(recipient_account.id, amount)
         
         db.session.add(transaction)
         db.session.commit()
         
-        if Transaction.requires_approval(amount):
+        if requires_approval:
             return jsonify({
                 'message': 'Transfer pending approval',
                 'transaction': transaction.to_dict()
             }), 202
-        else:
-            return jsonify({
-                'message': 'Transfer successful',
-                'transaction': transaction.to_dict()
-            }), 201
+        return jsonify({
+            'message': 'Transfer successful',
+            'transaction': transaction.to_dict()
+        }), 201
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@transaction_bp.route('/batch', methods=['POST'])
+@jwt_required()
+@require_permissions(Role.PERMISSIONS['transaction']['create'])
+@limiter.limit("10 per minute")
+@idempotent
+def batch_transfer():
+    """Apply many transfers in a single database transaction
+    
+    Requires:
+    - transfers: list of objects with from_account_id, to_account_id, amount
+      and an optional description (at most MAX_BATCH_TRANSFERS items)
+    
+    Every involved account is locked up front in ascending id order, so
+    concurrent batches always acquire row locks in the same order and cannot
+    deadlock. Items are checked in request order against the running balances;
+    an item that fails validation is reported and skipped without affecting
+    the others. Each accepted item is then applied with the guarded
+    balance.debit/credit statements. If a guard matches no row (the balances
+    changed after they were read, e.g. on SQLite where nothing is locked up
+    front), the whole batch is rolled back and the client is asked to retry.
+    Transaction rows are written with one bulk INSERT.
+    
+    Returns:
+        JSON response with one result per item, in request order
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json()
+    
+    transfers = data.get('transfers') if isinstance(data, dict) else None
+    if not isinstance(transfers, list) or not transfers:
+        return jsonify({'error': 'transfers must be a non-empty list'}), 400
+    
+    max_transfers = current_app.config['MAX_BATCH_TRANSFERS']
+    if len(transfers) > max_transfers:
+        return jsonify({'error': f'A batch may contain at most {max_transfers} transfers'}), 400
+    
+    results = [None] * len(transfers)
+    valid_items = []
+    required_fields = ['from_account_id', 'to_account_id', 'amount']
+    
+    # Validate item shapes before touching the database
+    for index, item in enumerate(transfers):
+        if not isinstance(item, dict) or not all(field in item for field in required_fields):
+            results[index] = {'index': index, 'status': 'failed',
+                              'error': f'Missing required fields: {required_fields}'}
+            continue
+        try:
+            from_account_id = int(item['from_account_id'])
+            to_account_id = int(item['to_account_id'])
+            amount = float(item['amount'])
+        except (TypeError, ValueError):
+            results[index] = {'index': index, 'status': 'failed', 'error': 'Invalid account ID or amount'}
+            continue
+        if not math.isfinite(amount) or amount <= 0:
+            results[index] = {'index': index, 'status': 'failed', 'error': 'Amount must be positive'}
+            continue
+        if from_account_id == to_account_id:
+            results[index] = {'index': index, 'status': 'failed', 'error': 'Cannot transfer to the same account'}
+            continue
+        valid_items.append((index, from_account_id, to_account_id, amount, item.get('description')))
+    
+    # Reference numbers come from per-worker blocks; draw them before any
+    # row is locked
+    reference_numbers = [Transaction.generate_reference_number() for _ in valid_items]
+    
+    try:
+        # Lock all involved accounts in ascending id order
+        account_ids = sorted({account_id for _, from_id, to_id, _, _ in valid_items
+                              for account_id in (from_id, to_id)})
+        accounts = {
+            account.id: account
+            for account in Account.query.filter(Account.id.in_(account_ids))
+                                        .order_by(Account.id)
+                                        .with_for_update()
+                                        .all()
+        }
+        balances = {account_id: account.balance for account_id, account in accounts.items()}
         
+        legs = []
+        rows = []
+        row_indexes = []
+        for (index, from_account_id, to_account_id, amount, description), reference_number \
+                in zip(valid_items, reference_numbers):
+            source_account = accounts.get(from_account_id)
+            recipient_account = accounts.get(to_account_id)
+            
+            error = None
+            if source_account is None or source_account.user_id != user_id:
+                error = 'Source account not found'
+            elif recipient_account is None:
+                error = 'Recipient account not found'
+            elif source_account.status != 'active':
+                error = f'Source account is {source_account.status}'
+            elif recipient_account.status != 'active':
+                error = f'Recipient account is {recipient_account.status}'
+            
+            requires_approval = Transaction.requires_approval(amount)
+            if error is None and not requires_approval:
+                if balances[from_account_id] - amount < source_account.minimum_balance:
+                    error = 'Insufficient funds'
+                else:
+                    balances[from_account_id] -= amount
+                    balances[to_account_id] += amount
+                    legs.append((from_account_id, to_account_id, amount))
+            
+            if error is not None:
+                results[index] = {'index': index, 'status': 'failed', 'error': error}
+                continue
+            
+            rows.append({
+                'type': 'transfer',
+                'amount': amount,
+                'account_id': from_account_id,
+                'recipient_account_id': to_account_id,
+                'description': description or f'Transfer to account {recipient_account.account_number}',
+                'reference_number': reference_number,
+                'status': Transaction.STATUS_PENDING_APPROVAL if requires_approval else Transaction.STATUS_COMPLETED
+            })
+            row_indexes.append(index)
+        
+        try:
+            for from_account_id, to_account_id, amount in legs:
+                balance.debit(from_account_id, amount)
+                balance.credit(to_account_id, amount)
+        except (InsufficientFundsError, LookupError):
+            db.session.rollback()
+            response = jsonify({'error': 'Account balances changed during the batch, please retry'})
+            response.headers['Retry-After'] = '1'
+            return response, 503
+        
+        if rows:
+            transaction_ids = db.session.scalars(
+                insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True),
+                rows
+            ).all()
+            for index, transaction_id, row in zip(row_indexes, transaction_ids, rows):
+                results[index] = {
+                    'index': index,
+                    'status': row['status'],
+                    'transaction': {
+                        'id': transaction_id,
+                        'reference_number': row['reference_number'],
+                        'amount': row['amount'],
+                        'account_id': row['account_id'],
+                        'recipient_account_id': row['recipient_account_id']
+                    }
+                }
+        
+        db.session.commit()
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+    
+    failed = sum(1 for result in results if result['status'] == 'failed')
+    return jsonify({
+        'results': results,
+        'summary': {
+            'total': len(results),
+            'succeeded': len(results) - failed,
+            'failed': failed
+        }
+    })
@@ -1,19 +1,33 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import (
     create_access_token, create_refresh_token,
     jwt_required, get_jwt_identity, get_jwt,
     set_access_cookies, set_refresh_cookies
 )
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 from app.models.user import User
 from app.models.role import Role
+from app.services.passwords import HasherBusy
+from app.utils.decorators import conditional
 from app import db, limiter
 
 user_bp = Blueprint('user', __name__)
 
-# In-memory token blacklist (for testing)
-# In production, use Redis or a database table
-token_blacklist = set()
+def _hasher_busy():
+    response = jsonify({'error': 'Server busy, please retry'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def _upgrade_password_hash(user, password_hash):
+    """Store a hash made with the current parameters, unless the password changed meanwhile"""
+    db.session.execute(
+        update(User)
+        .where(User.id == user.id, User.password_hash == user.password_hash)
+        .values(password_hash=password_hash)
+    )
+    db.session.commit()
 
 @user_bp.route('', methods=['POST'])
 @limiter.limit("20 per minute")
@@ -40,29 +54,41 @@ def create_user():
     password = data['password']
     if len(password) < 8:
         return jsonify({'error': 'Password must be at least 8 characters long'}), 400
-        
-    # Check for existing username/email using parameterized queries
+    
+    # Check for existing username/email using parameterized queries. Only a
+    # registration that can succeed is worth a hashing slot
     if User.query.filter(User.username == username).first():
         return jsonify({'error': 'Username already exists'}), 400
     if User.query.filter(User.email == email).first():
         return jsonify({'error': 'Email already exists'}), 400
 
+    # Get customer role
+    customer_role_id = db.session.query(Role.id).filter_by(name=Role.CUSTOMER).scalar()
+    if customer_role_id is None:
+        return jsonify({'error': 'System configuration error: customer role not found'}), 500
+    # Return the connection to the pool before spending time on the hash
+    db.session.rollback()
+
+    try:
+        password_hash = current_app.extensions['passwords'].hash(password)
+    except HasherBusy:
+        return _hasher_busy()
+
     try:
-        # Get customer role
-        customer_role = Role.query.filter_by(name=Role.CUSTOMER).first()
-        if not customer_role:
-            return jsonify({'error': 'System configuration error: customer role not found'}), 500
-            
         user = User(
             username=data['username'],
             name=data['name'],
             email=data['email'],
-            role=customer_role
+            role_id=customer_role_id,
+            password_hash=password_hash
         )
-        user.set_password(data['password'])
         db.session.add(user)
         db.session.commit()
         return jsonify({'message': 'User registered successfully'}), 201
+    except IntegrityError:
+        # Registered concurrently since the checks above
+        db.session.rollback()
+        return jsonify({'error': 'Username or email already exists'}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to create user'}), 500
@@ -75,12 +101,41 @@ def login():
         return jsonify({'error': 'Username and password are required'}), 400
 
     username = data['username'].strip()
-    user = User.query.filter(User.username == username).first()
-    if user and user.check_password(data['password']):
-        # Create tokens with additional claims
+    
+    # Refuse locked-out usernames and addresses before loading or hashing anything
+    lockout = current_app.extensions['lockout']
+    status = lockout.check(username, request.remote_addr)
+    if status.retry_after:
+        response = jsonify({'error': 'Too many failed login attempts, try again later'})
+        response.headers['Retry-After'] = str(status.retry_after)
+        return response, 429
+    
+    user = db.session.query(
+        User.id, User.username, User.name, User.email, User.role_id, User.password_hash
+    ).filter(User.username == username).first()
+    # Return the connection to the pool before spending time on the hash
+    db.session.rollback()
+    
+    hasher = current_app.extensions['passwords']
+    try:
+        valid = user is not None and hasher.verify(user.password_hash, data['password'])
+        if valid and hasher.needs_rehash(user.password_hash):
+            _upgrade_password_hash(user, hasher.hash(data['password']))
+    except HasherBusy:
+        return _hasher_busy()
+    
+    if valid:
+        if status.user_failures:
+            lockout.reset(username)
+        
+        # Create tokens with additional claims. The role id and version let
+        # permission checks use the cache instead of loading the user.
+        grant = current_app.extensions['permissions'].get(user.role_id)
         additional_claims = {
             'username': user.username,
             'email': user.email,
+            'role_id': user.role_id,
+            'role_version': grant.version,
             'iat': datetime.now(timezone.utc)
         }
         
@@ -98,7 +153,7 @@ def login():
             'access_token': access_token,
             'refresh_token': refresh_token,
             'token_type': 'Bearer',
-            'expires_in': int(timedelta(minutes=15).total_seconds()),  # 15 minutes
+            'expires_in': int(current_app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds()),
             'user': {
                 'id': user.id,
                 'username': user.username,
@@ -112,11 +167,21 @@ def login():
         response.headers['Pragma'] = 'no-cache'
         
         return response
+    
+    lockout.record_failure(username, request.remote_addr)
     return jsonify({'error': 'Invalid credentials'}), 401
 
+def _profile_version():
+    """updated_at of the caller's user row, without loading the row"""
+    row = db.session.query(User.updated_at).filter(User.id == get_jwt_identity()).first()
+    if row is None:
+        return None
+    return row.updated_at, row.updated_at
+
 @user_bp.route('/me', methods=['GET'])
 @jwt_required()
 @limiter.limit("60 per minute")
+@conditional(_profile_version)
 def get_profile():
     user_id = get_jwt_identity()
     user = User.query.get_or_404(user_id)
@@ -132,28 +197,46 @@ def get_profile():
 @limiter.limit("40 per minute")
 def update_profile():
     user_id = get_jwt_identity()
-    user = User.query.get_or_404(user_id)
     data = request.get_json()
     
     if not data:
         return jsonify({'error': 'No data provided'}), 400
+    
+    # Validate every field and check the email before hashing a new password,
+    # so a rejected update never takes a hashing slot
+    values = {}
+    if 'name' in data:
+        values['name'] = data['name']
+    if 'email' in data:
+        email = data['email'].strip().lower()
+        if not email or '@' not in email:
+            return jsonify({'error': 'Invalid email format'}), 400
+        values['email'] = data['email']
+    if 'password' in data and len(data['password']) < 8:
+        return jsonify({'error': 'Password must be at least 8 characters long'}), 400
+    
+    User.query.get_or_404(user_id)
+    if 'email' in values and User.query.filter(User.id != user_id, User.email == email).first():
+        return jsonify({'error': 'Email already exists'}), 400
+    
+    if 'password' in data:
+        # Return the connection to the pool before spending time on the hash
+        db.session.rollback()
+        try:
+            values['password_hash'] = current_app.extensions['passwords'].hash(data['password'])
+        except HasherBusy:
+            return _hasher_busy()
 
     try:
-        # Only allow updating name and email
-        if 'name' in data:
-            user.name = data['name']
-        if 'email' in data:
-            email = data['email'].strip().lower()
-            if not email or '@' not in email:
-                return jsonify({'error': 'Invalid email format'}), 400
-            if User.query.filter(User.id != user_id, User.email == email).first():
-                return jsonify({'error': 'Email already exists'}), 400
-            user.email = data['email']
-        if 'password' in data:
-            user.set_password(data['password'])
-
+        # Only allow updating name, email and password
+        if values:
+            db.session.execute(update(User).where(User.id == user_id).values(**values))
         db.session.commit()
         return jsonify({'message': 'Profile updated successfully'})
+    except IntegrityError:
+        # Email taken concurrently since the check above
+        db.session.rollback()
+        return jsonify({'error': 'Email already exists'}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to update profile'}), 500
@@ -162,14 +245,25 @@ def update_profile():
 @jwt_required(refresh=True)
 @limiter.limit("30 per minute")
 def refresh():
-    """Refresh access token using refresh token"""
+    """Refresh access token using refresh token
+    
+    The role claims are read from the user's current row, not copied from the
+    refresh token, so a demotion or deletion takes effect by the time the
+    current access token expires.
+    """
     identity = get_jwt_identity()
-    claims = get_jwt()
+    user = db.session.query(
+        User.username, User.email, User.role_id
+    ).filter(User.id == identity).first()
+    if user is None:
+        return jsonify({'error': 'User not found'}), 401
+    grant = current_app.extensions['permissions'].get(user.role_id)
     
-    # Create new access token with original claims
     additional_claims = {
-        'username': claims.get('username'),
-        'email': claims.get('email'),
+        'username': user.username,
+        'email': user.email,
+        'role_id': user.role_id,
+        'role_version': grant.version if grant else 0,
         'iat': datetime.now(timezone.utc)
     }
     
@@ -182,7 +276,7 @@ def refresh():
     response = jsonify({
         'access_token': access_token,
         'token_type': 'Bearer',
-        'expires_in': int(timedelta(minutes=15).total_seconds())  # 15 minutes
+        'expires_in': int(current_app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds())
     })
     
     response.headers['Cache-Control'] = 'no-store'
@@ -194,6 +288,6 @@ def refresh():
 @jwt_required()
 def logout():
     """Logout user and revoke current token"""
-    jti = get_jwt()['jti']  # Get JWT ID from token
-    token_blacklist.add(jti)
+    claims = get_jwt()
+    current_app.extensions['revocation'].revoke(claims['jti'], claims['exp'])
     return jsonify({'message': 'Successfully logged out'})
\ No newline at end of file
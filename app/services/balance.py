@@ -0,0 +1,67 @@
+from sqlalchemy import case, update
+from app import db
+from app.models.account import Account
+
+
+class InsufficientFundsError(ValueError):
+    """Raised when a debit would take an account below its minimum balance"""
+
+
+def _minimum_balance():
+    """SQL expression for the account's type-specific minimum balance"""
+    return case(
+        {name: details['min_balance'] for name, details in Account.ACCOUNT_TYPES.items()},
+        value=Account.account_type,
+        else_=0.0
+    )
+
+
+def debit(account_id, amount, enforce_minimum=True):
+    """Subtract `amount` from an account in a single guarded UPDATE
+
+    The balance check and the write happen in the same statement, so the row
+    is only locked for the duration of the UPDATE and concurrent debits can
+    never both pass the check.
+
+    Args:
+        account_id (int): account to debit
+        amount (float): positive amount to subtract
+        enforce_minimum (bool): refuse the debit if it would leave the account
+            below the minimum balance of its type
+
+    Returns:
+        float: the new balance
+
+    Raises:
+        InsufficientFundsError: if the guard rejected the debit
+    """
+    stmt = update(Account).where(Account.id == account_id)
+    if enforce_minimum:
+        stmt = stmt.where(Account.balance - amount >= _minimum_balance())
+    stmt = stmt.values(balance=Account.balance - amount).returning(Account.balance)
+
+    new_balance = db.session.execute(stmt).scalar_one_or_none()
+    if new_balance is None:
+        raise InsufficientFundsError(f'Insufficient funds in account {account_id}')
+    return new_balance
+
+
+def credit(account_id, amount):
+    """Add `amount` to an account in a single UPDATE
+
+    Returns:
+        float: the new balance
+
+    Raises:
+        LookupError: if the account does not exist
+    """
+    stmt = (
+        update(Account)
+        .where(Account.id == account_id)
+        .values(balance=Account.balance + amount)
+        .returning(Account.balance)
+    )
+    new_balance = db.session.execute(stmt).scalar_one_or_none()
+    if new_balance is None:
+        raise LookupError(f'Account {account_id} not found')
+    return new_balance
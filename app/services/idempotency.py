@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta, UTC
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.idempotency_key import IdempotencyKey
+
+StoredResponse = namedtuple('StoredResponse', 'request_hash status_code body mimetype')
+
+
+def _utcnow():
+    """Naive UTC, as the expires_at column stores it"""
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+class RequestInProgress(Exception):
+    """Raised when another request with the same key has not finished yet"""
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class IdempotencyStore:
+    """Idempotency-Key outcomes: an in-process LRU in front of the idempotency_key table
+
+    A key is reserved (an in-flight row) before the handler runs, so a
+    concurrent duplicate is refused instead of executed twice. Once the handler
+    finishes, its response is stored and later retries are answered from the
+    LRU, or from one indexed lookup in another worker.
+
+    A reservation only holds for `lease` seconds. A worker killed while
+    running the handler (a gunicorn timeout, an OOM kill) never stores or
+    releases its row; when the lease runs out, a retry takes the key over and
+    runs the request again. The lease must outlast GUNICORN_TIMEOUT, so a
+    request that is still running is never run twice.
+    """
+
+    # Expired rows are purged once every this many reservations
+    PURGE_INTERVAL = 500
+
+    def __init__(self, ttl, maxsize, lease=60):
+        self.ttl = ttl
+        self.lease = lease
+        self.cache = LRUCache(maxsize, ttl)
+        self._reservations = 0
+
+    def get(self, user_id, key):
+        """Return the StoredResponse for a completed request, or None
+
+        Raises:
+            RequestInProgress: if the key is reserved by an unfinished request
+                whose lease has not run out
+        """
+        cached = self.cache.get((user_id, key))
+        if cached is not None:
+            return cached
+
+        record = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+        now = _utcnow()
+        if record is None or record.expires_at <= now:
+            return None
+        if not record.is_complete:
+            raise RequestInProgress(key)
+
+        stored = StoredResponse(record.request_hash, record.status_code,
+                                record.response_body, record.mimetype)
+        remaining = (record.expires_at - now).total_seconds()
+        self.cache.set((user_id, key), stored, ttl=min(self.ttl, remaining))
+        return stored
+
+    def reserve(self, user_id, key, endpoint, request_hash):
+        """Claim a key for a request that is about to run
+
+        Raises:
+            RequestInProgress: if another request claimed the key first
+        """
+        self._reservations += 1
+        if self._reservations % self.PURGE_INTERVAL == 0:
+            self.purge_expired()
+
+        # Drop an expired response or lapsed lease on the same key so it can be reused
+        now = _utcnow()
+        db.session.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.expires_at <= now
+        ))
+        db.session.add(IdempotencyKey(
+            key=key,
+            user_id=user_id,
+            endpoint=endpoint,
+            request_hash=request_hash,
+            expires_at=now + timedelta(seconds=self.lease)
+        ))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            raise RequestInProgress(key)
+
+    def complete(self, user_id, key, request_hash, response):
+        """Store the response of a reserved request and keep it for `ttl` seconds"""
+        body = response.get_data(as_text=True)
+        db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            .values(status_code=response.status_code, response_body=body,
+                    mimetype=response.mimetype,
+                    expires_at=_utcnow() + timedelta(seconds=self.ttl))
+        )
+        db.session.commit()
+        self.cache.set((user_id, key),
+                       StoredResponse(request_hash, response.status_code, body, response.mimetype))
+
+    def release(self, user_id, key):
+        """Forget a reservation whose request failed, so the client can retry"""
+        db.session.rollback()
+        db.session.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.status_code.is_(None)
+        ))
+        db.session.commit()
+
+    def purge_expired(self):
+        """Delete expired rows from the persistent store"""
+        db.session.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.expires_at <= _utcnow()
+        ))
+        db.session.commit()
@@ -0,0 +1,83 @@
+import math
+from collections import namedtuple
+from datetime import datetime, timedelta, UTC
+from sqlalchemy import delete, func, insert, select
+from app import db
+from app.models.login_failure import LoginFailure
+
+# retry_after: seconds until the next attempt is allowed (0 if not locked);
+# user_failures: failed attempts on the username within the window
+LockoutStatus = namedtuple('LockoutStatus', 'retry_after user_failures')
+
+
+class LoginLockout:
+    """Sliding-window failed-login limits per username and per client address
+
+    Failures are rows in the login_failure table, so every worker sees the
+    same counts. Before a login does anything expensive, one indexed
+    aggregate query over the last `window` seconds decides whether the
+    username or the address is locked. Attempts that are refused are not
+    recorded, so a locked key never has more than its limit of rows in the
+    window and the check stays cheap during a credential-stuffing burst.
+
+    The address is request.remote_addr, so behind a load balancer
+    TRUSTED_PROXY_COUNT must be set; otherwise every client shares the
+    balancer's address. A max_ip_attempts of 0 turns the address limit off.
+    """
+
+    # Expired rows are purged once every this many recorded failures
+    PURGE_INTERVAL = 500
+
+    def __init__(self, max_attempts, max_ip_attempts, window):
+        self.max_attempts = max_attempts
+        self.max_ip_attempts = max_ip_attempts
+        self.window = window
+        self._failures = 0
+
+    def _limits(self, username, address):
+        limits = {f'user:{username}': self.max_attempts}
+        if self.max_ip_attempts > 0:
+            limits[f'ip:{address}'] = self.max_ip_attempts
+        return limits
+
+    def check(self, username, address):
+        """Return the LockoutStatus of a login attempt"""
+        limits = self._limits(username, address)
+        now = datetime.now(UTC).replace(tzinfo=None)
+        rows = db.session.execute(
+            select(LoginFailure.key, func.count(), func.min(LoginFailure.failed_at))
+            .where(LoginFailure.key.in_(limits),
+                   LoginFailure.failed_at > now - timedelta(seconds=self.window))
+            .group_by(LoginFailure.key)
+        ).all()
+        wait = user_failures = 0
+        for key, count, oldest in rows:
+            if key.startswith('user:'):
+                user_failures = count
+            if count >= limits[key]:
+                # Unlocked once the oldest failure leaves the window
+                wait = max(wait, math.ceil((oldest - now).total_seconds() + self.window))
+        return LockoutStatus(wait, user_failures)
+
+    def record_failure(self, username, address):
+        """Count a failed attempt against both the username and the address"""
+        now = datetime.now(UTC).replace(tzinfo=None)
+        db.session.execute(insert(LoginFailure), [
+            {'key': key, 'failed_at': now} for key in self._limits(username, address)
+        ])
+        db.session.commit()
+
+        self._failures += 1
+        if self._failures % self.PURGE_INTERVAL == 0:
+            self.purge_expired()
+
+    def reset(self, username):
+        """Forget the username's failures after a successful login"""
+        db.session.execute(delete(LoginFailure).where(LoginFailure.key == f'user:{username}'))
+        db.session.commit()
+
+    def purge_expired(self):
+        """Delete failures that have left the window"""
+        cutoff = datetime.now(UTC).replace(tzinfo=None) - timedelta(seconds=self.window)
+        db.session.execute(delete(LoginFailure).where(LoginFailure.failed_at <= cutoff))
+        db.session.commit()
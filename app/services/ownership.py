@@ -0,0 +1,90 @@
+from sqlalchemy import exists, or_, select
+from app import db
+from app.models.account import Account
+from app.models.transaction import Transaction
+
+
+def owned_account_ids(user_id):
+    """Subquery of the ids of the accounts `user_id` owns
+
+    Used inside IN (...) so the user's account list is resolved by the
+    database, off the (user_id) index, instead of being loaded into Python.
+    """
+    return select(Account.id).where(Account.user_id == user_id)
+
+
+def owned_account(user_id, account_id):
+    """Query for one account, restricted to its owner"""
+    return Account.query.filter(Account.id == account_id, Account.user_id == user_id)
+
+
+def owns_account(user_id, account_id):
+    """Whether `user_id` owns `account_id`, in one EXISTS query"""
+    return db.session.query(
+        exists().where(Account.id == account_id, Account.user_id == user_id)
+    ).scalar()
+
+
+def transaction_visible_to(user_id):
+    """EXISTS criterion: the transaction's source or recipient account belongs to `user_id`
+
+    Correlated against `transaction`, so a lookup by primary key costs one
+    statement: a transaction row and at most two account primary key probes.
+    """
+    return exists().where(
+        Account.user_id == user_id,
+        or_(Account.id == Transaction.account_id, Account.id == Transaction.recipient_account_id)
+    )
+
+
+def history_criterion(user_id, account_id=None):
+    """Criterion for the transactions that touch the user's accounts
+
+    Args:
+        user_id (int): owner of the accounts
+        account_id (int, optional): restrict to this one account, which the
+            caller has already checked with owns_account()
+    """
+    account_ids = [account_id] if account_id is not None else owned_account_ids(user_id)
+    # Single criterion over both directions, for counts and the export; pages
+    # are read with history_branches()
+    return or_(
+        Transaction.account_id.in_(account_ids),
+        Transaction.recipient_account_id.in_(account_ids)
+    )
+
+
+def history_branches(user_id, account_id=None):
+    """Split history_criterion() into disjoint criteria, one per account and direction
+
+    An OR over several accounts can only be ordered by sorting every row it
+    matches. Each branch here pins one account on one side, so the
+    (account_id, timestamp) or (recipient_account_id, timestamp) index
+    returns it newest first and a page reads no further than it needs (see
+    ordered_union). A transfer between two of the user's accounts is only in
+    its source's branch.
+
+    Args:
+        user_id (int): owner of the accounts
+        account_id (int, optional): restrict to this one account, which the
+            caller has already checked with owns_account()
+
+    Returns:
+        list of criteria tuples
+    """
+    if account_id is not None:
+        account_ids = [account_id]
+    else:
+        account_ids = db.session.scalars(owned_account_ids(user_id)).all()
+    return history_branch_criteria(account_ids)
+
+
+def history_branch_criteria(account_ids):
+    """history_branches() for a known list of account ids"""
+    branches = [(Transaction.account_id == account_id,) for account_id in account_ids]
+    branches += [
+        (Transaction.recipient_account_id == account_id,
+         or_(Transaction.account_id.is_(None), Transaction.account_id.not_in(account_ids)))
+        for account_id in account_ids
+    ]
+    return branches
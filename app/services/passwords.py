@@ -0,0 +1,62 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when too many hashes are already running or queued in this process"""
+
+
+class PasswordHasher:
+    """Password hashing on a small, bounded thread pool
+
+    scrypt and PBKDF2 release the GIL, so hashes run on `workers` threads
+    while the request threads wait without blocking the rest of the process.
+    At most `max_pending` hashes may be running or queued at once. Beyond
+    that, HasherBusy is raised instead of letting a burst of logins queue up
+    CPU time and memory (scrypt uses 32 MiB per hash).
+
+    `method` is a werkzeug method string, e.g. "scrypt:32768:8:1" or
+    "pbkdf2:sha256:600000". Hashes made with other parameters still verify,
+    and needs_rehash() reports them so they can be upgraded on login.
+    """
+
+    def __init__(self, method, workers, max_pending):
+        self.method = method
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._prefix = None
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy('Too many password hashes in progress')
+        try:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='password-hash')
+                executor = self._executor
+            return executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        """Hash a password with the configured method"""
+        return self._submit(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Check a password against a stored hash, whatever its method"""
+        return self._submit(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if the stored hash was made with a different method or cost"""
+        if self._prefix is None:
+            # Let werkzeug fill in defaults (e.g. "scrypt" -> "scrypt:32768:8:1")
+            self._prefix = self.hash('').split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._prefix
+
+    def reset(self):
+        """Drop the thread pool, e.g. in a freshly forked worker whose threads are gone"""
+        with self._executor_lock:
+            self._executor = None
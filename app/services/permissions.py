@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import namedtuple
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from app import db
+from app.models.role import Role
+
+RoleGrant = namedtuple('RoleGrant', 'version name permissions')
+
+
+class PermissionCache:
+    """Per-process cache of role permission sets, keyed by role id and version
+
+    Access tokens carry the role id and the role version they were issued
+    with, so a permission check is a dictionary and set lookup. An entry is
+    reloaded when it is older than `ttl` seconds or older than the version in
+    the token. Role updates in this process invalidate it immediately; other
+    workers pick the change up within `ttl`.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}  # role_id -> (loaded_at, RoleGrant)
+        self._lock = threading.Lock()
+
+    def get(self, role_id, min_version=0):
+        """Return the RoleGrant for a role, or None if the role does not exist"""
+        entry = self._entries.get(role_id)
+        if entry is not None:
+            loaded_at, grant = entry
+            if grant.version >= min_version and time.monotonic() - loaded_at < self.ttl:
+                return grant
+
+        row = db.session.execute(
+            select(Role.version, Role.name, Role.permissions).where(Role.id == role_id)
+        ).first()
+        if row is None:
+            self.invalidate(role_id)
+            return None
+
+        grant = RoleGrant(row.version, row.name, frozenset(row.permissions or []))
+        with self._lock:
+            self._entries[role_id] = (time.monotonic(), grant)
+        return grant
+
+    def invalidate(self, role_id=None):
+        """Drop one role, or every role when role_id is None"""
+        with self._lock:
+            if role_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(role_id, None)
+
+
+@event.listens_for(Role, 'after_update')
+@event.listens_for(Role, 'after_delete')
+def _invalidate_role(mapper, connection, target):
+    """Explicitly invalidate cached permissions whenever a role is edited"""
+    if has_app_context() and 'permissions' in current_app.extensions:
+        current_app.extensions['permissions'].invalidate(target.id)
@@ -0,0 +1,179 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from functools import lru_cache
+import jwt
+from flask import current_app, request
+from flask_limiter.util import get_remote_address
+from limits.storage import Storage
+from app.utils.pagination import include_total, page_size
+
+
+@lru_cache(maxsize=4096)
+def _token_claims(token, key, algorithm):
+    """(identity, expiry) of a correctly signed token, or None
+
+    Verifying a JWT costs a few hundred microseconds in PyJWT. The same token
+    is sent with every request for its whole lifetime, so the result is
+    cached per token. Tokens with a bad signature never yield claims, and the
+    cached expiry is checked again on every request.
+    """
+    try:
+        claims = jwt.decode(token, key, algorithms=[algorithm])
+    except jwt.PyJWTError:
+        return None
+    return claims.get('sub'), claims.get('exp', math.inf)
+
+
+def request_key():
+    """Rate limit key: the JWT identity when a valid token is sent, else the client address
+
+    Clients behind a load balancer or NAT share a few addresses, so keying on
+    the address alone lets one heavy user exhaust everyone's limits. Requests
+    with a missing or invalid token (login, registration, rejected calls)
+    are still counted per address. Revocation is left to the route's own
+    jwt_required.
+    """
+    key = request.environ.get('revobank.rate_limit_key')
+    if key is None:
+        config = current_app.config
+        header_type, _, token = request.headers.get(config['JWT_HEADER_NAME'], '').partition(' ')
+        claims = None
+        if token and header_type == config['JWT_HEADER_TYPE']:
+            claims = _token_claims(token, config['JWT_SECRET_KEY'], config['JWT_ALGORITHM'])
+        if claims is not None and claims[0] is not None and claims[1] > time.time():
+            key = f'user:{claims[0]}'
+        else:
+            key = f'ip:{get_remote_address()}'
+        request.environ['revobank.rate_limit_key'] = key
+    return key
+
+
+def rows_cost():
+    """Read budget cost of a listing: one unit per RATELIMIT_ROWS_PER_UNIT rows requested
+
+    Asking for the total count (the page mode default) adds a unit for the
+    COUNT query. Out-of-range limits are rejected by the view with a 400
+    and cost one unit.
+    """
+    limit = page_size(request.args)
+    if limit is None:
+        return 1
+    cost = math.ceil(limit / current_app.config['RATELIMIT_ROWS_PER_UNIT'])
+    return cost + 1 if include_total(request.args) else cost
+
+
+def export_cost():
+    """Read budget cost of a streaming export, whose size is only known once it has run"""
+    return current_app.config['RATELIMIT_EXPORT_COST']
+
+
+class SQLiteStorage(Storage):
+    """Rate limit counters in a SQLite file shared by every worker
+
+    Selected with RATELIMIT_STORAGE_URL=sqlite:////path/to/ratelimit.db (the
+    SQLAlchemy spelling: three slashes for a relative path, four for an
+    absolute one). Each counter is one row of a WITHOUT ROWID table, and a hit
+    is a single UPSERT ... RETURNING in autocommit mode, so workers never hold
+    a lock across statements. The file runs in WAL mode with synchronous=OFF:
+    a crash of the OS may lose recent hits, which only shortens a window.
+    Putting the file on tmpfs (/dev/shm) keeps every hit in memory.
+
+    Supports the fixed-window strategy, Flask-Limiter's default.
+    """
+
+    STORAGE_SCHEME = ['sqlite']
+
+    # Expired counters are purged once every this many hits
+    PURGE_INTERVAL = 1000
+
+    def __init__(self, uri, wrap_exceptions=False, timeout=5.0, **options):
+        path = uri.split('://', 1)[1]
+        # sqlite:///ratelimit.db is relative, sqlite:////tmp/ratelimit.db absolute
+        self.path = path[1:] if path.startswith('/') else path
+        self.timeout = float(timeout)
+        self._local = threading.local()
+        self._hits = 0
+
+        conn = self._connect()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS rate_limit ('
+            'key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL'
+            ') WITHOUT ROWID'
+        )
+
+        # Connections must not cross a fork (gunicorn preload_app)
+        storage_ref = weakref.ref(self)
+
+        def after_fork_in_child():
+            storage = storage_ref()
+            if storage is not None:
+                storage._local = threading.local()
+
+        os.register_at_fork(after_in_child=after_fork_in_child)
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        conn.execute('PRAGMA synchronous=OFF')
+        self._local.conn = conn
+        return conn
+
+    def _conn(self):
+        """This thread's connection; sqlite3 connections are not shared between threads"""
+        conn = getattr(self._local, 'conn', None)
+        return conn if conn is not None else self._connect()
+
+    def incr(self, key, expiry, amount=1):
+        """Add `amount` to the counter, starting a new window of `expiry` seconds if it has expired"""
+        now = time.time()
+        count, = self._conn().execute(
+            'INSERT INTO rate_limit (key, count, expires_at) VALUES (?1, ?2, ?3 + ?4) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'count = CASE WHEN expires_at <= ?3 THEN ?2 ELSE count + ?2 END, '
+            'expires_at = CASE WHEN expires_at <= ?3 THEN ?3 + ?4 ELSE expires_at END '
+            'RETURNING count',
+            (key, amount, now, expiry)
+        ).fetchone()
+
+        self._hits += 1
+        if self._hits % self.PURGE_INTERVAL == 0:
+            self.purge_expired()
+        return count
+
+    def get(self, key):
+        row = self._conn().execute(
+            'SELECT count FROM rate_limit WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        row = self._conn().execute(
+            'SELECT expires_at FROM rate_limit WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self):
+        try:
+            self._conn().execute('SELECT 1 FROM rate_limit LIMIT 1').fetchall()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self._conn().execute('DELETE FROM rate_limit').rowcount
+
+    def clear(self, key):
+        self._conn().execute('DELETE FROM rate_limit WHERE key = ?', (key,))
+
+    def purge_expired(self):
+        """Delete counters whose window has ended"""
+        self._conn().execute('DELETE FROM rate_limit WHERE expires_at <= ?', (time.time(),))
@@ -0,0 +1,232 @@
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, UTC
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.revoked_token import RevokedToken
+
+
+def _utcnow():
+    # revoked_token stores naive UTC datetimes
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+class SharedBloomFilter:
+    """Bloom filter stored in a memory-mapped file shared by every worker
+
+    Each slot is a whole byte that is only ever set to 1, so concurrent
+    writers in different processes cannot lose each other's updates the way
+    a read-modify-write of a packed bit would.
+    """
+
+    def __init__(self, path, size, hashes, create=True):
+        self.size = size
+        self.hashes = hashes
+        flags = os.O_RDWR | (os.O_CREAT if create else 0)
+        fd = os.open(path, flags, 0o600)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        # Kirsch-Mitzenmacher double hashing
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self._map[position] = 1
+
+    def __contains__(self, item):
+        return all(self._map[position] for position in self._positions(item))
+
+    def close(self):
+        self._map.close()
+
+
+class TokenRevocationStore:
+    """Revoked JWT ids in a database table, fronted by shared Bloom filters
+
+    Revocations are grouped by the UTC day their token expires, one Bloom
+    filter file per day. A token that was never revoked is answered from the
+    filter without a query; only filter hits are confirmed against the
+    revoked_token table. Rows and filter files are dropped once every token
+    they describe has expired.
+
+    The table is the source of truth and the files are a cache of it. A
+    missing file (a fresh temp directory, a new container) is rebuilt from
+    the table before it answers anything. Every `sync_interval` seconds each
+    process also adds rows revoked since its last sync, so revocations made
+    by hosts with their own filter directory are picked up as well.
+    """
+
+    # Expired entries are purged once every this many revocations
+    PURGE_INTERVAL = 100
+
+    def __init__(self, bloom_dir, bloom_size, bloom_hashes, sync_interval=5):
+        self.bloom_dir = bloom_dir
+        self.bloom_size = bloom_size
+        self.bloom_hashes = bloom_hashes
+        self.sync_interval = sync_interval
+        self._filters = {}
+        self._lock = threading.Lock()
+        self._revocations = 0
+        self._synced_at = None  # Wall clock of the last sync; None syncs every unexpired row
+        self._next_sync = 0
+        os.makedirs(bloom_dir, exist_ok=True)
+
+    def _filter_path(self, bucket):
+        return os.path.join(self.bloom_dir, f'revoked-{bucket}.bloom')
+
+    def _build_filter(self, bucket, path):
+        """Create the filter file for a day from the table, atomically
+
+        The filter is filled in a temporary file and linked into place, so
+        no process ever opens a file that is missing revoked tokens. If
+        another process got there first, its file is used and topped up.
+        """
+        day = datetime.strptime(bucket, '%Y%m%d')
+        rows = db.session.execute(
+            select(RevokedToken.jti).where(RevokedToken.expires_at >= day,
+                                           RevokedToken.expires_at < day + timedelta(days=1))
+        ).scalars().all()
+
+        fd, build_path = tempfile.mkstemp(prefix='.building-', dir=self.bloom_dir)
+        os.close(fd)
+        bloom = SharedBloomFilter(build_path, self.bloom_size, self.bloom_hashes)
+        for jti in rows:
+            bloom.add(jti)
+        try:
+            os.link(build_path, path)
+        except FileExistsError:
+            bloom.close()
+            bloom = SharedBloomFilter(path, self.bloom_size, self.bloom_hashes)
+            for jti in rows:
+                bloom.add(jti)
+        finally:
+            os.remove(build_path)
+        return bloom
+
+    def _filter(self, expires_at):
+        bucket = expires_at.strftime('%Y%m%d')
+        bloom = self._filters.get(bucket)
+        if bloom is not None:
+            return bloom
+        path = self._filter_path(bucket)
+        with self._lock:
+            bloom = self._filters.get(bucket)
+            if bloom is None:
+                if os.path.exists(path):
+                    bloom = SharedBloomFilter(path, self.bloom_size, self.bloom_hashes)
+                else:
+                    bloom = self._build_filter(bucket, path)
+                self._filters[bucket] = bloom
+            return bloom
+
+    def _sync(self):
+        """Add revocations recorded by other hosts since the last sync"""
+        now = time.monotonic()
+        if now < self._next_sync:
+            return
+        self._next_sync = now + self.sync_interval
+        started = _utcnow()
+        query = select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at >= started)
+        if self._synced_at is not None:
+            # Overlap by one interval to cover clock skew and slow commits
+            query = query.where(RevokedToken.revoked_at >= self._synced_at - timedelta(seconds=self.sync_interval))
+        for jti, expires_at in db.session.execute(query):
+            self._filter(expires_at).add(jti)
+        self._synced_at = started
+
+    def revoke(self, jti, exp):
+        """Revoke a token id until its expiry timestamp `exp`"""
+        expires_at = datetime.fromtimestamp(exp, UTC).replace(tzinfo=None)
+        # Mark the filter first: a concurrent check then falls through to
+        # the table instead of missing the revocation
+        self._filter(expires_at).add(jti)
+        db.session.add(RevokedToken(jti=jti, expires_at=expires_at, revoked_at=_utcnow()))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # Already revoked
+
+        self._revocations += 1
+        if self._revocations % self.PURGE_INTERVAL == 0:
+            self.purge_expired()
+
+    def is_revoked(self, jti, exp):
+        self._sync()
+        bloom = self._filter(datetime.fromtimestamp(exp, UTC).replace(tzinfo=None))
+        if jti not in bloom:
+            return False
+        return db.session.execute(
+            select(RevokedToken.jti).where(RevokedToken.jti == jti)
+        ).first() is not None
+
+    def purge_expired(self):
+        """Delete rows and filter files for tokens that have already expired"""
+        now = _utcnow()
+        db.session.execute(delete(RevokedToken).where(RevokedToken.expires_at < now))
+        db.session.commit()
+
+        today = now.strftime('%Y%m%d')
+        with self._lock:
+            for name in os.listdir(self.bloom_dir):
+                bucket = name[len('revoked-'):-len('.bloom')]
+                if name.startswith('revoked-') and name.endswith('.bloom') and bucket < today:
+                    bloom = self._filters.pop(bucket, None)
+                    if bloom is not None:
+                        bloom.close()
+                    try:
+                        os.remove(os.path.join(self.bloom_dir, name))
+                    except FileNotFoundError:
+                        pass
+
+
+class MemoryRevocationStore:
+    """Process-local revocation store for single-process development and tests"""
+
+    PURGE_INTERVAL = 100
+
+    def __init__(self):
+        self._revoked = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, jti, exp):
+        with self._lock:
+            self._revoked[jti] = exp
+        if len(self._revoked) % self.PURGE_INTERVAL == 0:
+            self.purge_expired()
+
+    def is_revoked(self, jti, exp):
+        return jti in self._revoked
+
+    def purge_expired(self):
+        now = datetime.now(UTC).timestamp()
+        with self._lock:
+            self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp >= now}
+
+
+def create_revocation_store(config):
+    """Build the revocation backend selected by TOKEN_REVOCATION_BACKEND"""
+    backend = config['TOKEN_REVOCATION_BACKEND']
+    if backend == 'memory':
+        return MemoryRevocationStore()
+    if backend == 'database':
+        return TokenRevocationStore(
+            bloom_dir=config['TOKEN_REVOCATION_BLOOM_DIR'],
+            bloom_size=config['TOKEN_REVOCATION_BLOOM_SIZE'],
+            bloom_hashes=config['TOKEN_REVOCATION_BLOOM_HASHES'],
+            sync_interval=config['TOKEN_REVOCATION_SYNC_INTERVAL']
+        )
+    raise ValueError(f'Unknown TOKEN_REVOCATION_BACKEND: {backend}')
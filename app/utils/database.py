@@ -0,0 +1,139 @@
+import os
+import weakref
+from flask import jsonify
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+
+
+def is_file_sqlite(uri):
+    """True for a SQLite database stored in a file (not :memory:)"""
+    url = make_url(uri)
+    return (url.get_backend_name() == 'sqlite'
+            and url.database not in (None, '', ':memory:')
+            and url.query.get('mode') != 'memory')
+
+
+def sqlite_pragmas(config):
+    """PRAGMA statements run on every new file-backed SQLite connection"""
+    return (
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size={int(config['SQLITE_CACHE_SIZE'])}",
+    )
+
+
+def configure_engine(app):
+    """Fill in SQLALCHEMY_ENGINE_OPTIONS from the DB_* and SQLITE_* settings
+
+    Must run before db.init_app(). Options already present in
+    SQLALCHEMY_ENGINE_OPTIONS win.
+
+    File-backed SQLite (with SQLITE_TUNING) gets BEGIN IMMEDIATE for write
+    transactions: the driver opens a transaction lazily at the first
+    INSERT/UPDATE/DELETE, and IMMEDIATE takes the write lock right there, so
+    a writer waits for busy_timeout instead of failing with "database is
+    locked" when it later tries to upgrade its lock. Reads run outside any
+    transaction and never block on writers in WAL mode.
+
+    Server databases get the pool settings (size, overflow, pre-ping,
+    recycle, timeout).
+    """
+    config = app.config
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+
+    if make_url(uri).get_backend_name() == 'sqlite':
+        if is_file_sqlite(uri) and config['SQLITE_TUNING'] and config['SQLITE_BEGIN_IMMEDIATE']:
+            connect_args = dict(options.get('connect_args', {}))
+            connect_args.setdefault('isolation_level', 'IMMEDIATE')
+            options['connect_args'] = connect_args
+    else:
+        options.setdefault('pool_size', config['DB_POOL_SIZE'])
+        options.setdefault('max_overflow', config['DB_MAX_OVERFLOW'])
+        options.setdefault('pool_pre_ping', config['DB_POOL_PRE_PING'])
+        options.setdefault('pool_recycle', config['DB_POOL_RECYCLE'])
+        options.setdefault('pool_timeout', config['DB_POOL_TIMEOUT'])
+
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def init_sqlite_pragmas(app):
+    """Run the SQLite tuning PRAGMAs on every connection the engine opens
+
+    Must run right after db.init_app(), before the first connection. Does
+    nothing unless the database is a SQLite file and SQLITE_TUNING is on.
+    """
+    if not (app.config['SQLITE_TUNING'] and is_file_sqlite(app.config['SQLALCHEMY_DATABASE_URI'])):
+        return
+    pragmas = sqlite_pragmas(app.config)
+
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    with app.app_context():
+        event.listen(db.engine, 'connect', apply_pragmas)
+
+
+def init_connectivity_check(app):
+    """Check the database once per process, on the first request
+
+    Replaces connecting while the app is created, which made every worker
+    (and every preloading master) open a connection at boot. Until the check
+    succeeds, requests are answered with 503 and the check is retried.
+    """
+    state = {'checked': False}
+
+    @app.before_request
+    def check_database():
+        if state['checked']:
+            return None
+        try:
+            with db.engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+        except SQLAlchemyError as e:
+            app.logger.error(f'Database unavailable: {str(e)}')
+            return jsonify({'error': 'Database unavailable'}), 503
+        state['checked'] = True
+        return None
+
+
+def reset_after_fork(app):
+    """Drop state a forked worker must not share with its parent
+
+    Pooled connections inherited from the parent are discarded without being
+    closed (closing them would close the parent's sockets and SQLite file
+    handles too), and the sequence blocks reserved by the parent are
+    forgotten, otherwise every worker would hand out the same reference and
+    account numbers. The password hashing pool is recreated, as its threads
+    did not survive the fork.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    app.extensions['sequences'].reset()
+    app.extensions['passwords'].reset()
+
+
+def init_fork_safety(app):
+    """Run reset_after_fork in every child process forked from this one
+
+    Makes gunicorn's preload_app safe: the app is created once in the master
+    and each worker starts with its own connections and sequence blocks.
+    """
+    app_ref = weakref.ref(app)
+
+    def after_fork_in_child():
+        app = app_ref()
+        if app is not None:
+            reset_after_fork(app)
+
+    os.register_at_fork(after_in_child=after_fork_in_child)
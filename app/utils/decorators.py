@@ -1,8 +1,33 @@
+import hashlib
+from datetime import timezone
 from functools import wraps
-from flask import jsonify
-from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt, get_jwt_identity, verify_jwt_in_request
 from app.models.user import User
-from app import db
+from app.services.idempotency import RequestInProgress
+from app import db, limiter
+
+def current_role_grant():
+    """
+    Resolve the caller's RoleGrant (role name and permission set)
+    Uses the role claims embedded at login and the permission cache, so no
+    query is needed when the cache is warm. Tokens without role claims fall
+    back to loading the user.
+    The user row is not read, so a user who is deleted or moved to another
+    role keeps the token's permissions until it expires
+    (JWT_ACCESS_TOKEN_EXPIRES); refreshing re-reads the user. Changes to a
+    role's own permissions bump its version and apply within
+    PERMISSION_CACHE_TTL.
+    """
+    claims = get_jwt()
+    cache = current_app.extensions['permissions']
+    if 'role_id' in claims:
+        return cache.get(claims['role_id'], claims.get('role_version', 0))
+
+    user = db.session.get(User, get_jwt_identity())
+    if not user:
+        return None
+    return cache.get(user.role_id)
 
 def require_permissions(*required_permissions):
     """
@@ -13,16 +38,15 @@ def require_permissions(*required_permissions):
         @wraps(fn)
         def wrapper(*args, **kwargs):
             verify_jwt_in_request()
-            user_id = get_jwt_identity()
-            user = db.session.get(User, user_id)
+            grant = current_role_grant()
             
-            if not user:
+            if not grant:
                 return jsonify({'error': 'User not found'}), 404
             
             # Check if user has all required permissions
             missing_permissions = [
                 perm for perm in required_permissions 
-                if not user.has_permission(perm)
+                if perm not in grant.permissions
             ]
             
             if missing_permissions:
@@ -44,13 +68,12 @@ def require_role(role_name):
         @wraps(fn)
         def wrapper(*args, **kwargs):
             verify_jwt_in_request()
-            user_id = get_jwt_identity()
-            user = db.session.get(User, user_id)
+            grant = current_role_grant()
             
-            if not user:
+            if not grant:
                 return jsonify({'error': 'User not found'}), 404
             
-            if not user.has_role(role_name):
+            if grant.name != role_name:
                 return jsonify({
                     'error': 'Insufficient role',
                     'required_role': role_name
@@ -59,3 +82,134 @@ def require_role(role_name):
             return fn(*args, **kwargs)
         return wrapper
     return decorator
+
+def idempotent(fn):
+    """
+    Decorator to make a money-moving endpoint safe to retry
+    Clients send an `Idempotency-Key` header; a retry with the same key and
+    body gets the stored response back without running the handler again.
+    Must be applied below @jwt_required().
+    Usage: @idempotent
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return fn(*args, **kwargs)
+        if not key or len(key) > 255:
+            return jsonify({'error': 'Idempotency-Key must be 1-255 characters'}), 400
+
+        user_id = int(get_jwt_identity())
+        store = current_app.extensions['idempotency']
+        request_hash = hashlib.sha256(
+            request.method.encode() + request.path.encode() + b'\n' + request.get_data()
+        ).hexdigest()
+
+        try:
+            stored = store.get(user_id, key)
+            if stored is None:
+                store.reserve(user_id, key, request.endpoint, request_hash)
+        except RequestInProgress:
+            return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+
+        if stored is not None:
+            if stored.request_hash != request_hash:
+                return jsonify({
+                    'error': 'Idempotency-Key was already used for a different request'
+                }), 422
+            response = current_app.response_class(
+                stored.body, status=stored.status_code, mimetype=stored.mimetype)
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = current_app.make_response(fn(*args, **kwargs))
+        except Exception:
+            store.release(user_id, key)
+            raise
+
+        # Server errors are not final: let the client retry them
+        if response.status_code >= 500:
+            store.release(user_id, key)
+        else:
+            store.complete(user_id, key, request_hash, response)
+        return response
+    return wrapper
+
+def _not_modified(etag, last_modified):
+    """
+    Whether the client's copy is current (RFC 9110 13.2.2)
+    If-None-Match decides whenever it is sent. If-Modified-Since is only
+    honoured on its own, and only when the resource is from an earlier second
+    than the client's date: Last-Modified has 1-second resolution, so a change
+    in the same second as the copy would otherwise be answered with a 304.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    since = request.if_modified_since
+    if since is None or last_modified is None:
+        return False
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) < since
+
+def conditional(version, public=False):
+    """
+    Decorator answering conditional GETs (If-None-Match / If-Modified-Since)
+    `version(*args, **kwargs)` receives the view arguments and returns a
+    (tag, last_modified) pair from a cheap query, or None to let the view run
+    (and produce its 404 or 400). When the client's copy is current a 304 is
+    returned without running the view or building the body.
+    Private resources must be applied below @jwt_required(); their ETag is
+    scoped to the caller and the query string.
+    Usage: @conditional(lambda id: ...)
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            current = version(*args, **kwargs)
+            if current is None:
+                return fn(*args, **kwargs)
+
+            tag, last_modified = current
+            scope = [request.path, sorted(request.args.items(multi=True)), tag]
+            if not public:
+                scope.append(get_jwt_identity())
+            etag = hashlib.sha256(repr(scope).encode()).hexdigest()[:32]
+
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(fn(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            if public:
+                response.cache_control.public = True
+                response.cache_control.max_age = current_app.config['PUBLIC_CACHE_MAX_AGE']
+            else:
+                # Shared caches must not store it; clients revalidate every time
+                response.cache_control.private = True
+                response.cache_control.no_cache = True
+                response.vary.add('Authorization')
+            return response
+        return wrapper
+    return decorator
+
+def read_budget(cost=1):
+    """
+    Decorator charging a read endpoint against the caller's shared read budget
+    All decorated endpoints draw on one RATELIMIT_READ_BUDGET per user (per
+    address for anonymous callers). `cost` is the number of units the request
+    uses, or a callable returning it, so large pages and exports are throttled
+    in proportion to the database work they cause. The endpoint's other
+    limits (its own or the defaults) still apply.
+    Usage: @read_budget(rows_cost)
+    """
+    return limiter.shared_limit(
+        lambda: current_app.config['RATELIMIT_READ_BUDGET'], scope='read_budget',
+        cost=cost, override_defaults=False
+    )
@@ -0,0 +1,82 @@
+import time
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from app import db
+
+
+class RequestSQLStats:
+    """Statements issued while serving one request"""
+
+    __slots__ = ('count', 'duration', 'statements')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def repeated(self, minimum=2):
+        """Statements run at least `minimum` times (with different parameters), most frequent first"""
+        return [(statement, count) for statement, count in self.statements.most_common()
+                if count >= minimum]
+
+    def header_value(self):
+        return (f'statements={self.count}; time_ms={self.duration * 1000:.2f}; '
+                f'repeated={len(self.repeated())}')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['sql_stats_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('sql_stats_started', None)
+    if started is None or not has_request_context():
+        return
+    stats = g.get('sql_stats')
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def _start_request():
+    g.sql_stats = RequestSQLStats()
+
+
+def _finish_request(response):
+    stats = g.get('sql_stats')
+    if stats is None:
+        return response
+
+    config = current_app.config
+    suspects = stats.repeated(config['SQL_REPEAT_THRESHOLD'])
+    if stats.count > config['SQL_STATEMENT_THRESHOLD'] or suspects:
+        current_app.logger.warning(
+            '%s %s issued %d statements in %.2f ms%s',
+            request.method, request.path, stats.count, stats.duration * 1000,
+            ''.join(f'\n  possible N+1 ({count}x): {statement}' for statement, count in suspects)
+        )
+    if config['SQL_STATS_HEADER']:
+        response.headers['X-SQL-Stats'] = stats.header_value()
+    return response
+
+
+def init_sql_instrumentation(app):
+    """Count statements, DB time and repeated statements per request
+
+    Listens on the app's engine and keeps a RequestSQLStats on `g.sql_stats`.
+    Requests issuing more than SQL_STATEMENT_THRESHOLD statements, or the same
+    statement at least SQL_REPEAT_THRESHOLD times (the signature of an N+1
+    lazy load), are logged. With SQL_STATS_HEADER set, the numbers are also
+    returned in an X-SQL-Stats response header.
+    """
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,124 @@
+import hmac
+import os
+import time
+from flask import Response, current_app, g, jsonify, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import func
+from sqlalchemy.pool import QueuePool
+from app import db
+
+# With PROMETHEUS_MULTIPROC_DIR set (before this module is imported), every
+# gunicorn worker writes its samples to files in that directory and /metrics
+# sums them, so a scrape sees the whole server rather than one worker.
+
+REQUESTS = Counter(
+    'revobank_http_requests_total', 'HTTP requests served',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+REQUEST_LATENCY = Histogram(
+    'revobank_http_request_duration_seconds', 'Time spent handling HTTP requests',
+    ['blueprint', 'endpoint', 'method']
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    'revobank_db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled database connection',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    'revobank_rate_limit_rejections_total', 'Requests rejected by the rate limiter',
+    ['endpoint', 'limit']
+)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+class PendingApprovalCollector:
+    """Counts transfers awaiting approval at scrape time, off ix_transaction_status_timestamp"""
+
+    def collect(self):
+        from app.models.transaction import Transaction
+        count = db.session.query(func.count(Transaction.id)).filter(
+            Transaction.type == 'transfer',
+            Transaction.status == Transaction.STATUS_PENDING_APPROVAL
+        ).scalar()
+        yield GaugeMetricFamily(
+            'revobank_transfers_pending_approval', 'Transfers waiting for admin approval', value=count
+        )
+
+
+def count_rate_limit_rejection(request_limit):
+    """Flask-Limiter on_breach callback"""
+    RATE_LIMIT_REJECTIONS.labels(request.endpoint or 'unmatched', str(request_limit.limit)).inc()
+
+
+def _start_timer():
+    g.metrics_started = time.perf_counter()
+
+
+def _observe_request(response):
+    endpoint = request.endpoint or 'unmatched'
+    blueprint = request.blueprint or ''
+    REQUESTS.labels(blueprint, endpoint, request.method, response.status_code).inc()
+    # Requests refused before the timer started (e.g. by the rate limiter) are only counted
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        REQUEST_LATENCY.labels(blueprint, endpoint, request.method).observe(
+            time.perf_counter() - started)
+    return response
+
+
+def metrics():
+    """Prometheus text exposition of the app's metrics
+
+    With METRICS_TOKEN set, scrapers must send it as a bearer token.
+    """
+    token = current_app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                         f'Bearer {token}'.encode()):
+        return jsonify({'error': 'Invalid metrics token'}), 401
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    scrape_time = CollectorRegistry()
+    scrape_time.register(PendingApprovalCollector())
+    return Response(generate_latest(registry) + generate_latest(scrape_time),
+                    mimetype=CONTENT_TYPE_LATEST)
+
+
+def configure_metrics(app):
+    """Hook the pool and the rate limiter into the metrics
+
+    Must run before db.init_app() and limiter.init_app(). The engine uses
+    TimedQueuePool unless its options choose another pool; in-memory SQLite
+    keeps its StaticPool, which never waits.
+    """
+    engine_options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    engine_options.setdefault('poolclass', TimedQueuePool)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+    app.config.setdefault('RATELIMIT_ON_BREACH_CALLBACK', count_rate_limit_rejection)
+
+
+def init_metrics(app):
+    """Time every request and serve the metrics at METRICS_PATH
+
+    A scrape counts pending transfers in the database, so the endpoint has a
+    rate limit of its own (METRICS_RATE_LIMIT) instead of the default one.
+    """
+    from app import limiter
+    app.before_request(_start_timer)
+    app.after_request(_observe_request)
+    limit = limiter.limit(lambda: current_app.config['METRICS_RATE_LIMIT'])
+    app.add_url_rule(app.config['METRICS_PATH'], 'metrics', limit(metrics))
@@ -0,0 +1,146 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_, select, union_all
+
+# Ids are bound as SQLite INTEGERs, which are signed 64-bit
+_MAX_CURSOR_ID = 2 ** 63 - 1
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def page_size(args):
+    """The `limit` query argument of a listing, or None if it is out of range
+
+    Listing views answer None with a 400; the read budget charges it as a
+    single unit.
+    """
+    limit = args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    return limit if 1 <= limit <= MAX_PAGE_SIZE else None
+
+
+def include_total(args):
+    """Whether a listing reports its (potentially expensive) total count
+
+    `include_total` decides when given; otherwise page mode counts and
+    cursor mode does not.
+    """
+    value = args.get('include_total')
+    if value is None:
+        return 'cursor' not in args
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def encode_cursor(timestamp, item_id):
+    """Encode a (timestamp, id) position into an opaque, URL-safe cursor"""
+    payload = json.dumps([timestamp.isoformat(), item_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        timestamp = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError, OverflowError, json.JSONDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    # encode_cursor writes an integer id; floats, booleans and ids that do
+    # not fit in a bound parameter are rejected rather than coerced
+    if type(item_id) is not int or not -_MAX_CURSOR_ID - 1 <= item_id <= _MAX_CURSOR_ID:
+        raise ValueError('Invalid cursor')
+    return timestamp, item_id
+
+
+def ordered_union(queries, timestamp_column, id_column, limit, offset=0):
+    """Rows `offset` to `offset + limit` of disjoint queries, in (timestamp DESC, id DESC) order
+
+    Each query is ordered and cut to `offset + limit` rows on its own, inside
+    a UNION ALL. When an index returns a query in timestamp order, the
+    database stops reading there and sorts nothing. For first pages and
+    cursor pages (no offset), the few rows that come back are merged here:
+    an ORDER BY over the union would make SQLite sort every branch again.
+    With an offset, the database merges them, so skipped rows stay in
+    SQLite; it sorts at most `offset + limit` rows per query.
+
+    Args:
+        queries: unordered queries over the same columns that share no rows
+        timestamp_column: column holding the primary sort key
+        id_column: unique tie-breaker column
+        limit (int): rows to return
+        offset (int): rows to skip
+
+    Returns:
+        list of rows
+    """
+    if not queries:
+        return []
+    statement = ordered_union_statement(queries, timestamp_column, id_column, limit, offset)
+    rows = queries[0].session.execute(statement).all()
+    if len(queries) > 1 and not offset:
+        timestamp_key, id_key = timestamp_column.key, id_column.key
+        rows.sort(key=lambda row: (getattr(row, timestamp_key), getattr(row, id_key)), reverse=True)
+        del rows[limit:]
+    return rows
+
+
+def ordered_union_statement(queries, timestamp_column, id_column, limit, offset=0):
+    """The SELECT run by ordered_union(); without an offset its rows still need merging"""
+    ordering = (timestamp_column.desc(), id_column.desc())
+    if len(queries) == 1:
+        return queries[0].order_by(*ordering).offset(offset).limit(limit).statement
+
+    # Built from each query's Core statement: wrapping ORM queries and
+    # listing subquery columns costs milliseconds per page
+    union = union_all(*(
+        select(query.statement.order_by(*ordering).limit(offset + limit).subquery())
+        for query in queries
+    ))
+    if not offset:
+        return union
+    union = union.subquery()
+    return (
+        select(union)
+        .order_by(union.c[timestamp_column.key].desc(), union.c[id_column.key].desc())
+        .offset(offset)
+        .limit(limit)
+    )
+
+
+def keyset_paginate(queries, timestamp_column, id_column, cursor, limit):
+    """Seek to the page after `cursor` in a (timestamp DESC, id DESC) ordering
+
+    Instead of OFFSET, rows are filtered on the last seen (timestamp, id) so
+    every page costs the same regardless of how deep it is.
+
+    Args:
+        queries: unordered queries to paginate together (see ordered_union)
+        timestamp_column: column holding the primary sort key
+        id_column: unique tie-breaker column
+        cursor (str): cursor from a previous page, or empty for the first page
+        limit (int): page size
+
+    Returns:
+        tuple of (items, next_cursor). next_cursor is None on the last page.
+    """
+    if cursor:
+        timestamp, last_id = decode_cursor(cursor)
+        seek = or_(
+            timestamp_column < timestamp,
+            and_(timestamp_column == timestamp, id_column < last_id)
+        )
+        queries = [query.filter(seek) for query in queries]
+
+    # Fetch one extra row to know whether another page exists
+    items = ordered_union(queries, timestamp_column, id_column, limit + 1)
+    if len(items) <= limit:
+        return items, None
+
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor(last.timestamp, last.id)
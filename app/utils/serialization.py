@@ -0,0 +1,111 @@
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+from app.models.account import Account
+from app.models.transaction import Transaction
+
+try:
+    import orjson
+except ImportError:  # Optional dependency; fall back to the stdlib encoder
+    orjson = None
+
+
+def _default(o):
+    """Encode datetimes as ISO 8601, like to_dict() and orjson do"""
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    return DefaultJSONProvider.default(o)
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's default provider, but with ISO 8601 instead of HTTP dates"""
+    default = staticmethod(_default)
+
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson, which encodes datetimes natively in C"""
+
+    mimetype = 'application/json'
+    options = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self.options).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=self.options),
+            mimetype=self.mimetype
+        )
+
+
+def create_json_provider(app):
+    """Build the JSON provider selected by JSON_PROVIDER (auto, orjson or stdlib)"""
+    choice = app.config['JSON_PROVIDER']
+    if choice == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_PROVIDER=orjson requires the orjson package')
+    if choice == 'orjson' or (choice == 'auto' and orjson is not None):
+        return OrjsonProvider(app)
+    return StdlibJSONProvider(app)
+
+
+# Column-tuple loading: list endpoints select these columns instead of mapped
+# objects and turn each row into a dict with a single zip()
+
+TRANSACTION_COLUMNS = (
+    Transaction.id,
+    Transaction.reference_number,
+    Transaction.type,
+    Transaction.amount,
+    Transaction.timestamp,
+    Transaction.description,
+    Transaction.status,
+    Transaction.account_id,
+    Transaction.recipient_account_id
+)
+TRANSACTION_FIELDS = tuple(column.key for column in TRANSACTION_COLUMNS)
+
+ACCOUNT_COLUMNS = (
+    Account.id,
+    Account.account_number,
+    Account.account_type,
+    Account.balance,
+    Account.currency,
+    Account.status,
+    Account.created_at
+)
+ACCOUNT_FIELDS = tuple(column.key for column in ACCOUNT_COLUMNS)
+
+# Per-type fields of Account.to_dict(), computed once instead of per row
+ACCOUNT_TYPE_FRAGMENTS = {
+    name: {'minimum_balance': details['min_balance'], 'description': details['description']}
+    for name, details in Account.ACCOUNT_TYPES.items()
+}
+
+
+def transaction_rows_to_dicts(rows):
+    """Serialize TRANSACTION_COLUMNS rows to the shape of Transaction.to_dict()"""
+    items = []
+    for row in rows:
+        item = dict(zip(TRANSACTION_FIELDS, row))
+        if item['type'] != 'transfer' or item['recipient_account_id'] is None:
+            del item['recipient_account_id']
+        items.append(item)
+    return items
+
+
+def transaction_rows_to_full_dicts(rows):
+    """Serialize TRANSACTION_COLUMNS rows keeping every field"""
+    return [dict(zip(TRANSACTION_FIELDS, row)) for row in rows]
+
+
+def account_rows_to_dicts(rows):
+    """Serialize ACCOUNT_COLUMNS rows to the shape of Account.to_dict()"""
+    items = []
+    for row in rows:
+        item = dict(zip(ACCOUNT_FIELDS, row))
+        item.update(ACCOUNT_TYPE_FRAGMENTS[item['account_type']])
+        items.append(item)
+    return items
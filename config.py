@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -6,27 +7,133 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:////tmp/revobank.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # File-backed SQLite tuning: WAL lets readers run alongside the single
+    # writer, and writes take the lock with BEGIN IMMEDIATE and wait up to
+    # SQLITE_BUSY_TIMEOUT for it
+    SQLITE_TUNING = os.getenv('SQLITE_TUNING', 'True').lower() == 'true'
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')  # Durable with WAL except on power loss
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))  # Milliseconds
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))  # Bytes
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', '-32768'))  # Negative: KiB per connection
+    SQLITE_BEGIN_IMMEDIATE = os.getenv('SQLITE_BEGIN_IMMEDIATE', 'True').lower() == 'true'
+    
+    # Connection pool for server databases (PostgreSQL, MySQL)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'True').lower() == 'true'
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # Seconds
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))  # Seconds to wait for a connection
+    
     # Test database
     TEST_DATABASE_URI = os.getenv('DATABASE_TEST_URL', 'sqlite:///:memory:')
     
     # JWT configuration
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY', 'dev-secret-key')
-    # JWT token expiration (1 hour in seconds)
-    JWT_ACCESS_TOKEN_EXPIRES = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', '3600'))
+    # Access token lifetime in seconds. Requests are authorized from the role
+    # claims in the token, so a user whose role changes or who is deleted
+    # keeps the old permissions until the token expires (refresh re-reads the
+    # user). Keep this short
+    JWT_ACCESS_TOKEN_EXPIRES = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', '900'))
+    
+    # Token revocation (logout): 'database' shares revocations across workers
+    # through the revoked_token table and mmap'd Bloom filters; 'memory' is
+    # process-local
+    TOKEN_REVOCATION_BACKEND = os.getenv('TOKEN_REVOCATION_BACKEND', 'database')
+    TOKEN_REVOCATION_BLOOM_DIR = os.getenv(
+        'TOKEN_REVOCATION_BLOOM_DIR', os.path.join(tempfile.gettempdir(), 'revobank-revocation'))
+    TOKEN_REVOCATION_BLOOM_SIZE = int(os.getenv('TOKEN_REVOCATION_BLOOM_SIZE', str(1 << 20)))  # Bytes per day
+    TOKEN_REVOCATION_BLOOM_HASHES = int(os.getenv('TOKEN_REVOCATION_BLOOM_HASHES', '7'))
+    # Seconds between each process's check for revocations made elsewhere
+    TOKEN_REVOCATION_SYNC_INTERVAL = int(os.getenv('TOKEN_REVOCATION_SYNC_INTERVAL', '5'))
     
     # Flask configuration
     DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     
+    # Startup: 'development' creates missing tables and connects while the app
+    # is created; 'production' relies on Alembic migrations (flask db upgrade)
+    # and checks connectivity once per process, on its first request
+    STARTUP_MODE = os.getenv('STARTUP_MODE', 'development')
+    
+    # Number of reverse proxies / load balancers in front of the app. Their
+    # X-Forwarded-For entries are trusted, so request.remote_addr (used by the
+    # rate limits and the per-address login lockout) is the real client.
+    # Leave at 0 when clients connect directly: the header is then ignored
+    TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
+    
     # Rate limiting
     RATELIMIT_DEFAULT = os.getenv('RATELIMIT_DEFAULT', '100/hour')
-    RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL', 'memory://')
+    # memory:// counts per process, so N workers allow N times the limit.
+    # sqlite:////dev/shm/revobank-ratelimit.db shares the counters between
+    # workers (app.services.ratelimit); redis:// etc. also work
+    RATELIMIT_STORAGE_URI = os.getenv('RATELIMIT_STORAGE_URL', 'memory://')
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'True').lower() == 'true'  # False for load tests
+    # Read endpoints also draw on one budget per user, in units of database
+    # work: a page of RATELIMIT_ROWS_PER_UNIT rows, a total count or an
+    # account read is one unit, a streaming export RATELIMIT_EXPORT_COST
+    RATELIMIT_READ_BUDGET = os.getenv('RATELIMIT_READ_BUDGET', '600/minute')
+    RATELIMIT_ROWS_PER_UNIT = int(os.getenv('RATELIMIT_ROWS_PER_UNIT', '20'))
+    RATELIMIT_EXPORT_COST = int(os.getenv('RATELIMIT_EXPORT_COST', '50'))
     
     # Security settings
     MINIMUM_BALANCE = float(os.getenv('MINIMUM_BALANCE', '100000.0'))
     HIGH_VALUE_THRESHOLD = float(os.getenv('HIGH_VALUE_THRESHOLD', '50000000.0'))
+    PERMISSION_CACHE_TTL = int(os.getenv('PERMISSION_CACHE_TTL', '60'))  # Seconds before re-reading a role
+    # Password hashing: a werkzeug method string (scrypt:N:r:p or pbkdf2:hash:iterations).
+    # Stored hashes with other parameters are upgraded on the next login
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 1)))  # Threads per process
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '32'))  # Running + queued, then 503
+    # Failed logins within the last ACCOUNT_LOCKOUT_DURATION seconds lock the
+    # username, or the client address (higher limit: many users share NATs)
     MAX_FAILED_LOGIN_ATTEMPTS = int(os.getenv('MAX_FAILED_LOGIN_ATTEMPTS', '5'))
+    MAX_FAILED_LOGIN_ATTEMPTS_PER_IP = int(os.getenv('MAX_FAILED_LOGIN_ATTEMPTS_PER_IP', '50'))  # 0 disables
     ACCOUNT_LOCKOUT_DURATION = int(os.getenv('ACCOUNT_LOCKOUT_DURATION', '900'))  # 15 minutes
     
-    # Server configuration
-    workers = int(os.getenv('GUNICORN_WORKERS', '2'))
-    bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
\ No newline at end of file
+    # Batch transfers
+    MAX_BATCH_TRANSFERS = int(os.getenv('MAX_BATCH_TRANSFERS', '500'))
+    
+    # JSON encoder for responses: auto (orjson when installed), orjson or stdlib
+    JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'auto')
+    
+    # Cache-Control max-age for public, static responses (GET /accounts/types)
+    PUBLIC_CACHE_MAX_AGE = int(os.getenv('PUBLIC_CACHE_MAX_AGE', '86400'))
+    
+    # Prometheus metrics (opt-in). For gunicorn, also export PROMETHEUS_MULTIPROC_DIR
+    # (an empty directory shared by the workers) so /metrics aggregates all of them
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False').lower() == 'true'
+    METRICS_PATH = os.getenv('METRICS_PATH', '/metrics')
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')  # Bearer token scrapers must send; empty = none
+    METRICS_RATE_LIMIT = os.getenv('METRICS_RATE_LIMIT', '12 per minute')
+    
+    # Per-request SQL instrumentation (statement count, DB time, N+1 detection)
+    SQL_INSTRUMENTATION = os.getenv('SQL_INSTRUMENTATION', 'False').lower() == 'true'
+    SQL_STATEMENT_THRESHOLD = int(os.getenv('SQL_STATEMENT_THRESHOLD', '20'))  # Log requests above this
+    SQL_REPEAT_THRESHOLD = int(os.getenv('SQL_REPEAT_THRESHOLD', '5'))  # Same statement this often = N+1
+    SQL_STATS_HEADER = os.getenv('FLASK_ENV', 'production') != 'production'  # X-SQL-Stats header
+    
+    # Rows fetched per round trip when streaming exports
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+    
+    # Sequence numbers (transaction references) reserved per worker at a time
+    SEQUENCE_BLOCK_SIZE = int(os.getenv('SEQUENCE_BLOCK_SIZE', '1000'))
+    
+    # Idempotency-Key support for money-moving endpoints
+    IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', '86400'))  # 24 hours
+    IDEMPOTENCY_CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', '10000'))  # Entries per worker
+    # Seconds an in-flight key stays reserved; keep it above GUNICORN_TIMEOUT
+    IDEMPOTENCY_LEASE = int(os.getenv('IDEMPOTENCY_LEASE', '60'))
+    
+    # Server configuration, read by gunicorn.conf.py
+    GUNICORN_BIND = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+    GUNICORN_WORKERS = int(os.getenv('GUNICORN_WORKERS', '2'))
+    # sync: one request per worker; gthread: GUNICORN_THREADS per worker;
+    # gevent: up to GUNICORN_WORKER_CONNECTIONS greenlets per worker
+    GUNICORN_WORKER_CLASS = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+    GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', '4'))
+    GUNICORN_WORKER_CONNECTIONS = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '100'))
+    GUNICORN_MAX_REQUESTS = int(os.getenv('GUNICORN_MAX_REQUESTS', '10000'))  # Recycle workers; 0 = never
+    GUNICORN_MAX_REQUESTS_JITTER = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '1000'))
+    GUNICORN_KEEPALIVE = int(os.getenv('GUNICORN_KEEPALIVE', '5'))  # Seconds
+    GUNICORN_TIMEOUT = int(os.getenv('GUNICORN_TIMEOUT', '30'))  # Seconds
+    GUNICORN_PRELOAD = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
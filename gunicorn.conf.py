@@ -0,0 +1,59 @@
+"""Gunicorn settings, driven by config.Config (and so by environment variables)
+
+Picked up automatically when gunicorn runs from the project root:
+
+    gunicorn run:app
+
+The default gthread workers keep serving other requests while one thread
+hashes a password or waits on the database. gevent needs the database
+driver to cooperate with its event loop (psycopg2 with psycogreen, not
+sqlite3) to gain anything, and is started without preload_app because its
+monkey-patching has to happen before the app is imported.
+"""
+import os
+import shutil
+from config import Config
+
+bind = Config.GUNICORN_BIND
+workers = Config.GUNICORN_WORKERS
+worker_class = Config.GUNICORN_WORKER_CLASS
+# gunicorn turns sync workers with more than one thread into gthread workers
+threads = Config.GUNICORN_THREADS if worker_class == 'gthread' else 1
+worker_connections = Config.GUNICORN_WORKER_CONNECTIONS
+max_requests = Config.GUNICORN_MAX_REQUESTS
+max_requests_jitter = Config.GUNICORN_MAX_REQUESTS_JITTER
+keepalive = Config.GUNICORN_KEEPALIVE
+timeout = Config.GUNICORN_TIMEOUT
+graceful_timeout = Config.GUNICORN_TIMEOUT
+
+# The app is fork-safe (see app.utils.database.init_fork_safety), so import
+# it once in the master and share its memory with the workers
+preload_app = Config.GUNICORN_PRELOAD and worker_class != 'gevent'
+
+# Worker heartbeats on tmpfs: a slow disk (e.g. overlayfs in Docker) can
+# otherwise get healthy workers killed
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+# preload_app imports the app (and prometheus_client) before on_starting runs
+if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def on_starting(server):
+    """Drop metric files left by a previous run of the server
+
+    Workers are forked after this, and each writes its own files (keyed by
+    pid), so removing the master's files here loses nothing.
+    """
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    """Stop reporting the live gauges of a worker that exited"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,28 @@
+"""add sequence counter table
+
+Revision ID: 5d7a2b9e4f18
+Revises: c3e8f0a4d215
+Create Date: 2026-10-18 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d7a2b9e4f18'
+down_revision = 'c3e8f0a4d215'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sequence_counter',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('next_value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('sequence_counter')
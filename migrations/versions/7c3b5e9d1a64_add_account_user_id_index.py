@@ -0,0 +1,26 @@
+"""add account user_id index
+
+Revision ID: 7c3b5e9d1a64
+Revises: 2a6f9d4c8e51
+Create Date: 2026-10-18 15:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3b5e9d1a64'
+down_revision = '2a6f9d4c8e51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('account', schema=None) as batch_op:
+        batch_op.create_index('ix_account_user_id', ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('account', schema=None) as batch_op:
+        batch_op.drop_index('ix_account_user_id')
@@ -0,0 +1,32 @@
+"""add transaction history indexes
+
+Revision ID: 9b1d3e6a2c47
+Revises: 4f2a9c1e7b30
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b1d3e6a2c47'
+down_revision = '4f2a9c1e7b30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.create_index('ix_transaction_account_id_timestamp', ['account_id', 'timestamp'], unique=False)
+        batch_op.create_index('ix_transaction_recipient_account_id_timestamp', ['recipient_account_id', 'timestamp'], unique=False)
+        batch_op.create_index('ix_transaction_status_timestamp', ['status', 'timestamp'], unique=False)
+        batch_op.create_index('ix_transaction_timestamp_id', ['timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.drop_index('ix_transaction_timestamp_id')
+        batch_op.drop_index('ix_transaction_status_timestamp')
+        batch_op.drop_index('ix_transaction_recipient_account_id_timestamp')
+        batch_op.drop_index('ix_transaction_account_id_timestamp')
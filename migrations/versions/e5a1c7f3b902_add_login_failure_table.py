@@ -0,0 +1,36 @@
+"""add login failure table
+
+Revision ID: e5a1c7f3b902
+Revises: 7c3b5e9d1a64
+Create Date: 2026-10-18 18:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a1c7f3b902'
+down_revision = '7c3b5e9d1a64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('login_failure',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=200), nullable=False),
+        sa.Column('failed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('login_failure', schema=None) as batch_op:
+        batch_op.create_index('ix_login_failure_key_failed_at', ['key', 'failed_at'], unique=False)
+        batch_op.create_index('ix_login_failure_failed_at', ['failed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('login_failure', schema=None) as batch_op:
+        batch_op.drop_index('ix_login_failure_failed_at')
+        batch_op.drop_index('ix_login_failure_key_failed_at')
+
+    op.drop_table('login_failure')
@@ -0,0 +1,231 @@
+"""Endpoint benchmark suite with a stored baseline and a regression gate
+
+Seeds a throwaway SQLite database per dataset size with `flask seed`, then
+drives the main endpoints through the Flask test client and records p50/p99
+latency and the number of SQL statements per request. Results are compared
+with the baseline JSON; the run fails (exit code 1) when a tracked metric got
+worse by more than --tolerance percent.
+
+Usage:
+    python tests/benchmarks/bench_endpoints.py [--sizes small,medium] [--iterations 200]
+    python tests/benchmarks/bench_endpoints.py --update-baseline
+
+Latency baselines are machine-specific: regenerate them with --update-baseline
+on the machine that runs the gate. Statement counts are portable.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baselines', 'endpoints.json')
+
+# Dataset sizes: arguments to `flask seed`
+SIZES = {
+    'small': {'users': 200, 'transactions': 20_000},
+    'medium': {'users': 2_000, 'transactions': 200_000},
+    'large': {'users': 20_000, 'transactions': 2_000_000},
+}
+
+TRACKED_METRICS = ('p50_ms', 'p99_ms', 'statements')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='small,medium', help=f'Comma-separated subset of {list(SIZES)}')
+    parser.add_argument('--iterations', type=int, default=200, help='Timed requests per endpoint')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='Baseline JSON file')
+    parser.add_argument('--update-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=25.0,
+                        help='Allowed regression of a tracked metric, in percent')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                        help='Ignore latency regressions smaller than this, however large in percent')
+    parser.add_argument('--metrics', default=','.join(TRACKED_METRICS),
+                        help=f'Comma-separated subset of {list(TRACKED_METRICS)} to gate on')
+    return parser.parse_args()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def statement_count(response):
+    stats = dict(part.split('=') for part in response.headers['X-SQL-Stats'].split('; '))
+    return int(stats['statements'])
+
+
+def build_app(size, spec):
+    """Create an app on a fresh file-backed database seeded with `spec`"""
+    path = os.path.join(tempfile.mkdtemp(prefix='revobank-bench-'), f'{size}.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    # The periodic revocation sync would add a statement to whichever sample
+    # crosses an interval boundary
+    os.environ.setdefault('TOKEN_REVOCATION_SYNC_INTERVAL', '3600')
+
+    from app import create_app, db, limiter
+    from app.utils.instrumentation import init_sql_instrumentation
+
+    app = create_app()
+    app.config.update(SQL_STATS_HEADER=True, SQL_STATEMENT_THRESHOLD=10_000, SQL_REPEAT_THRESHOLD=10_000)
+    init_sql_instrumentation(app)
+    limiter.enabled = False
+
+    started = time.perf_counter()
+    with app.app_context():
+        db.create_all()
+    result = app.test_cli_runner().invoke(args=[
+        'seed', '--users', str(spec['users']), '--transactions', str(spec['transactions']),
+        '--skip-password-hashing'
+    ])
+    if result.exit_code != 0:
+        raise RuntimeError(result.output) from result.exception
+    print(f'[{size}] seeded {spec["transactions"]:,} transactions in {time.perf_counter() - started:.1f}s')
+    return app
+
+
+def prepare(app, iterations):
+    """Pick the benchmark actors and queue transfers for the approval benchmark"""
+    from sqlalchemy import insert
+    from app import db
+    from app.models.account import Account
+    from app.models.role import Role
+    from app.models.transaction import Transaction
+    from app.models.user import User
+
+    with app.app_context():
+        # The head of the activity skew: the customer with the longest history
+        account = db.session.get(Account, db.session.query(db.func.min(Account.id)).scalar())
+        customer = db.session.get(User, account.user_id)
+        merchant_account = Account.query.filter_by(account_type='business').order_by(Account.id.desc()).first()
+
+        admin = User(username='bench_admin', name='Bench Admin', email='bench_admin@example.com',
+                     role_id=Role.query.filter_by(name=Role.ADMIN).one().id)
+        admin.set_password('password123')
+        db.session.add(admin)
+
+        references = [Transaction.generate_reference_number() for _ in range(iterations + 1)]
+        db.session.commit()
+        result = db.session.execute(insert(Transaction).returning(Transaction.id), [{
+            'amount': 1.0,
+            'type': 'transfer',
+            'account_id': account.id,
+            'recipient_account_id': merchant_account.id,
+            'description': 'Benchmark approval',
+            'reference_number': reference,
+            'status': Transaction.STATUS_PENDING_APPROVAL
+        } for reference in references])
+        pending_ids = result.scalars().all()
+        db.session.commit()
+        return customer.username, account.id, merchant_account.id, pending_ids
+
+
+def run_size(size, spec, iterations):
+    app = build_app(size, spec)
+    username, account_id, merchant_account_id, pending_ids = prepare(app, iterations)
+    client = app.test_client()
+
+    def login(name):
+        response = client.post('/users/login', json={'username': name, 'password': 'password123'})
+        return {'Authorization': f"Bearer {response.json['access_token']}"}
+
+    customer = login(username)
+    admin = login('bench_admin')
+    pending = iter(pending_ids)
+
+    scenarios = {
+        'login': lambda: client.post('/users/login', json={'username': username, 'password': 'password123'}),
+        'get_transactions_first_page': lambda: client.get('/transactions/?limit=20', headers=customer),
+        'get_transactions_deep_page': lambda: client.get(
+            '/transactions/?page=200&limit=20&include_total=false', headers=customer),
+        'transfer': lambda: client.post('/transactions/transfer', headers=customer, json={
+            'from_account_id': account_id, 'to_account_id': merchant_account_id, 'amount': 1.0}),
+        'deposit': lambda: client.post('/transactions/deposit', headers=customer, json={
+            'account_id': account_id, 'amount': 1.0}),
+        'approve_transaction': lambda: client.post(
+            f'/transactions/admin/approve/{next(pending)}', headers=admin),
+        'get_accounts': lambda: client.get('/accounts', headers=customer),
+    }
+
+    results = {}
+    for name, request in scenarios.items():
+        response = request()  # Warm up
+        if response.status_code >= 400:
+            raise RuntimeError(f'{name} failed with {response.status_code}: {response.get_data(as_text=True)}')
+        samples, statements = [], []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            response = request()
+            samples.append((time.perf_counter() - started) * 1000)
+            statements.append(statement_count(response))
+        results[name] = {
+            'p50_ms': round(percentile(samples, 0.50), 3),
+            'p99_ms': round(percentile(samples, 0.99), 3),
+            'statements': max(statements),
+        }
+        print(f'[{size}] {name:<30} p50 {results[name]["p50_ms"]:8.2f} ms  '
+              f'p99 {results[name]["p99_ms"]:8.2f} ms  statements {results[name]["statements"]}')
+    return results
+
+
+def compare(baseline, results, metrics, tolerance, min_delta_ms):
+    """Return a list of human-readable regressions"""
+    regressions = []
+    for size, endpoints in results.items():
+        for endpoint, current in endpoints.items():
+            previous = baseline.get(size, {}).get(endpoint)
+            if previous is None:
+                continue
+            for metric in metrics:
+                before, after = previous[metric], current[metric]
+                if after <= before * (1 + tolerance / 100):
+                    continue
+                if metric.endswith('_ms') and after - before < min_delta_ms:
+                    continue
+                change = (after - before) / before * 100 if before else float('inf')
+                regressions.append(f'{size}/{endpoint} {metric}: {before} -> {after} (+{change:.0f}%)')
+    return regressions
+
+
+def main():
+    args = parse_args()
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    metrics = [metric.strip() for metric in args.metrics.split(',') if metric.strip()]
+    unknown = [size for size in sizes if size not in SIZES] + [m for m in metrics if m not in TRACKED_METRICS]
+    if unknown:
+        sys.exit(f'Unknown sizes or metrics: {unknown}')
+
+    results = {size: run_size(size, SIZES[size], args.iterations) for size in sizes}
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Baseline written to {args.baseline}')
+        return
+
+    if not os.path.exists(args.baseline):
+        sys.exit(f'No baseline at {args.baseline}; run with --update-baseline first')
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, results, metrics, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) beyond {args.tolerance}%:')
+        for regression in regressions:
+            print(f'  {regression}')
+        sys.exit(1)
+    print(f'\nNo regressions beyond {args.tolerance}%')
+
+
+if __name__ == '__main__':
+    main()
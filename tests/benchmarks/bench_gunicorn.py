@@ -0,0 +1,116 @@
+"""Throughput and p99 of each gunicorn worker model under the locust workload
+
+Seeds a SQLite database with `flask seed`, then, for every worker model in
+the matrix, starts gunicorn with gunicorn.conf.py (configured through the
+GUNICORN_* variables) and runs tests/locust/locustfile.py headless against
+it. Reports requests/s, failures, p50/p99 overall and the p99 of login, the
+request that holds a worker longest (password hashing).
+
+Usage:
+    python tests/benchmarks/bench_gunicorn.py [--models sync,gthread,gevent] [--users 50] [--run-time 30s]
+"""
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# Worker model -> GUNICORN_* settings
+MATRIX = {
+    'sync': {'GUNICORN_WORKER_CLASS': 'sync'},
+    'gthread': {'GUNICORN_WORKER_CLASS': 'gthread', 'GUNICORN_THREADS': '4'},
+    'gthread-8': {'GUNICORN_WORKER_CLASS': 'gthread', 'GUNICORN_THREADS': '8'},
+    'gevent': {'GUNICORN_WORKER_CLASS': 'gevent', 'GUNICORN_WORKER_CONNECTIONS': '100'},
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--models', default='sync,gthread,gevent', help=f'Comma-separated subset of {list(MATRIX)}')
+    parser.add_argument('--workers', default='2', help='GUNICORN_WORKERS for every model')
+    parser.add_argument('--users', type=int, default=50, help='Concurrent locust users')
+    parser.add_argument('--spawn-rate', type=int, default=25, help='Locust users started per second')
+    parser.add_argument('--run-time', default='30s', help='Locust run time per model')
+    parser.add_argument('--seed-users', type=int, default=2000, help='Customers to seed')
+    parser.add_argument('--seed-transactions', type=int, default=200_000, help='Transactions to seed')
+    parser.add_argument('--port', type=int, default=8765, help='Port gunicorn binds to')
+    return parser.parse_args()
+
+
+def seed(env, args, pool):
+    subprocess.run([
+        sys.executable, '-m', 'flask', 'seed', '--users', str(args.seed_users),
+        '--transactions', str(args.seed_transactions), '--admins', '3',
+        '--skip-password-hashing', '--user-pool', pool
+    ], env=dict(env, FLASK_APP='run.py', STARTUP_MODE='development'), cwd=ROOT, check=True)
+
+
+def wait_until_up(port, deadline=30):
+    started = time.monotonic()
+    while time.monotonic() - started < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/health', timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'gunicorn did not come up on port {port}')
+
+
+def aggregated(stats_csv):
+    """The Aggregated row and the login row of a locust _stats.csv"""
+    with open(stats_csv, newline='') as f:
+        rows = {(row['Type'], row['Name']): row for row in csv.DictReader(f)}
+    return rows[('', 'Aggregated')], rows.get(('POST', '/users/login'))
+
+
+def run_model(model, env, args, workdir, pool):
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'run:app'],
+        env=dict(env, **MATRIX[model], GUNICORN_WORKERS=args.workers, PORT=str(args.port)),
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_until_up(args.port)
+        prefix = os.path.join(workdir, model)
+        # locust exits with 1 on SLO breaches; the numbers are what matter here
+        subprocess.run([
+            sys.executable, '-m', 'locust', '-f', 'tests/locust/locustfile.py', '--headless',
+            '--host', f'http://127.0.0.1:{args.port}', '--users', str(args.users),
+            '--spawn-rate', str(args.spawn_rate), '--run-time', args.run_time,
+            '--csv', prefix, '--only-summary', '--user-pool', pool
+        ], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    finally:
+        server.terminate()
+        server.wait()
+    return aggregated(f'{prefix}_stats.csv')
+
+
+def main():
+    args = parse_args()
+    models = [model.strip() for model in args.models.split(',') if model.strip()]
+    unknown = [model for model in models if model not in MATRIX]
+    if unknown:
+        sys.exit(f'Unknown worker models: {unknown}')
+
+    workdir = tempfile.mkdtemp(prefix='revobank-gunicorn-')
+    pool = os.path.join(workdir, 'users.csv')
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+               STARTUP_MODE='production', RATELIMIT_ENABLED='False', METRICS_ENABLED='False')
+    seed(env, args, pool)
+
+    print(f'\n{args.workers} workers, {args.users} users, {args.run_time} per model')
+    print(f'{"model":<10} {"req/s":>8} {"fail %":>7} {"p50 ms":>7} {"p99 ms":>7} {"login p99":>10}')
+    for model in models:
+        total, login = run_model(model, env, args, workdir, pool)
+        failure_rate = int(total['Failure Count']) / max(int(total['Request Count']), 1) * 100
+        print(f'{model:<10} {float(total["Requests/s"]):>8.1f} {failure_rate:>7.2f} {total["50%"]:>7} '
+              f'{total["99%"]:>7} {login["99%"] if login else "-":>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Login throughput per password hashing method
+
+Drives POST /users/login from --threads concurrent client threads for each
+hashing method (PASSWORD_HASH_METHOD) against a file-backed SQLite database,
+and reports logins/s, p50/p99 latency and the logins refused with 503 once
+more than PASSWORD_HASH_MAX_PENDING hashes were in progress.
+
+Usage:
+    python tests/benchmarks/bench_login.py [--threads 8] [--logins 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+METHODS = ['scrypt:32768:8:1', 'scrypt:16384:8:1', 'pbkdf2:sha256:600000', 'pbkdf2:sha256:100000']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent client threads')
+    parser.add_argument('--logins', type=int, default=200, help='Logins per method')
+    parser.add_argument('--methods', default=','.join(METHODS), help='Comma-separated werkzeug methods')
+    parser.add_argument('--hash-workers', type=int, default=os.cpu_count() or 1,
+                        help='PASSWORD_HASH_WORKERS')
+    parser.add_argument('--max-pending', type=int, default=32, help='PASSWORD_HASH_MAX_PENDING')
+    return parser.parse_args()
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def build_app(args):
+    path = os.path.join(tempfile.mkdtemp(prefix='revobank-login-'), 'login.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['METRICS_ENABLED'] = 'False'
+
+    from app import create_app, limiter
+    app = create_app()
+    limiter.enabled = False
+    result = app.test_cli_runner().invoke(args=[
+        'seed', '--users', str(args.threads), '--transactions', '0', '--hot-merchants', '0',
+        '--skip-password-hashing'
+    ])
+    if result.exit_code != 0:
+        raise RuntimeError(result.output) from result.exception
+    return app
+
+
+def run_method(app, method, args):
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from app.models.user import User
+    from app.services.passwords import PasswordHasher
+
+    app.extensions['passwords'] = PasswordHasher(method, args.hash_workers, args.max_pending)
+    with app.app_context():
+        db.session.query(User).update({'password_hash': generate_password_hash('password123', method)})
+        db.session.commit()
+        usernames = [username for username, in db.session.query(User.username)]
+
+    samples, statuses = [], []
+    per_thread = args.logins // args.threads
+
+    def client_thread(username):
+        client = app.test_client()
+        for _ in range(per_thread):
+            started = time.perf_counter()
+            response = client.post('/users/login', json={'username': username, 'password': 'password123'})
+            samples.append((time.perf_counter() - started) * 1000)
+            statuses.append(response.status_code)
+
+    threads = [threading.Thread(target=client_thread, args=(usernames[i % len(usernames)],))
+               for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    ok = statuses.count(200)
+    print(f'{method:<24} {ok / elapsed:>9.1f}/s {percentile(samples, 0.5):>8.1f}ms '
+          f'{percentile(samples, 0.99):>8.1f}ms {statuses.count(503):>6}')
+
+
+def main():
+    args = parse_args()
+    app = build_app(args)
+    print(f'{args.threads} client threads, {args.hash_workers} hash workers, {os.cpu_count()} CPUs')
+    print(f'{"method":<24} {"logins":>11} {"p50":>10} {"p99":>10} {"503s":>6}')
+    for method in args.methods.split(','):
+        run_method(app, method.strip(), args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Per-request overhead of each rate limit storage
+
+For every storage URI, measures:
+  - a single hit (limits' fixed-window strategy, as Flask-Limiter uses it)
+  - the same hits from --processes concurrent processes sharing the storage,
+    as wall-clock time per hit (their combined throughput)
+  - a request to a one-line Flask route with the limiter on, minus the same
+    request with the limiter off
+
+The SQLite storages are a file on disk and a file on tmpfs (/dev/shm).
+
+Usage:
+    python tests/benchmarks/bench_ratelimit.py [--hits 20000] [--requests 10000] [--processes 4]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hits', type=int, default=20_000, help='Storage hits per measurement')
+    parser.add_argument('--requests', type=int, default=10_000, help='Requests per measurement')
+    parser.add_argument('--processes', type=int, default=4, help='Concurrent processes')
+    return parser.parse_args()
+
+
+def storage_uris():
+    uris = {'memory': 'memory://',
+            'sqlite (disk)': f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='revobank-rl-'), 'rl.db')}"}
+    if os.path.isdir('/dev/shm'):
+        uris['sqlite (tmpfs)'] = f"sqlite:///{tempfile.mkdtemp(prefix='revobank-rl-', dir='/dev/shm')}/rl.db"
+    return uris
+
+
+def hit_loop(uri, hits, key):
+    """Start and end times of `hits` hits"""
+    from limits import parse
+    from limits.storage import storage_from_string
+    from limits.strategies import FixedWindowRateLimiter
+    from app.services import ratelimit  # Registers the sqlite:// storage
+
+    limiter = FixedWindowRateLimiter(storage_from_string(uri))
+    limit = parse('1000000000 per hour')
+    started = time.perf_counter()
+    for i in range(hits):
+        limiter.hit(limit, key, str(i % 100))
+    return started, time.perf_counter()
+
+
+def single_hits(uri, hits):
+    """Microseconds per hit from one thread"""
+    started, ended = hit_loop(uri, hits, 'single')
+    return (ended - started) / hits * 1e6
+
+
+def concurrent_hits(uri, hits, processes):
+    """Wall-clock microseconds per hit, all processes together"""
+    # Spawned, so no process shares a connection or memory:// counters.
+    # memory:// counts per process: its figure is what sharing costs nothing
+    with multiprocessing.get_context('spawn').Pool(processes) as pool:
+        spans = pool.starmap(hit_loop, [(uri, hits, f'p{n}') for n in range(processes)])
+    elapsed = max(ended for _, ended in spans) - min(started for started, _ in spans)
+    return elapsed / (hits * processes) * 1e6
+
+
+def request_loop(uri, requests, enabled):
+    """Microseconds per request to a trivial route"""
+    from flask import Flask
+    from flask_limiter import Limiter
+    from flask_limiter.util import get_remote_address
+    from app.services import ratelimit  # Registers the sqlite:// storage
+
+    app = Flask(__name__)
+    app.config.update(RATELIMIT_STORAGE_URI=uri, RATELIMIT_ENABLED=enabled)
+    limiter = Limiter(get_remote_address, app=app)
+
+    @app.route('/ping')
+    @limiter.limit('1000000000 per hour')
+    def ping():
+        return 'pong'
+
+    client = app.test_client()
+    for _ in range(100):
+        client.get('/ping')
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get('/ping')
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    args = parse_args()
+    print(f'{os.cpu_count()} CPUs, {args.processes} processes for the concurrent column')
+    print(f'{"storage":<16} {"hit us":>8} {"concurrent":>11} {"request us":>11} {"overhead":>9}')
+    baseline = min(request_loop('memory://', args.requests, False) for _ in range(3))
+    for label, uri in storage_uris().items():
+        single = single_hits(uri, args.hits)
+        concurrent = concurrent_hits(uri, args.hits // args.processes, args.processes)
+        request = min(request_loop(uri, args.requests, True) for _ in range(3))
+        print(f'{label:<16} {single:>8.1f} {concurrent:>11.1f} {request:>11.1f} {request - baseline:>9.1f}')
+    print(f'limiter disabled: {baseline:.1f} us/request')
+
+
+if __name__ == '__main__':
+    main()
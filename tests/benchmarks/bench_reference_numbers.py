@@ -0,0 +1,62 @@
+"""Throughput microbenchmark for transaction reference number generation
+
+Compares the previous random 8-character suffix generator with the
+block-allocated sequence generator, against a file-backed SQLite database.
+
+Usage:
+    python tests/benchmarks/bench_reference_numbers.py [--count 200000] [--block-size 1000]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--count', type=int, default=200_000, help='References to generate per run')
+    parser.add_argument('--block-size', type=int, default=1000, help='Sequence block size')
+    return parser.parse_args()
+
+
+def random_reference_number():
+    """The previous implementation, kept here for comparison"""
+    prefix = datetime.now().strftime('%Y%m%d')
+    suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+    return f'TRX{prefix}{suffix}'
+
+
+def measure(label, fn, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<28} {count / elapsed:>12,.0f} refs/s  {elapsed / count * 1e6:8.2f} us/ref')
+
+
+def main():
+    args = parse_args()
+    path = os.path.join(tempfile.mkdtemp(prefix='revobank-bench-'), 'references.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['SEQUENCE_BLOCK_SIZE'] = str(args.block_size)
+
+    from app import create_app
+    from app.models.transaction import Transaction
+
+    app = create_app()
+    with app.app_context():
+        measure('random suffix (previous)', random_reference_number, args.count)
+        measure(f'block allocator ({args.block_size}/block)',
+                Transaction.generate_reference_number, args.count)
+        print(f'database round trips: {args.count // args.block_size + 1} '
+              f'(one per {args.block_size} references)')
+
+
+if __name__ == '__main__':
+    main()
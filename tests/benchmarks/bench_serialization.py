@@ -0,0 +1,82 @@
+"""Serialization benchmark for a transaction history page
+
+Compares the previous path (mapped Transaction objects, to_dict() per row,
+Flask's stdlib JSON provider) with the current one (column tuples zipped into
+dicts, encoded by the orjson provider when it is installed).
+
+Usage:
+    python tests/benchmarks/bench_serialization.py [--page-size 100] [--repeat 500]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--page-size', type=int, default=100, help='Transactions per page')
+    parser.add_argument('--repeat', type=int, default=500, help='Timed runs per path')
+    return parser.parse_args()
+
+
+def measure(label, fn, repeat):
+    fn()  # Warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<44} {elapsed / repeat * 1000:8.3f} ms/page')
+
+
+def main():
+    args = parse_args()
+    path = os.path.join(tempfile.mkdtemp(prefix='revobank-bench-'), 'serialization.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+
+    from app import create_app, db
+    from app.models.transaction import Transaction
+    from app.utils.serialization import (
+        TRANSACTION_COLUMNS, OrjsonProvider, StdlibJSONProvider, orjson, transaction_rows_to_dicts
+    )
+
+    app = create_app()
+    with app.app_context():
+        now = datetime(2026, 1, 1)
+        db.session.execute(db.insert(Transaction), [{
+            'amount': 1000.0 + i,
+            'type': 'transfer' if i % 2 else 'deposit',
+            'timestamp': now - timedelta(seconds=i),
+            'account_id': 1,
+            'recipient_account_id': 2 if i % 2 else None,
+            'description': f'Benchmark transaction {i}',
+            'reference_number': f'TRX{i:017d}',
+            'status': 'completed'
+        } for i in range(args.page_size)])
+        db.session.commit()
+
+        order = (Transaction.timestamp.desc(), Transaction.id.desc())
+        stdlib = StdlibJSONProvider(app)
+        fast = OrjsonProvider(app) if orjson is not None else stdlib
+
+        def before():
+            items = Transaction.query.order_by(*order).limit(args.page_size).all()
+            db.session.expunge_all()
+            return stdlib.dumps({'transactions': [t.to_dict() for t in items]})
+
+        def after():
+            rows = db.session.query(*TRANSACTION_COLUMNS).order_by(*order).limit(args.page_size).all()
+            return fast.dumps({'transactions': transaction_rows_to_dicts(rows)})
+
+        print(f'{args.page_size} transactions per page, {args.repeat} runs, '
+              f'fast provider: {"orjson" if orjson is not None else "stdlib (orjson not installed)"}')
+        measure('ORM objects + to_dict() + stdlib json', before, args.repeat)
+        measure('column tuples + zip() + fast provider', after, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Multi-process read/write throughput against a file-backed SQLite database
+
+Runs reader and writer processes (as gunicorn workers would) against one
+database, once with the SQLite tuning profile off (rollback journal, deferred
+transactions) and once with it on (WAL, synchronous=NORMAL, BEGIN IMMEDIATE),
+and reports throughput and "database is locked" errors.
+
+Usage:
+    python tests/benchmarks/bench_sqlite_concurrency.py [--readers 4] [--writers 4] [--seconds 5]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4, help='Reader processes')
+    parser.add_argument('--writers', type=int, default=4, help='Writer processes')
+    parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each run')
+    parser.add_argument('--users', type=int, default=1000, help='Seeded users')
+    return parser.parse_args()
+
+
+def create_app(path, tuning):
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    os.environ['SQLITE_TUNING'] = str(tuning)
+    os.environ['METRICS_ENABLED'] = 'False'
+    from app import create_app
+    return create_app()
+
+
+def prepare(path, tuning, users, results):
+    app = create_app(path, tuning)
+    result = app.test_cli_runner().invoke(args=[
+        'seed', '--users', str(users), '--transactions', '0', '--hot-merchants', '0',
+        '--skip-password-hashing'
+    ])
+    if result.exit_code != 0:
+        raise RuntimeError(result.output) from result.exception
+    with app.app_context():
+        from app import db
+        from app.models.account import Account
+        results.put(db.session.query(db.func.max(Account.id)).scalar())
+
+
+def work(path, tuning, role, seconds, users, accounts, results):
+    import random
+    from sqlalchemy.exc import OperationalError
+    from app import db
+    from app.models.account import Account
+    from app.services import balance
+
+    app = create_app(path, tuning)
+    done = errors = 0
+    with app.app_context():
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            try:
+                if role == 'writer':
+                    balance.credit(random.randint(1, accounts), 1.0)
+                    db.session.commit()
+                else:
+                    db.session.query(Account.id, Account.balance).filter(
+                        Account.user_id == random.randint(1, users)).all()
+                    db.session.rollback()
+                done += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+    results.put((role, done, errors))
+
+
+def run(tuning, args):
+    # Config reads the environment at import time, so every process is spawned
+    # fresh rather than forked from one that already imported the app
+    context = multiprocessing.get_context('spawn')
+    path = os.path.join(tempfile.mkdtemp(prefix='revobank-sqlite-'), 'bench.db')
+    results = context.Queue()
+    setup = context.Process(target=prepare, args=(path, tuning, args.users, results))
+    setup.start()
+    accounts = results.get()
+    setup.join()
+    processes = [
+        context.Process(target=work, args=(path, tuning, role, args.seconds, args.users, accounts, results))
+        for role in ['reader'] * args.readers + ['writer'] * args.writers
+    ]
+    for process in processes:
+        process.start()
+    totals = {'reader': [0, 0], 'writer': [0, 0]}
+    for _ in processes:
+        role, done, errors = results.get()
+        totals[role][0] += done
+        totals[role][1] += errors
+    for process in processes:
+        process.join()
+    label = 'tuned (WAL)' if tuning else 'default'
+    print(f'{label:<12} reads {totals["reader"][0] / args.seconds:>9,.0f}/s  '
+          f'writes {totals["writer"][0] / args.seconds:>8,.0f}/s  '
+          f'locked errors: reads {totals["reader"][1]}, writes {totals["writer"][1]}')
+
+
+def main():
+    args = parse_args()
+    print(f'{args.readers} readers, {args.writers} writers, {args.seconds:.0f}s per run')
+    run(False, args)
+    run(True, args)
+
+
+if __name__ == '__main__':
+    main()
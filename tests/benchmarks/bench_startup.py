@@ -0,0 +1,66 @@
+"""Worker startup time in development and production startup mode
+
+Starts fresh interpreters against an existing, fully migrated SQLite
+database and measures, per process: importing the app package, create_app(),
+and serving the first request (which runs the lazy connectivity check in
+production mode). Reports the median of --runs processes per mode.
+
+Usage:
+    python tests/benchmarks/bench_startup.py [--runs 10] [--path /health]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+CHILD = '''
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+status = flask_app.test_client().get({path!r}).status_code
+served = time.perf_counter()
+print(json.dumps({{'import': imported - started, 'create_app': created - imported,
+                  'first_request': served - created, 'total': served - started, 'status': status}}))
+'''
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10, help='Processes started per mode')
+    parser.add_argument('--path', default='/health', help='First request to serve')
+    return parser.parse_args()
+
+
+def start(mode, database_url, path):
+    env = dict(os.environ, DATABASE_URL=database_url, STARTUP_MODE=mode, PYTHONPATH=ROOT)
+    output = subprocess.run([sys.executable, '-c', CHILD.format(path=path)], env=env, cwd=ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    args = parse_args()
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='revobank-startup-'), 'startup.db')}"
+    start('development', database_url, args.path)  # Creates the schema; also warms the page cache
+
+    print(f'{"mode":<12} {"import":>9} {"create_app":>11} {"first req":>10} {"total":>9}   (median of {args.runs})')
+    for mode in ('development', 'production'):
+        runs = [start(mode, database_url, args.path) for _ in range(args.runs)]
+        if any(run['status'] != 200 for run in runs):
+            sys.exit(f'{mode}: first request failed: {[run["status"] for run in runs]}')
+        median = {key: statistics.median(run[key] for run in runs) * 1000
+                  for key in ('import', 'create_app', 'first_request', 'total')}
+        print(f'{mode:<12} {median["import"]:>7.1f}ms {median["create_app"]:>9.1f}ms '
+              f'{median["first_request"]:>8.1f}ms {median["total"]:>7.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Before/after EXPLAIN benchmark for the transaction history query
+
+Seeds a throwaway SQLite database with a large transaction table, then compares
+three versions of the history query:
+  - sent UNION received, without secondary indexes (the original)
+  - a single OR query on the composite indexes, which still sorts every
+    matching row for each page (USE TEMP B-TREE FOR ORDER BY)
+  - the current query: one branch per account and direction, each read in
+    order off its composite index and cut to the page, combined with UNION ALL
+
+Usage:
+    python tests/benchmarks/bench_transaction_history.py [--rows 1000000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from sqlalchemy import create_engine, or_
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateIndex
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Number of transactions to seed')
+    parser.add_argument('--accounts', type=int, default=20_000, help='Number of accounts to seed')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    return parser.parse_args()
+
+
+def seed(path, metadata, rows, accounts, rng):
+    """Create the schema from the models and bulk-load synthetic rows"""
+    engine = create_engine(f'sqlite:///{path}')
+    metadata.create_all(engine)
+    engine.dispose()
+
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    now = datetime(2026, 1, 1)
+    conn.execute("INSERT INTO role (id, name, permissions) VALUES (1, 'customer', '[]')")
+    conn.executemany(
+        'INSERT INTO user (id, username, password_hash, name, email, role_id) VALUES (?, ?, ?, ?, ?, 1)',
+        ((i, f'user{i}', '-', f'User {i}', f'user{i}@example.com') for i in range(1, accounts // 2 + 1))
+    )
+    conn.executemany(
+        "INSERT INTO account (id, account_number, account_type, balance, currency, status, user_id) "
+        "VALUES (?, ?, 'savings', 1000000.0, 'IDR', 'active', ?)",
+        ((i, f'38{i:014d}', (i - 1) // 2 + 1) for i in range(1, accounts + 1))
+    )
+
+    # Account 1 and 2 belong to user 1 and are hot: ~1% of all traffic
+    def transactions():
+        for i in range(1, rows + 1):
+            hot = rng.random() < 0.01
+            source = rng.choice((1, 2)) if hot and rng.random() < 0.5 else rng.randint(1, accounts)
+            recipient = rng.choice((1, 2)) if hot and source > 2 else rng.randint(1, accounts)
+            timestamp = now - timedelta(seconds=rows - i)
+            status = 'pending_approval' if rng.random() < 0.001 else 'completed'
+            yield (i, 1000.0, 'transfer', timestamp.isoformat(sep=' '), source, recipient,
+                   f'TRX{i:017d}', status)
+
+    conn.executemany(
+        'INSERT INTO "transaction" (id, amount, type, timestamp, account_id, recipient_account_id, '
+        'reference_number, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        transactions()
+    )
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+
+
+def compile_sql(query):
+    statement = getattr(query, 'statement', query)
+    return str(statement.compile(dialect=sqlite.dialect(), compile_kwargs={'literal_binds': True}))
+
+
+def explain_and_time(conn, label, sql, repeat):
+    print(f'\n== {label}')
+    for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}'):
+        print('   ', row[-1])
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(sql).fetchall()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f'    median {timings[len(timings) // 2] * 1000:.2f} ms, best {timings[0] * 1000:.2f} ms')
+
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+
+    from app import create_app, db
+    from app.models.transaction import Transaction
+    from app.services.ownership import history_branch_criteria
+    from app.utils.pagination import ordered_union_statement
+
+    app = create_app('testing')
+    path = os.path.join(tempfile.mkdtemp(prefix='revobank-bench-'), 'history.db')
+    started = time.perf_counter()
+    seed(path, db.metadata, args.rows, args.accounts, rng)
+    print(f'Seeded {args.rows} transactions into {path} in {time.perf_counter() - started:.1f}s')
+
+    account_ids = [1, 2]
+    with app.app_context():
+        # Previous implementation: two filtered queries combined with UNION
+        sent_query = Transaction.query.filter(Transaction.account_id.in_(account_ids))
+        received_query = Transaction.query.filter(Transaction.recipient_account_id.in_(account_ids))
+        union_query = sent_query.union(received_query).order_by(Transaction.timestamp.desc())
+
+        # Single OR query
+        or_query = Transaction.query.filter(or_(
+            Transaction.account_id.in_(account_ids),
+            Transaction.recipient_account_id.in_(account_ids)
+        )).order_by(Transaction.timestamp.desc(), Transaction.id.desc())
+
+        # Current implementation: ordered, limited branches under UNION ALL
+        branches = [Transaction.query.filter(*criteria) for criteria in history_branch_criteria(account_ids)]
+        branched = lambda limit, offset=0, *criteria: ordered_union_statement(
+            [branch.filter(*criteria) for branch in branches], Transaction.timestamp, Transaction.id,
+            limit, offset)
+
+        # Keyset cursor halfway through the history
+        seek = Transaction.timestamp < datetime(2026, 1, 1) - timedelta(seconds=args.rows // 2)
+
+        pending_query = Transaction.query.filter(
+            Transaction.status == Transaction.STATUS_PENDING_APPROVAL
+        ).order_by(Transaction.timestamp.desc())
+
+        cases = [
+            ('history, first page', union_query.limit(20), or_query.limit(20), branched(20)),
+            ('history, deep page', union_query.limit(20).offset(2000),
+             or_query.limit(20).offset(2000), branched(20, 2000)),
+            ('history, deep cursor page', union_query.filter(seek).limit(20),
+             or_query.filter(seek).limit(20), branched(20, 0, seek)),
+            ('pending approvals', pending_query.limit(20), pending_query.limit(20), pending_query.limit(20)),
+        ]
+        index_names = [index.name for index in Transaction.__table__.indexes]
+        index_ddl = [
+            str(CreateIndex(index).compile(dialect=sqlite.dialect()))
+            for index in Transaction.__table__.indexes
+        ]
+
+    conn = sqlite3.connect(path)
+    for name in index_names:
+        conn.execute(f'DROP INDEX IF EXISTS {name}')
+    conn.execute('ANALYZE')
+    print('\n### BEFORE: UNION query, no secondary indexes')
+    for label, before, _, _ in cases:
+        explain_and_time(conn, label, compile_sql(before), args.repeat)
+
+    for ddl in index_ddl:
+        conn.execute(ddl)
+    conn.execute('ANALYZE')
+    print('\n### OR query, composite indexes')
+    for label, _, or_case, _ in cases:
+        explain_and_time(conn, label, compile_sql(or_case), args.repeat)
+    print('\n### AFTER: per-branch ordered UNION ALL, composite indexes')
+    for label, _, _, after in cases:
+        explain_and_time(conn, label, compile_sql(after), args.repeat)
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
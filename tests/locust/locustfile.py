@@ -1,132 +1,265 @@
-from locust import HttpUser, task, between
-import json
+"""Load profile for the RevoBank API with SLO thresholds
+
+Simulated users log in as pre-seeded users instead of registering, so a run
+measures the steady state rather than password hashing and empty accounts.
+Prepare a database and its user pool first:
+
+    flask seed --users 10000 --transactions 1000000 --admins 5 \\
+        --skip-password-hashing --user-pool tests/locust/users.csv
+    RATELIMIT_ENABLED=False gunicorn run:app
+
+then run headless with the defaults in locust.conf:
+
+    locust -f tests/locust/locustfile.py --config tests/locust/locust.conf --host http://localhost:8000
+
+Scenarios (weights are relative user counts):
+    RetailBrowsingUser  customers reading accounts, profile and history
+    HotMerchantUser     customers paying the hot merchants, some above the
+                        approval threshold
+    PayrollBurstUser    merchants paying salaries with batch transfers
+    AdminApprovalUser   admins working through the approval queue
+
+When the run ends, the overall failure ratio and the p95 of every request
+name are checked against --slo-error-rate and --slo-p95-ms (with per-request
+overrides in SLO_P95_MS); a breach makes locust exit with status 1.
+"""
+import csv
+import itertools
 import random
+import time
+import uuid
+from locust import HttpUser, between, events, task
+from locust.exception import StopUser
+from locust.runners import WorkerRunner
+
+# Transfers above HIGH_VALUE_THRESHOLD wait for an admin
+HIGH_VALUE_AMOUNT = 60_000_000
+
+# Access tokens expire after 15 minutes; log in again a little earlier
+TOKEN_LIFETIME = 14 * 60
+
+# p95 targets in ms for request names slower than the default by design
+SLO_P95_MS = {
+    'POST /users/login': 1000,  # Password hashing
+    'POST /transactions/batch': 1500,  # Up to 50 transfers each
+}
+
+_pools = {}
+
+
+@events.init_command_line_parser.add_listener
+def _add_arguments(parser):
+    parser.add_argument('--user-pool', default='tests/locust/users.csv',
+                        help='CSV written by `flask seed --user-pool`')
+    parser.add_argument('--password', default='password123', help='Password of the seeded users')
+    parser.add_argument('--slo-p95-ms', type=float, default=500,
+                        help='Default p95 latency target per request name')
+    parser.add_argument('--slo-error-rate', type=float, default=0.01,
+                        help='Maximum share of failed requests')
+
+
+@events.init.add_listener
+def _load_user_pool(environment, **kwargs):
+    """Split the seeded users by role and hand them out round robin"""
+    if environment.parsed_options is None:
+        return
+    by_role = {}
+    with open(environment.parsed_options.user_pool, newline='') as f:
+        for row in csv.DictReader(f):
+            by_role.setdefault(row['role'], []).append(row)
+    for role, users in by_role.items():
+        random.Random(0).shuffle(users)
+        _pools[role] = itertools.cycle(users)
+    # The first merchants receive most of the customer payments
+    merchants = by_role.get('merchant', [])
+    _pools['merchant_accounts'] = [int(m['account_id']) for m in merchants]
+    _pools['customer_accounts'] = [int(c['account_id']) for c in by_role.get('customer', [])]
+
+
+@events.quitting.add_listener
+def _check_slos(environment, **kwargs):
+    if isinstance(environment.runner, WorkerRunner):
+        return  # The master sees the aggregated stats
+    options = environment.parsed_options
+    stats = environment.stats
+    breaches = []
+    if stats.total.num_requests and stats.total.fail_ratio > options.slo_error_rate:
+        breaches.append(f'error rate {stats.total.fail_ratio:.2%} > {options.slo_error_rate:.2%}')
+    for entry in stats.entries.values():
+        if not entry.num_requests:
+            continue
+        name = f'{entry.method} {entry.name}'
+        target = SLO_P95_MS.get(name, options.slo_p95_ms)
+        p95 = entry.get_response_time_percentile(0.95)
+        if p95 > target:
+            breaches.append(f'{name} p95 {p95:.0f} ms > {target:.0f} ms')
+    if breaches:
+        for breach in breaches:
+            print(f'SLO breach: {breach}')
+        environment.process_exit_code = 1
+    else:
+        print('All SLOs met')
+
+
+class SeededUser(HttpUser):
+    """Logs in as the next pre-seeded user of `role`"""
+
+    abstract = True
+    role = 'customer'
+
+    def on_start(self):
+        if self.role not in _pools:
+            # e.g. seeded without --admins
+            raise StopUser()
+        seeded = next(_pools[self.role])
+        self.username = seeded['username']
+        self.account_id = int(seeded['account_id']) if seeded['account_id'] else None
+        self.login()
+
+    def login(self):
+        self.headers, self.logged_in_at = {}, time.monotonic()
+        with self.client.post('/users/login', catch_response=True, json={
+            'username': self.username,
+            'password': self.environment.parsed_options.password
+        }) as response:
+            if response.status_code != 200:
+                response.failure(f'Login as {self.username} failed with {response.status_code}')
+                return
+            self.headers = {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+    def auth(self, **extra):
+        """Request headers, logging in again before the access token expires"""
+        if time.monotonic() - self.logged_in_at > TOKEN_LIFETIME:
+            self.login()
+        return dict(self.headers, **extra)
 
-class BankAPIUser(HttpUser):
-    # Wait between 1 to 5 seconds between tasks
+    def idempotency_key(self):
+        return {'Idempotency-Key': uuid.uuid4().hex}
+
+
+class RetailBrowsingUser(SeededUser):
+    """A customer checking balances and scrolling through their history"""
+
+    weight = 10
     wait_time = between(1, 5)
-    
+
     def on_start(self):
-        """Setup before tests - register and login a user"""
-        # Initialize headers
-        self.headers = None
-        self.token = None
-        self.account_id = None
-        
-        # Register a new user with random username
-        self.username = f"testuser_{random.randint(1000, 9999)}"
-        self.password = "Test123!"
-        self.email = f"{self.username}@example.com"
-        
-        # Register user
-        response = self.client.post(
-            "/users",
-            json={
-                "username": self.username,
-                "password": self.password,
-                "name": "Test User",
-                "email": self.email
-            }
-        )
-        
-        # Login to get tokens
-        if response.status_code in [201, 400]:  # 400 means user might already exist
-            response = self.client.post("/users/login", json={
-                "username": self.username,
-                "password": self.password
-            })
-            if response.status_code == 200:
-                data = json.loads(response.text)
-                self.access_token = data["access_token"]
-                self.refresh_token = data["refresh_token"]
-                self.headers = {"Authorization": f"Bearer {self.access_token}"}
-                self.refresh_headers = {"Authorization": f"Bearer {self.refresh_token}"}
-                
-                # Create account after successful login
-                response = self.client.post(
-                    "/accounts",
-                    json={
-                        "account_type": "savings",
-                        "initial_deposit": 1000000
-                    },
-                    headers=self.headers
-                )
-                if response.status_code == 201:
-                    data = json.loads(response.text)
-                    self.account_id = data.get('id')
-    
-    @task(3)
-    def get_profile(self):
-        """Get user profile - weight: 3"""
-        if self.headers:
-            self.client.get("/users/me", headers=self.headers)
-    
+        super().on_start()
+        self.etags = {}
+        self.transaction_ids = []
+
+    def conditional_get(self, path, name):
+        """GET honouring the ETag of the previous response, as a browser cache would"""
+        headers = self.auth()
+        if path in self.etags:
+            headers['If-None-Match'] = self.etags[path]
+        response = self.client.get(path, name=name, headers=headers)
+        if response.status_code == 200 and 'ETag' in response.headers:
+            self.etags[path] = response.headers['ETag']
+        return response
+
+    @task(4)
+    def accounts(self):
+        self.conditional_get('/accounts', '/accounts')
+
     @task(2)
-    def update_profile(self):
-        """Update user profile - weight: 2"""
-        if self.headers:
-            user_id = random.randint(1000, 9999)
-            self.client.put("/users/me", 
-                headers=self.headers,
-                json={
-                    "name": f"Updated User {user_id}",
-                    "email": f"updated{user_id}@example.com"
-                }
-            )
-    
+    def profile(self):
+        self.conditional_get('/users/me', '/users/me')
+
+    @task(4)
+    def history(self):
+        """Open the history and scroll a few pages with the cursor"""
+        cursor = ''
+        for _ in range(random.randint(1, 4)):
+            response = self.client.get('/transactions/', name='/transactions/?cursor', headers=self.auth(),
+                                       params={'cursor': cursor, 'limit': 20})
+            if response.status_code != 200:
+                return
+            body = response.json()
+            self.transaction_ids = [t['id'] for t in body['transactions']] or self.transaction_ids
+            cursor = body['pagination']['next_cursor']
+            if cursor is None:
+                return
+
     @task(2)
-    def get_balance(self):
-        """Check account balance - weight: 2"""
-        if self.headers and self.account_id:
-            # Get account details
-            response = self.client.get(f"/accounts/{self.account_id}", headers=self.headers)
-            if response.status_code == 200:
-                # Get transactions
-                self.client.get(f"/accounts/{self.account_id}/transactions", headers=self.headers)
-    
-    @task(1)
-    def make_transfer(self):
-        """Make a transfer - weight: 1"""
-        if self.headers and self.account_id:
-            # Create a recipient account if needed
-            response = self.client.post(
-                "/accounts",
-                json={
-                    "account_type": "savings",
-                    "initial_deposit": 1000000
-                },
-                headers=self.headers
-            )
-            if response.status_code == 201:
-                recipient_data = json.loads(response.text)
-                recipient_account = recipient_data['account']['id']
-                amount = random.randint(10000, 50000)
-                
-                # Make transfer
-                transfer_response = self.client.post(
-                    "/transactions", 
-                    json={
-                        "from_account_id": self.account_id,
-                        "to_account_id": recipient_account,
-                        "amount": amount,
-                        "transaction_type": "transfer",
-                        "description": "Load test transfer"
-                    }, 
-                    headers=self.headers
-                )
-                
-                if transfer_response.status_code == 201:
-                    # Get transaction details
-                    transaction_data = json.loads(transfer_response.text)
-                    transaction_id = transaction_data['transaction']['id']
-                    self.client.get(f"/transactions/{transaction_id}", headers=self.headers)
-    
-    @task(1)
-    def refresh_token(self):
-        """Refresh access token - weight: 1"""
-        if self.refresh_headers:
-            response = self.client.post("/users/refresh", headers=self.refresh_headers)
-            if response.status_code == 200:
-                data = json.loads(response.text)
-                self.access_token = data["access_token"]
-                self.headers = {"Authorization": f"Bearer {self.access_token}"}
+    def transaction_detail(self):
+        if self.transaction_ids:
+            self.client.get(f'/transactions/{random.choice(self.transaction_ids)}',
+                            name='/transactions/[id]', headers=self.auth())
+
+
+class HotMerchantUser(SeededUser):
+    """A customer paying one of the popular merchants
+
+    Recipients are drawn with a strong skew towards the first merchants, so
+    their balance rows are contended the way a busy shop's would be. One
+    payment in fifty is above the approval threshold and joins the queue the
+    AdminApprovalUsers work through.
+    """
+
+    weight = 6
+    wait_time = between(1, 3)
+
+    @task
+    def pay_merchant(self):
+        merchants = _pools['merchant_accounts']
+        if not merchants or not self.account_id:
+            return
+        recipient = merchants[int(len(merchants) * random.random() ** 3)]
+        if random.random() < 0.02:
+            amount, name = HIGH_VALUE_AMOUNT, '/transactions/transfer (approval)'
+        else:
+            amount, name = round(random.lognormvariate(11, 1), 2), '/transactions/transfer'
+        with self.client.post('/transactions/transfer', name=name, catch_response=True,
+                              headers=self.auth(**self.idempotency_key()), json={
+            'from_account_id': self.account_id,
+            'to_account_id': recipient,
+            'amount': amount,
+            'description': 'Load test payment'
+        }) as response:
+            # Running out of money is a business outcome, not an error
+            if response.status_code == 400 and 'Insufficient' in response.text:
+                response.success()
+
+
+class PayrollBurstUser(SeededUser):
+    """A merchant paying salaries in one batch transfer"""
+
+    role = 'merchant'
+    weight = 1
+    wait_time = between(10, 30)
+
+    @task
+    def payroll(self):
+        employees = random.sample(_pools['customer_accounts'], min(50, len(_pools['customer_accounts'])))
+        self.client.post('/transactions/batch', headers=self.auth(**self.idempotency_key()), json={
+            'transfers': [{
+                'from_account_id': self.account_id,
+                'to_account_id': employee,
+                'amount': 25_000,
+                'description': 'Payroll'
+            } for employee in employees if employee != self.account_id]
+        })
+
+
+class AdminApprovalUser(SeededUser):
+    """An admin reviewing the approval queue and approving transfers"""
+
+    role = 'admin'
+    weight = 1
+    wait_time = between(2, 6)
+
+    @task
+    def review_queue(self):
+        response = self.client.get('/transactions/admin/all', name='/transactions/admin/all?status',
+                                   headers=self.auth(),
+                                   params={'status': 'pending_approval', 'cursor': '', 'limit': 20})
+        if response.status_code != 200:
+            return
+        for transaction in response.json()['transactions'][:5]:
+            with self.client.post(f"/transactions/admin/approve/{transaction['id']}",
+                                  name='/transactions/admin/approve/[id]',
+                                  headers=self.auth(), catch_response=True) as approval:
+                # Another admin got there first
+                if approval.status_code == 400 and 'not pending' in approval.text:
+                    approval.success()
@@ -0,0 +1,94 @@
+import multiprocessing
+from flask import Flask
+from sqlalchemy import inspect
+from app import create_app, db
+from app.utils.database import configure_engine
+from config import Config
+
+def test_sqlite_tuning(monkeypatch, tmp_path):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path}/revobank.db')
+    app = create_app()
+
+    with app.app_context():
+        with db.engine.connect() as conn:
+            pragma = lambda name: conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+            assert pragma('journal_mode') == 'wal'
+            assert pragma('synchronous') == 1  # NORMAL
+            assert pragma('busy_timeout') == Config.SQLITE_BUSY_TIMEOUT
+            assert pragma('cache_size') == Config.SQLITE_CACHE_SIZE
+            assert conn.connection.dbapi_connection.isolation_level == 'IMMEDIATE'
+        db.engine.dispose()
+
+def test_server_pool_options():
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'postgresql://bank@db/revobank'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_size': 20}
+    configure_engine(app)
+
+    options = app.config['SQLALCHEMY_ENGINE_OPTIONS']
+    assert options['pool_size'] == 20  # Explicit engine options win
+    assert options['max_overflow'] == Config.DB_MAX_OVERFLOW
+    assert options['pool_pre_ping'] is True
+    assert options['pool_recycle'] == Config.DB_POOL_RECYCLE
+    assert 'connect_args' not in options
+
+def test_production_startup(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, 'STARTUP_MODE', 'production')
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path}/revobank.db')
+    app = create_app()
+
+    # No tables are created and no connection is opened while booting
+    with app.app_context():
+        assert db.engine.pool.checkedin() == 0
+        assert inspect(db.engine).get_table_names() == []
+        db.engine.dispose()
+
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path}/missing/revobank.db')
+    response = create_app().test_client().get('/health')
+    assert response.status_code == 503
+    assert response.json == {'error': 'Database unavailable'}
+
+def _next_sequence_value(app, results):
+    with app.app_context():
+        results.put(app.extensions['sequences'].next_value('test'))
+
+def test_sequences_reset_after_fork(monkeypatch, tmp_path):
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path}/revobank.db')
+    app = create_app()
+    with app.app_context():
+        assert app.extensions['sequences'].next_value('test') == 1
+
+    # A forked worker reserves its own block instead of reusing the parent's
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    child = context.Process(target=_next_sequence_value, args=(app, results))
+    child.start()
+    child.join()
+    assert results.get(timeout=5) == app.config['SEQUENCE_BLOCK_SIZE'] + 1
+    with app.app_context():
+        assert app.extensions['sequences'].next_value('test') == 2
+        db.engine.dispose()
+
+def _post_logins(app, count, results):
+    client = app.test_client()
+    results.put([client.post('/users/login', json={}).status_code for _ in range(count)])
+
+def test_shared_rate_limit_storage(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, 'RATELIMIT_STORAGE_URI', f'sqlite:///{tmp_path}/ratelimit.db')
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path}/revobank.db')
+    app = create_app()
+    client = app.test_client()
+    assert client.post('/users/login', json={}).status_code == 400
+
+    # Login allows 30 per minute from an address, counted across processes
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    child = context.Process(target=_post_logins, args=(app, 20, results))
+    child.start()
+    child.join()
+    assert results.get(timeout=5) == [400] * 20
+    statuses = [client.post('/users/login', json={}).status_code for _ in range(10)]
+    assert statuses == [400] * 9 + [429]
+    with app.app_context():
+        db.engine.dispose()
@@ -0,0 +1,56 @@
+import csv
+from app import db
+from app.models.account import Account
+from app.models.transaction import Transaction
+from app.models.user import User
+
+def test_seed_command(app, client, runner, init_database):
+    with app.app_context():
+        users_before = User.query.count()
+
+    result = runner.invoke(args=[
+        'seed', '--users', '10', '--transactions', '250', '--hot-merchants', '2',
+        '--chunk-size', '40', '--skip-password-hashing'
+    ])
+    assert result.exit_code == 0, result.output
+    assert 'transactions' in result.output
+
+    with app.app_context():
+        assert User.query.count() == users_before + 12
+        assert Transaction.query.count() == 250 + 2  # plus the two fixture transactions
+        merchant_accounts = Account.query.join(User).filter(User.username.like('merchant%')).all()
+        assert len(merchant_accounts) == 2
+        assert all(account.account_type == 'business' for account in merchant_accounts)
+        seeded_accounts = Account.query.join(User).filter(
+            User.username.like('seed_user%') | User.username.like('merchant%')).all()
+        assert all(Account.is_valid_account_number(a.account_number) for a in seeded_accounts)
+
+        # Reference numbers follow the usual format and stay unique afterwards
+        references = [t.reference_number for t in Transaction.query.all()]
+        assert len(set(references)) == len(references)
+        assert Transaction.generate_reference_number() not in references
+
+        username = User.query.filter(User.username.like('seed_user%')).first().username
+
+    # Seeded users can log in with the shared password
+    response = client.post('/users/login', json={'username': username, 'password': 'password123'})
+    assert response.status_code == 200
+
+def test_seed_user_pool(app, runner, init_database, tmp_path):
+    pool = tmp_path / 'users.csv'
+    result = runner.invoke(args=[
+        'seed', '--users', '3', '--transactions', '10', '--hot-merchants', '1', '--admins', '1',
+        '--skip-password-hashing', '--user-pool', str(pool)
+    ])
+    assert result.exit_code == 0, result.output
+
+    with open(pool, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['role'] for row in rows] == ['customer'] * 3 + ['merchant', 'admin']
+    assert rows[-1]['account_id'] == ''
+    with app.app_context():
+        for row in rows[:-1]:
+            account = db.session.get(Account, int(row['account_id']))
+            assert account.owner.username == row['username']
+        admin = User.query.filter_by(username=rows[-1]['username']).one()
+        assert admin.role.name == 'admin'
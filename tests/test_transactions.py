@@ -1,4 +1,6 @@
 import pytest
+from datetime import timedelta
+from werkzeug.http import http_date, parse_date
 from app.models.account import Account
 from app.models.transaction import Transaction
 
@@ -90,7 +92,11 @@ def test_transfer(client, init_database):
     assert response.json['transaction']['type'] == 'transfer'
     assert response.json['transaction']['status'] == Transaction.STATUS_COMPLETED  # Small amount, no approval needed
 
-    # Test high-value transfer that needs approval
+    # Test high-value transfer that needs approval; approval checks the
+    # minimum balance, so fund the source account first
+    from app import db
+    db.session.get(Account, savings_account['id']).balance = 100000000.0
+    db.session.commit()
     response = client.post('/transactions/transfer',
         json={
             'from_account_id': savings_account['id'],
@@ -117,3 +123,712 @@ def test_transfer(client, init_database):
     )
     assert approval_response.status_code == 200
     assert approval_response.json['transaction']['status'] == Transaction.STATUS_COMPLETED
+
+def test_approve_rechecks_minimum_balance(client, init_database):
+    """A source account drained after the request leaves the transfer pending"""
+    from app import db
+
+    login = lambda username, password: client.post('/users/login', json={
+        'username': username, 'password': password
+    }).json['access_token']
+    headers = {'Authorization': f"Bearer {login('testuser', 'password123')}"}
+    admin_headers = {'Authorization': f"Bearer {login('admin', 'admin123')}"}
+
+    accounts = client.get('/accounts', headers=headers).json['accounts']
+    savings = next(acc for acc in accounts if acc['account_number'].startswith('38'))
+    checking = next(acc for acc in accounts if acc['account_number'].startswith('39'))
+
+    response = client.post('/transactions/transfer', json={
+        'from_account_id': savings['id'],
+        'to_account_id': checking['id'],
+        'amount': 60000000.0
+    }, headers=headers)
+    assert response.status_code == 202
+    transaction_id = response.json['transaction']['id']
+
+    # Drain the source account while the transfer waits for approval
+    account = db.session.get(Account, savings['id'])
+    drained = account.balance = account.minimum_balance + 1000
+    db.session.commit()
+
+    response = client.post(f'/transactions/admin/approve/{transaction_id}', headers=admin_headers)
+    assert response.status_code == 400
+    assert response.json['error'] == 'Insufficient funds'
+
+    db.session.expire_all()
+    assert db.session.get(Transaction, transaction_id).status == Transaction.STATUS_PENDING_APPROVAL
+    assert db.session.get(Account, savings['id']).balance == drained
+    assert db.session.get(Account, checking['id']).balance == checking['balance']
+
+def test_get_transactions_cursor_pagination(client, init_database):
+    # Login as customer
+    login_response = client.post('/users/login', json={
+        'username': 'testuser',
+        'password': 'password123'
+    })
+    token = login_response.json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    # First page in cursor mode
+    response = client.get('/transactions/?cursor=&limit=1', headers=headers)
+    assert response.status_code == 200
+    first_page = response.json
+    assert len(first_page['transactions']) == 1
+    assert first_page['pagination']['has_next'] is True
+    assert 'total_items' not in first_page['pagination']
+
+    # Follow the cursor to the second (last) page
+    response = client.get(
+        f"/transactions/?limit=1&include_total=true&cursor={first_page['pagination']['next_cursor']}",
+        headers=headers
+    )
+    assert response.status_code == 200
+    second_page = response.json
+    assert len(second_page['transactions']) == 1
+    assert second_page['pagination']['has_next'] is False
+    assert second_page['pagination']['next_cursor'] is None
+    assert second_page['pagination']['total_items'] == 2
+    assert second_page['transactions'][0]['id'] != first_page['transactions'][0]['id']
+
+    # Malformed cursor
+    response = client.get('/transactions/?cursor=not-a-cursor', headers=headers)
+    assert response.status_code == 400
+
+    # Well-formed cursors whose id is not a 64-bit integer
+    import base64
+    for item_id in ('1e400', '1.5', 'true', str(2 ** 63), '"7"'):
+        payload = f'["2026-01-01T00:00:00",{item_id}]'.encode()
+        cursor = base64.urlsafe_b64encode(payload).decode().rstrip('=')
+        response = client.get(f'/transactions/?cursor={cursor}', headers=headers)
+        assert response.status_code == 400, item_id
+
+def test_history_pages_read_in_index_order(app, init_database):
+    """History pages are merged from per-account branches that need no sort"""
+    from app.models.user import User
+    from app.services import ownership
+    from app.utils.pagination import ordered_union, ordered_union_statement
+    from app.utils.serialization import TRANSACTION_COLUMNS
+
+    db = init_database
+    user_id = User.query.filter_by(username='testuser').one().id
+    base = db.session.query(*TRANSACTION_COLUMNS)
+    branches = [base.filter(*branch) for branch in ownership.history_branches(user_id)]
+    assert len(branches) == 4  # two accounts, both directions
+
+    statement = ordered_union_statement(branches, Transaction.timestamp, Transaction.id, 21)
+    sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    plan = [row[-1] for row in db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+    assert not any('TEMP B-TREE' in step for step in plan)
+    assert any('ix_transaction_account_id_timestamp' in step for step in plan)
+    assert any('ix_transaction_recipient_account_id_timestamp' in step for step in plan)
+
+    # The transfer between the user's own accounts is listed once
+    rows = ordered_union(branches, Transaction.timestamp, Transaction.id, 21)
+    expected = base.filter(ownership.history_criterion(user_id)).order_by(
+        Transaction.timestamp.desc(), Transaction.id.desc()).all()
+    assert [row.id for row in rows] == [row.id for row in expected]
+    assert [row.id for row in ordered_union(branches, Transaction.timestamp, Transaction.id, 1, offset=1)] \
+        == [expected[1].id]
+
+def test_withdraw_insufficient_funds(client, init_database):
+    # Login as customer
+    login_response = client.post('/users/login', json={
+        'username': 'testuser',
+        'password': 'password123'
+    })
+    token = login_response.json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    accounts_response = client.get('/accounts', headers=headers)
+    savings_account = next(acc for acc in accounts_response.json['accounts']
+                         if acc['account_number'].startswith('38'))
+
+    # Savings has 1M and a 100k minimum, so 950k must be rejected
+    response = client.post('/transactions/withdraw',
+        json={'account_id': savings_account['id'], 'amount': 950000.0},
+        headers=headers
+    )
+    assert response.status_code == 400
+    assert response.json['error'] == 'Insufficient funds'
+    assert response.json['current_balance'] == 1000000.0
+    assert response.json['minimum_balance'] == 100000.0
+
+    # Exactly down to the minimum is allowed
+    response = client.post('/transactions/withdraw',
+        json={'account_id': savings_account['id'], 'amount': 900000.0},
+        headers=headers
+    )
+    assert response.status_code == 201
+    account = init_database.session.get(Account, savings_account['id'])
+    assert account.balance == 100000.0
+
+def test_batch_transfer(client, init_database):
+    # Login as customer
+    login_response = client.post('/users/login', json={
+        'username': 'testuser',
+        'password': 'password123'
+    })
+    token = login_response.json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    accounts_response = client.get('/accounts', headers=headers)
+    savings_account = next(acc for acc in accounts_response.json['accounts']
+                         if acc['account_number'].startswith('38'))
+    checking_account = next(acc for acc in accounts_response.json['accounts']
+                          if acc['account_number'].startswith('39'))
+
+    response = client.post('/transactions/batch',
+        json={'transfers': [
+            {'from_account_id': savings_account['id'], 'to_account_id': checking_account['id'], 'amount': 300000.0},
+            # Savings is now at 700k; this would leave it below the 100k minimum
+            {'from_account_id': savings_account['id'], 'to_account_id': checking_account['id'], 'amount': 650000.0},
+            {'from_account_id': checking_account['id'], 'to_account_id': savings_account['id'], 'amount': -1},
+            {'from_account_id': checking_account['id'], 'to_account_id': savings_account['id'], 'amount': 100000.0},
+        ]},
+        headers=headers
+    )
+    assert response.status_code == 200
+    results = response.json['results']
+    assert [result['status'] for result in results] == [
+        Transaction.STATUS_COMPLETED, 'failed', 'failed', Transaction.STATUS_COMPLETED
+    ]
+    assert results[1]['error'] == 'Insufficient funds'
+    assert response.json['summary'] == {'total': 4, 'succeeded': 2, 'failed': 2}
+
+    savings = init_database.session.get(Account, savings_account['id'])
+    checking = init_database.session.get(Account, checking_account['id'])
+    assert savings.balance == 800000.0
+    assert checking.balance == 2200000.0
+    assert Transaction.query.filter_by(id=results[0]['transaction']['id']).count() == 1
+
+def test_batch_transfer_rejects_bad_input_and_races(client, init_database, monkeypatch):
+    from sqlalchemy import update
+    from app.services import balance
+
+    login_response = client.post('/users/login', json={'username': 'testuser', 'password': 'password123'})
+    headers = {'Authorization': f"Bearer {login_response.json['access_token']}"}
+    savings = Account.query.filter(Account.account_number.startswith('38')).first()
+    checking = Account.query.filter(Account.account_number.startswith('39')).first()
+
+    response = client.post('/transactions/batch', json=[{'transfers': []}], headers=headers)
+    assert response.status_code == 400
+
+    # float() turns these strings into NaN and inf
+    response = client.post('/transactions/batch', json={'transfers': [
+        {'from_account_id': savings.id, 'to_account_id': checking.id, 'amount': 'nan'},
+        {'from_account_id': savings.id, 'to_account_id': checking.id, 'amount': 'inf'}
+    ]}, headers=headers)
+    assert response.status_code == 200
+    assert [result['error'] for result in response.json['results']] == ['Amount must be positive'] * 2
+
+    # The savings account is drained after the batch read its balance: the
+    # guarded debit refuses, and nothing from the batch is kept
+    debit = balance.debit
+    def drain_then_debit(account_id, amount, **kwargs):
+        init_database.session.execute(update(Account).where(Account.id == savings.id).values(balance=0))
+        return debit(account_id, amount, **kwargs)
+    monkeypatch.setattr(balance, 'debit', drain_then_debit)
+    response = client.post('/transactions/batch', json={'transfers': [
+        {'from_account_id': savings.id, 'to_account_id': checking.id, 'amount': 1000.0}
+    ]}, headers=headers)
+    assert response.status_code == 503
+    init_database.session.expire_all()
+    assert init_database.session.get(Account, savings.id).balance == 1000000.0
+    assert init_database.session.get(Account, checking.id).balance == 2000000.0
+    assert Transaction.query.filter_by(amount=1000.0).count() == 0
+
+def test_deposit_idempotency_key(client, init_database):
+    # Login as customer
+    login_response = client.post('/users/login', json={
+        'username': 'testuser',
+        'password': 'password123'
+    })
+    token = login_response.json['access_token']
+    headers = {'Authorization': f'Bearer {token}', 'Idempotency-Key': 'deposit-0001'}
+
+    accounts_response = client.get('/accounts', headers=headers)
+    savings_account = next(acc for acc in accounts_response.json['accounts']
+                         if acc['account_number'].startswith('38'))
+    payload = {'account_id': savings_account['id'], 'amount': 50000.0}
+
+    first = client.post('/transactions/deposit', json=payload, headers=headers)
+    assert first.status_code == 201
+
+    # A retry replays the stored response without posting again
+    retry = client.post('/transactions/deposit', json=payload, headers=headers)
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.json['transaction']['id'] == first.json['transaction']['id']
+    account = init_database.session.get(Account, savings_account['id'])
+    assert account.balance == 1050000.0
+
+    # The persisted record answers even when the in-process cache is cold
+    client.application.extensions['idempotency'].cache.clear()
+    retry = client.post('/transactions/deposit', json=payload, headers=headers)
+    assert retry.json['transaction']['id'] == first.json['transaction']['id']
+
+    # Reusing the key for a different request is rejected
+    response = client.post('/transactions/deposit',
+        json={'account_id': savings_account['id'], 'amount': 1.0},
+        headers=headers
+    )
+    assert response.status_code == 422
+
+def test_idempotency_lease_after_worker_death(client, init_database):
+    """A reservation left behind by a dead worker lapses after the lease"""
+    from datetime import datetime, timedelta, UTC
+    from app.models.idempotency_key import IdempotencyKey
+
+    now = lambda: datetime.now(UTC).replace(tzinfo=None)
+
+    login_response = client.post('/users/login', json={
+        'username': 'testuser',
+        'password': 'password123'
+    })
+    token = login_response.json['access_token']
+    headers = {'Authorization': f'Bearer {token}', 'Idempotency-Key': 'deposit-lease'}
+    accounts_response = client.get('/accounts', headers={'Authorization': f'Bearer {token}'})
+    savings_account = next(acc for acc in accounts_response.json['accounts']
+                         if acc['account_number'].startswith('38'))
+    payload = {'account_id': savings_account['id'], 'amount': 50000.0}
+
+    # A worker reserved the key and died before storing a response
+    store = client.application.extensions['idempotency']
+    user_id = int(login_response.json['user']['id'])
+    store.reserve(user_id, 'deposit-lease', 'transaction.deposit', 'lost')
+    record = IdempotencyKey.query.filter_by(user_id=user_id, key='deposit-lease').one()
+    assert record.expires_at <= now() + timedelta(seconds=store.lease)
+
+    response = client.post('/transactions/deposit', json=payload, headers=headers)
+    assert response.status_code == 409
+
+    # Once the lease has run out the retry runs the request
+    record.expires_at = now() - timedelta(seconds=1)
+    init_database.session.commit()
+    response = client.post('/transactions/deposit', json=payload, headers=headers)
+    assert response.status_code == 201
+    assert init_database.session.get(Account, savings_account['id']).balance == 1050000.0
+
+    # The stored response is kept for the full TTL, not the lease
+    init_database.session.expire_all()
+    record = IdempotencyKey.query.filter_by(user_id=user_id, key='deposit-lease').one()
+    assert record.expires_at > now() + timedelta(seconds=store.ttl - 60)
+
+def test_reference_numbers_from_disjoint_blocks(app, init_database):
+    from app.services.sequences import SequenceAllocator
+
+    with app.app_context():
+        # Two allocators stand in for two gunicorn workers sharing the database
+        worker_a = SequenceAllocator(block_size=3)
+        worker_b = SequenceAllocator(block_size=3)
+        values = [worker.next_value('test') for worker in (worker_a, worker_b) * 4]
+        assert len(set(values)) == len(values)
+        assert sorted(values)[:3] == [1, 2, 3]
+
+        reference = Transaction.generate_reference_number()
+        assert len(reference) == 20
+        assert reference.startswith('TRX')
+        assert reference != Transaction.generate_reference_number()
+
+def test_transfer_by_account_number(client, init_database):
+    # Login as customer
+    login_response = client.post('/users/login', json={
+        'username': 'testuser',
+        'password': 'password123'
+    })
+    token = login_response.json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    # Newly allocated account numbers carry a type prefix and a Luhn check digit
+    response = client.post('/accounts',
+        json={'account_type': 'student', 'initial_deposit': 50000},
+        headers=headers
+    )
+    assert response.status_code == 201
+    new_account = response.json['account']
+    assert new_account['account_number'].startswith('36')
+    assert Account.is_valid_account_number(new_account['account_number'])
+
+    accounts_response = client.get('/accounts', headers=headers)
+    savings_account = next(acc for acc in accounts_response.json['accounts']
+                         if acc['account_number'].startswith('38'))
+
+    response = client.post('/transactions/transfer',
+        json={
+            'from_account_id': savings_account['id'],
+            'to_account_number': new_account['account_number'],
+            'amount': 10000.0
+        },
+        headers=headers
+    )
+    assert response.status_code == 201
+    assert response.json['transaction']['recipient_account_id'] == new_account['id']
+
+    # A mistyped number that matches no account fails the check digit
+    mistyped = new_account['account_number'][:-1] + str((int(new_account['account_number'][-1]) + 1) % 10)
+    response = client.post('/transactions/transfer',
+        json={
+            'from_account_id': savings_account['id'],
+            'to_account_number': mistyped,
+            'amount': 10000.0
+        },
+        headers=headers
+    )
+    assert response.status_code == 400
+    assert response.json['error'] == 'Invalid account number'
+
+    # Numbers issued before sequence allocation have no check digit and still work
+    legacy_number = '3812345678901234'
+    assert not Account.is_valid_account_number(legacy_number)
+    legacy_account = init_database.session.get(Account, new_account['id'])
+    legacy_account.account_number = legacy_number
+    init_database.session.commit()
+    response = client.post('/transactions/transfer',
+        json={
+            'from_account_id': savings_account['id'],
+            'to_account_number': legacy_number,
+            'amount': 10000.0
+        },
+        headers=headers
+    )
+    assert response.status_code == 201
+    assert response.json['transaction']['recipient_account_id'] == new_account['id']
+
+def test_role_edit_invalidates_permission_cache(client, init_database):
+    from app.models.role import Role
+
+    # Login as customer
+    login_response = client.post('/users/login', json={
+        'username': 'testuser',
+        'password': 'password123'
+    })
+    token = login_response.json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.get('/transactions/', headers=headers)
+    assert response.status_code == 200
+
+    # Revoke the permission; the cached grant must not outlive the edit
+    customer_role = Role.query.filter_by(name=Role.CUSTOMER).first()
+    customer_role.permissions = [
+        perm for perm in customer_role.permissions
+        if perm != Role.PERMISSIONS['transaction']['view_own']
+    ]
+    init_database.session.commit()
+    assert customer_role.version == 2
+
+    response = client.get('/transactions/', headers=headers)
+    assert response.status_code == 403
+    assert response.json['missing_permissions'] == [Role.PERMISSIONS['transaction']['view_own']]
+
+def test_refresh_reads_current_role(client, init_database):
+    from app.models.role import Role
+    from app.models.user import User
+
+    tokens = client.post('/users/login', json={'username': 'admin', 'password': 'admin123'}).json
+    refresh = {'Authorization': f"Bearer {tokens['refresh_token']}"}
+    refreshed = client.post('/users/refresh', headers=refresh)
+    assert client.get('/transactions/admin/all', headers={
+        'Authorization': f"Bearer {refreshed.json['access_token']}"}).status_code == 200
+
+    # Demoted: the refreshed token carries the customer role
+    admin = User.query.filter_by(username='admin').first()
+    admin.role_id = Role.query.filter_by(name=Role.CUSTOMER).first().id
+    init_database.session.commit()
+    refreshed = client.post('/users/refresh', headers=refresh)
+    assert refreshed.status_code == 200
+    assert client.get('/transactions/admin/all', headers={
+        'Authorization': f"Bearer {refreshed.json['access_token']}"}).status_code == 403
+
+    # Deleted: no new access token at all
+    init_database.session.delete(admin)
+    init_database.session.commit()
+    assert client.post('/users/refresh', headers=refresh).status_code == 401
+
+def test_export_transactions(client, init_database):
+    import csv
+    import io
+    import json
+
+    # Login as customer
+    login_response = client.post('/users/login', json={
+        'username': 'testuser',
+        'password': 'password123'
+    })
+    token = login_response.json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.get('/transactions/export', headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    lines = response.get_data(as_text=True).strip().splitlines()
+    assert lines[0].startswith('id,reference_number,type,amount,timestamp')
+    assert len(lines) == 3  # header + deposit + transfer
+
+    response = client.get('/transactions/export?format=ndjson&type=deposit', headers=headers)
+    assert response.status_code == 200
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['type'] for row in rows] == ['deposit']
+    assert rows[0]['amount'] == 50000.0
+
+    response = client.get('/transactions/export?format=xml', headers=headers)
+    assert response.status_code == 400
+
+    # Descriptions that a spreadsheet would run as formulas are quoted in CSV only
+    formula = '=HYPERLINK("http://example.com","x")'
+    response = client.post('/transactions/deposit',
+        json={'account_id': rows[0]['account_id'], 'amount': 1000.0, 'description': formula},
+        headers=headers
+    )
+    assert response.status_code == 201
+    transaction_id = str(response.json['transaction']['id'])
+
+    response = client.get('/transactions/export', headers=headers)
+    exported = {row['id']: row for row in csv.DictReader(io.StringIO(response.get_data(as_text=True)))}
+    assert exported[transaction_id]['description'] == "'" + formula
+    response = client.get('/transactions/export?format=ndjson&type=deposit', headers=headers)
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert formula in [row['description'] for row in rows]
+
+def test_list_serialization_matches_to_dict(app, client, init_database):
+    from app.utils.serialization import StdlibJSONProvider
+
+    # Login as customer
+    login_response = client.post('/users/login', json={
+        'username': 'testuser',
+        'password': 'password123'
+    })
+    token = login_response.json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    with app.app_context():
+        expected_transactions = {t.id: t.to_dict() for t in Transaction.query.all()}
+        expected_accounts = {a.id: a.to_dict() for a in Account.query.all()}
+
+    # Same payloads with the fast provider and with the stdlib fallback
+    for provider in (app.json, StdlibJSONProvider(app)):
+        app.json = provider
+        response = client.get('/transactions/', headers=headers)
+        assert response.status_code == 200
+        for item in response.json['transactions']:
+            assert item == expected_transactions[item['id']]
+
+        response = client.get('/accounts', headers=headers)
+        assert response.status_code == 200
+        for item in response.json['accounts']:
+            assert item == expected_accounts[item['id']]
+
+def test_get_transaction_ownership(app, client, init_database):
+    with app.app_context():
+        transfer = Transaction.query.filter_by(type='transfer').first()
+        transfer_id, source_id = transfer.id, transfer.account_id
+
+    # Login as customer
+    login_response = client.post('/users/login', json={
+        'username': 'testuser',
+        'password': 'password123'
+    })
+    token = login_response.json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    response = client.get(f'/transactions/{transfer_id}', headers=headers)
+    assert response.status_code == 200
+    assert response.json['id'] == transfer_id
+    assert response.json['recipient_account_id'] is not None
+
+    response = client.get('/transactions/999999', headers=headers)
+    assert response.status_code == 404
+
+    # Another customer can neither see the transaction nor filter by the account
+    client.post('/users', json={
+        'username': 'otheruser',
+        'password': 'Password123!',
+        'name': 'Other User',
+        'email': 'other@example.com'
+    })
+    login_response = client.post('/users/login', json={
+        'username': 'otheruser',
+        'password': 'Password123!'
+    })
+    other_headers = {'Authorization': f"Bearer {login_response.json['access_token']}"}
+
+    response = client.get(f'/transactions/{transfer_id}', headers=other_headers)
+    assert response.status_code == 404
+    assert response.json['error'] == 'Transaction not found'
+
+    response = client.get(f'/transactions/?account_id={source_id}', headers=other_headers)
+    assert response.status_code == 404
+    response = client.get('/transactions/', headers=other_headers)
+    assert response.status_code == 200
+    assert response.json['transactions'] == []
+
+def test_conditional_account_reads(app, client, init_database):
+    # Login as customer
+    login_response = client.post('/users/login', json={
+        'username': 'testuser',
+        'password': 'password123'
+    })
+    token = login_response.json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    with app.app_context():
+        account_id = Account.query.filter_by(account_type='savings').first().id
+
+    response = client.get('/accounts', headers=headers)
+    assert response.status_code == 200
+    list_etag = response.headers['ETag']
+    assert 'private' in response.headers['Cache-Control']
+
+    response = client.get(f'/accounts/{account_id}', headers=headers)
+    assert response.status_code == 200
+    account_etag = response.headers['ETag']
+    account_last_modified = response.headers['Last-Modified']
+
+    # Unchanged resources revalidate with 304, by ETag or by a later date
+    response = client.get('/accounts', headers={**headers, 'If-None-Match': list_etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    later = http_date(parse_date(account_last_modified) + timedelta(seconds=1))
+    response = client.get(f'/accounts/{account_id}', headers={**headers, 'If-Modified-Since': later})
+    assert response.status_code == 304
+    # The same second is not proof of an unchanged balance
+    response = client.get(f'/accounts/{account_id}', headers={
+        **headers, 'If-Modified-Since': account_last_modified})
+    assert response.status_code == 200
+    # If-None-Match takes precedence over the date
+    response = client.get(f'/accounts/{account_id}', headers={
+        **headers, 'If-None-Match': list_etag, 'If-Modified-Since': later})
+    assert response.status_code == 200
+    response = client.get(f'/accounts/{account_id}', headers={
+        **headers, 'If-None-Match': account_etag, 'If-Modified-Since': account_last_modified})
+    assert response.status_code == 304
+
+    # Filters are part of the ETag
+    response = client.get('/accounts?type=savings', headers={**headers, 'If-None-Match': list_etag})
+    assert response.status_code == 200
+
+    # A balance change invalidates both
+    response = client.post('/transactions/deposit', headers=headers, json={
+        'account_id': account_id,
+        'amount': 1000.0
+    })
+    assert response.status_code == 201
+    response = client.get('/accounts', headers={**headers, 'If-None-Match': list_etag})
+    assert response.status_code == 200
+    response = client.get(f'/accounts/{account_id}', headers={**headers, 'If-None-Match': account_etag})
+    assert response.status_code == 200
+
+    # Unknown accounts still 404
+    response = client.get('/accounts/999999', headers=headers)
+    assert response.status_code == 404
+
+    # Account types are public and cacheable
+    response = client.get('/accounts/types')
+    assert response.status_code == 200
+    assert 'public' in response.headers['Cache-Control']
+    assert 'max-age' in response.headers['Cache-Control']
+    response = client.get('/accounts/types', headers={'If-None-Match': response.headers['ETag']})
+    assert response.status_code == 304
+
+def test_sql_instrumentation(app, client, init_database, caplog):
+    from app.utils.instrumentation import init_sql_instrumentation
+
+    app.config.update(SQL_STATS_HEADER=True, SQL_STATEMENT_THRESHOLD=1, SQL_REPEAT_THRESHOLD=2)
+    init_sql_instrumentation(app)
+
+    # Login as customer
+    login_response = client.post('/users/login', json={
+        'username': 'testuser',
+        'password': 'password123'
+    })
+    token = login_response.json['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    # The first authenticated request also syncs revocations from the table
+    client.get('/accounts', headers=headers)
+    response = client.get('/accounts', headers=headers)
+    assert response.status_code == 200
+    stats = dict(part.split('=') for part in response.headers['X-SQL-Stats'].split('; '))
+    assert int(stats['statements']) == 2  # version check + listing
+    assert float(stats['time_ms']) >= 0
+
+    # One lookup per account in a loop is the N+1 pattern
+    with app.test_request_context('/probe'):
+        from flask import g
+        app.preprocess_request()
+        for account_id in (1, 2, 1):
+            init_database.session.get(Account, account_id)
+            init_database.session.expunge_all()
+        assert g.sql_stats.count == 3
+        assert g.sql_stats.repeated(2)[0][1] == 3
+        app.process_response(app.response_class())
+    assert 'possible N+1 (3x)' in caplog.text
+
+def test_metrics_endpoint(monkeypatch, tmp_path):
+    from sqlalchemy import create_engine, text
+    from app import create_app, db
+    from app.utils.metrics import POOL_CHECKOUT_WAIT, TimedQueuePool
+    from config import Config
+
+    # Off by default
+    assert create_app('testing').test_client().get('/metrics').status_code == 404
+
+    monkeypatch.setattr(Config, 'METRICS_ENABLED', True)
+    monkeypatch.setattr(Config, 'METRICS_TOKEN', 'scrape-token')
+    monkeypatch.setattr(Config, 'METRICS_RATE_LIMIT', '2 per minute')
+    app = create_app('testing')
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer scrape-token'}
+    with app.app_context():
+        db.create_all()
+        assert client.get('/accounts/types').status_code == 200
+        assert client.get('/metrics').status_code == 401
+        response = client.get('/metrics', headers=headers)
+        assert response.status_code == 200
+        body = response.get_data(as_text=True)
+        assert ('revobank_http_requests_total{blueprint="account",endpoint="account.get_account_types",'
+                'method="GET",status="200"}') in body
+        assert 'revobank_http_request_duration_seconds_bucket{blueprint="account"' in body
+        assert 'revobank_transfers_pending_approval 0.0' in body
+        # Scrapes query the database, so they are rate limited
+        assert client.get('/metrics', headers=headers).status_code == 429
+
+    # Pool checkouts are timed
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool)
+    before = POOL_CHECKOUT_WAIT.collect()[0].samples
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+    engine.dispose()
+    count = lambda samples: next(s.value for s in samples if s.name.endswith('_count'))
+    assert count(POOL_CHECKOUT_WAIT.collect()[0].samples) == count(before) + 1
+
+def test_listing_args_shared_by_view_and_cost():
+    """The views and the read budget's rows_cost parse limit and include_total the same way"""
+    from werkzeug.datastructures import MultiDict
+    from app.utils.pagination import include_total, page_size
+
+    assert page_size(MultiDict()) == 20
+    assert page_size(MultiDict({'limit': '100'})) == 100
+    assert page_size(MultiDict({'limit': '0'})) is None
+    assert page_size(MultiDict({'limit': '101'})) is None
+    assert include_total(MultiDict())
+    assert not include_total(MultiDict({'cursor': 'abc'}))
+    assert include_total(MultiDict({'cursor': 'abc', 'include_total': 'Yes'}))
+    assert not include_total(MultiDict({'include_total': 'false'}))
+
+def test_read_budget_per_user_and_cost(app, client, init_database):
+    app.config['RATELIMIT_READ_BUDGET'] = '10 per minute'
+    login = lambda username, password: {'Authorization': 'Bearer ' + client.post(
+        '/users/login', json={'username': username, 'password': password}).json['access_token']}
+    admin, customer = login('admin', 'admin123'), login('testuser', 'password123')
+
+    # 100 rows plus the total count cost 6 units: the second page exceeds 10
+    assert client.get('/transactions/admin/all?limit=100', headers=admin).status_code == 200
+    assert client.get('/transactions/admin/all?limit=100', headers=admin).status_code == 429
+    assert client.get('/accounts', headers=admin).status_code == 429
+
+    # Same address, but the customer has a budget of their own
+    assert client.get('/transactions/?include_total=false', headers=customer).status_code == 200
+    assert client.get('/accounts', headers=customer).status_code == 200
+    for _ in range(8):
+        assert client.get('/transactions/1', headers=customer).status_code in (200, 404)
+    assert client.get('/transactions/1', headers=customer).status_code == 429
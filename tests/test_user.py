@@ -4,6 +4,9 @@ from app.models.role import Role
 from app import db
 from flask_jwt_extended import create_access_token
 from datetime import datetime, timezone
+from werkzeug.security import generate_password_hash
+from app.services.lockout import LoginLockout
+from app.services.passwords import PasswordHasher
 
 @pytest.fixture(autouse=True)
 def setup_database(app):
@@ -81,7 +84,7 @@ def test_register_invalid_data(client):
     assert response.status_code == 400
     assert 'Password must be at least 8 characters long' in response.json['error']
 
-def test_login(client):
+def test_login(app, client):
     """Test user login"""
     # Create a test user
     customer_role = Role.query.filter_by(name=Role.CUSTOMER).first()
@@ -103,6 +106,8 @@ def test_login(client):
     assert response.status_code == 200
     assert 'access_token' in response.json
     assert 'refresh_token' in response.json
+    # The advertised lifetime is the configured one (it bounds stale role claims)
+    assert response.json['expires_in'] == app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds()
     
     # Test invalid password
     response = client.post('/users/login', json={
@@ -118,6 +123,118 @@ def test_login(client):
     })
     assert response.status_code == 401
 
+def test_login_upgrades_password_hash(app, client):
+    """Hashes made with other parameters are replaced on the next login"""
+    customer_role = Role.query.filter_by(name=Role.CUSTOMER).first()
+    old_hash = generate_password_hash('Test123!', 'pbkdf2:sha256:500')
+    db.session.add(User(username='testuser', name='Test User', email='test@example.com',
+                        role=customer_role, password_hash=old_hash))
+    db.session.commit()
+
+    # A failed login leaves the hash alone
+    response = client.post('/users/login', json={'username': 'testuser', 'password': 'wrong'})
+    assert response.status_code == 401
+    assert User.query.filter_by(username='testuser').one().password_hash == old_hash
+
+    response = client.post('/users/login', json={'username': 'testuser', 'password': 'Test123!'})
+    assert response.status_code == 200
+    db.session.expire_all()
+    user = User.query.filter_by(username='testuser').one()
+    assert user.password_hash.startswith(app.config['PASSWORD_HASH_METHOD'] + '$')
+    assert user.check_password('Test123!')
+
+def test_password_hasher_busy(app, client):
+    """Logins beyond the hashing queue are refused with 503 instead of queueing"""
+    customer_role = Role.query.filter_by(name=Role.CUSTOMER).first()
+    user = User(username='testuser', name='Test User', email='test@example.com', role=customer_role)
+    user.set_password('Test123!')
+    db.session.add(user)
+    db.session.commit()
+
+    app.extensions['passwords'] = PasswordHasher('pbkdf2:sha256:1000', workers=1, max_pending=0)
+    response = client.post('/users/login', json={'username': 'testuser', 'password': 'Test123!'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+def test_rejected_writes_skip_hashing(app, client):
+    """Duplicate or invalid registrations and profile updates never queue for a hash"""
+    customer_role = Role.query.filter_by(name=Role.CUSTOMER).first()
+    user = User(username='testuser', name='Test User', email='test@example.com', role=customer_role)
+    user.set_password('Test123!')
+    other = User(username='other', name='Other', email='other@example.com', role=customer_role)
+    other.set_password('Test123!')
+    db.session.add_all([user, other])
+    db.session.commit()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+    # With no hashing capacity at all, anything reaching the hasher gets a 503
+    app.extensions['passwords'] = PasswordHasher('pbkdf2:sha256:1000', workers=1, max_pending=0)
+    registration = {'username': 'new', 'name': 'New', 'email': 'new@example.com', 'password': 'Test123!'}
+    response = client.post('/users', json={**registration, 'username': 'testuser'})
+    assert response.status_code == 400
+    assert response.json['error'] == 'Username already exists'
+    response = client.post('/users', json={**registration, 'email': 'Other@Example.com'})
+    assert response.status_code == 400
+    assert response.json['error'] == 'Email already exists'
+    response = client.post('/users', json=registration)
+    assert response.status_code == 503
+
+    response = client.put('/users/me', headers=headers, json={'email': 'other@example.com', 'password': 'Test1234!'})
+    assert response.status_code == 400
+    assert response.json['error'] == 'Email already exists'
+    response = client.put('/users/me', headers=headers, json={'password': 'short'})
+    assert response.status_code == 400
+    response = client.put('/users/me', headers=headers, json={'password': 'Test1234!'})
+    assert response.status_code == 503
+
+def test_login_lockout(app, client):
+    """Failed logins lock the username, then the address, before any hashing"""
+    customer_role = Role.query.filter_by(name=Role.CUSTOMER).first()
+    user = User(username='testuser', name='Test User', email='test@example.com', role=customer_role)
+    user.set_password('Test123!')
+    db.session.add(user)
+    db.session.commit()
+    app.extensions['lockout'] = LoginLockout(max_attempts=3, max_ip_attempts=6, window=900)
+    login = lambda username, password: client.post(
+        '/users/login', json={'username': username, 'password': password})
+
+    # A successful login clears the username's failures
+    for _ in range(2):
+        assert login('testuser', 'wrong').status_code == 401
+    assert login('testuser', 'Test123!').status_code == 200
+    for _ in range(3):
+        assert login('testuser', 'wrong').status_code == 401
+
+    # Locked: refused without verifying, even with the right password
+    app.extensions['passwords'] = PasswordHasher('pbkdf2:sha256:1000', workers=1, max_pending=0)
+    response = login('testuser', 'Test123!')
+    assert response.status_code == 429
+    assert 0 < int(response.headers['Retry-After']) <= 900
+
+    # The address has failed five times; one more unknown username locks it
+    assert login('someone', 'wrong').status_code == 401
+    assert login('someone_else', 'wrong').status_code == 429
+
+def test_login_lockout_behind_proxy(monkeypatch):
+    """Behind a trusted proxy the per-address limit sees clients, not the balancer"""
+    from app import create_app
+    from config import Config
+
+    monkeypatch.setattr(Config, 'TRUSTED_PROXY_COUNT', 1)
+    app = create_app('testing')
+    client = app.test_client()
+    login = lambda username, address: client.post(
+        '/users/login', json={'username': username, 'password': 'wrong'},
+        headers={'X-Forwarded-For': address})
+
+    with app.app_context():
+        db.create_all()
+        app.extensions['lockout'] = LoginLockout(max_attempts=3, max_ip_attempts=2, window=900)
+        assert login('alice', '203.0.113.7').status_code == 401
+        assert login('bob', '203.0.113.7').status_code == 401
+        assert login('carol', '203.0.113.7').status_code == 429
+        assert login('carol', '198.51.100.2').status_code == 401
+
 def test_profile(client):
     """Test profile endpoints"""
     # Create test user
@@ -149,6 +266,13 @@ def test_profile(client):
     response = client.get('/users/me', headers=headers)
     assert response.status_code == 200
     assert response.json['email'] == 'test@example.com'
+    etag = response.headers['ETag']
+    assert response.headers['Last-Modified']
+    
+    # Unchanged profile revalidates with 304 and no body
+    response = client.get('/users/me', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
     
     # Test update profile
     response = client.put('/users/me', headers=headers, json={
@@ -161,6 +285,12 @@ def test_profile(client):
     user = db.session.get(User, user.id)
     assert user.name == 'Updated Name'
     assert user.email == 'updated@example.com'
+    
+    # The update invalidates the ETag
+    response = client.get('/users/me', headers={**headers, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.json['name'] == 'Updated Name'
+    assert response.headers['ETag'] != etag
 
 def test_refresh_token(client):
     """Test token refresh"""
@@ -221,3 +351,43 @@ def test_logout(client):
         'Authorization': f'Bearer {access_token}'
     })
     assert response.status_code == 401
+
+def test_revocation_shared_across_workers(app, tmp_path):
+    """A token revoked by one worker is rejected by another"""
+    from app.services.revocation import TokenRevocationStore
+
+    exp = int(datetime.now(timezone.utc).timestamp()) + 900
+    worker_a = TokenRevocationStore(str(tmp_path), bloom_size=4096, bloom_hashes=5)
+    worker_b = TokenRevocationStore(str(tmp_path), bloom_size=4096, bloom_hashes=5)
+
+    # Nothing revoked yet: answered from the filter without a lookup
+    assert not worker_b.is_revoked('jti-1', exp)
+
+    worker_a.revoke('jti-1', exp)
+    assert worker_b.is_revoked('jti-1', exp)
+    assert not worker_b.is_revoked('jti-2', exp)
+
+    # Expired revocations are purged
+    worker_a.revoke('jti-old', exp - 3 * 86400)
+    worker_a.purge_expired()
+    assert not worker_a.is_revoked('jti-old', exp - 3 * 86400)
+    assert worker_a.is_revoked('jti-1', exp)
+
+def test_revocation_survives_lost_bloom_dir(app, tmp_path):
+    """The filter files are a cache of the table: losing them revokes nothing back"""
+    import shutil
+    from app.services.revocation import TokenRevocationStore
+
+    exp = int(datetime.now(timezone.utc).timestamp()) + 900
+    # Another host with its own directory, already answering before the revocation
+    other_host = TokenRevocationStore(str(tmp_path / 'other'), 4096, 5, sync_interval=0)
+    assert not other_host.is_revoked('jti-1', exp)
+
+    TokenRevocationStore(str(tmp_path / 'bloom'), 4096, 5).revoke('jti-1', exp)
+    assert other_host.is_revoked('jti-1', exp)
+
+    # Restart with an emptied directory
+    shutil.rmtree(tmp_path / 'bloom')
+    restarted = TokenRevocationStore(str(tmp_path / 'bloom'), 4096, 5)
+    assert restarted.is_revoked('jti-1', exp)
+    assert not restarted.is_revoked('jti-2', exp)